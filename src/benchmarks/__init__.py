@@ -0,0 +1,5 @@
+"""Benchmarks of the Pyotr server and client.
+
+Run them with `python -m benchmarks run`, from the `src` directory; see
+`python -m benchmarks --help` for the options.
+"""
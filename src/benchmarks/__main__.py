@@ -0,0 +1,129 @@
+"""Command line interface of the benchmarks."""
+import argparse
+import re
+import sys
+from typing import List, Optional
+
+from .runner import compare, read_results, Result, STATISTICS, Timer, write_results
+
+SUITES = ("server", "client", "startup")
+DEFAULT_OPERATIONS = (10, 100, 1000, 5000)
+DEFAULT_PAYLOAD_SIZES = ("1KB", "100KB", "1MB", "10MB")
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    """Parses a payload size like `512`, `100KB` or `10MB` into a number of bytes."""
+    match = re.fullmatch(r"(\d+)\s*([KMG]?B?)", value.strip().upper())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    number, unit = match.groups()
+    return int(number) * _SIZE_UNITS[unit if unit in _SIZE_UNITS else unit + "B"]
+
+
+def run(
+    suites: List[str], operations: List[int], payload_sizes: List[int], timer: Timer
+) -> List[Result]:
+    """Runs the benchmark suites.
+
+    The server and client cases are run for each number of operations with the
+    smallest payload, and for each payload size with the smallest spec.
+    """
+    from .cases import bench_client, bench_server, bench_startup
+
+    operations = sorted(operations)
+    payload_sizes = sorted(payload_sizes)
+    call_params = [(count, payload_sizes[0]) for count in operations]
+    call_params.extend((operations[0], size) for size in payload_sizes[1:])
+    results: List[Result] = []
+    for suite in suites:
+        if suite == "startup":
+            for count in operations:
+                _report(results, bench_startup(count, timer))
+            continue
+        bench = bench_server if suite == "server" else bench_client
+        for count, size in call_params:
+            _report(results, bench(count, size, timer))
+    return results
+
+
+def _report(results: List[Result], new_results: List[Result]):
+    for result in new_results:
+        median = result.timings["total"]["median"]
+        print(f"{result.key}: {median * 1e3:.3f}ms ({result.rounds} rounds)", file=sys.stderr)
+    results.extend(new_results)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the `benchmarks` command."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument(
+        "--suite", dest="suites", nargs="+", choices=SUITES, default=list(SUITES)
+    )
+    run_parser.add_argument(
+        "--operations",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_OPERATIONS),
+        help="Numbers of operations in the synthetic specs, at least 2.",
+    )
+    run_parser.add_argument(
+        "--payload-sizes",
+        nargs="+",
+        type=parse_size,
+        default=[parse_size(size) for size in DEFAULT_PAYLOAD_SIZES],
+        help="Approximate sizes of the request and response bodies, e.g. 1KB or 10MB.",
+    )
+    run_parser.add_argument(
+        "--rounds", type=int, default=50, help="Maximum number of timed calls per case."
+    )
+    run_parser.add_argument(
+        "--max-time",
+        type=float,
+        default=5.0,
+        help="Seconds after which a case stops, once timed at least three times.",
+    )
+    run_parser.add_argument(
+        "--output", help="File to write the JSON results to; the standard output by default."
+    )
+
+    compare_parser = commands.add_parser(
+        "compare", help="Compare two result files and flag the regressions."
+    )
+    compare_parser.add_argument("baseline", help="Results of the baseline run.")
+    compare_parser.add_argument("current", help="Results of the run to check.")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown flagged as a regression; 0.1 by default.",
+    )
+    compare_parser.add_argument("--statistic", choices=STATISTICS, default="median")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if min(args.operations) < 2:
+            parser.error("the specs need at least 2 operations")
+        timer = Timer(rounds=args.rounds, max_time=args.max_time)
+        results = run(args.suites, args.operations, args.payload_sizes, timer)
+        write_results(results, args.output)
+        return 0
+
+    comparisons = compare(
+        read_results(args.baseline), read_results(args.current), statistic=args.statistic
+    )
+    regressions = 0
+    for comparison in comparisons:
+        regression = comparison.change > args.threshold
+        regressions += regression
+        print(f"{'REGRESSION ' if regression else ''}{comparison}")
+    print(f"{len(comparisons)} timings compared, {regressions} regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
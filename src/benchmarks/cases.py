@@ -0,0 +1,185 @@
+"""The benchmark cases of the server, the client and their startup."""
+import asyncio
+import json
+import tempfile
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+from stringcase import snakecase
+
+from pyotr.client import Client
+from pyotr.server import Application
+from .runner import Result, summarise, Timer, TOTAL
+from .specs import (
+    get_operation_ids,
+    get_paths,
+    make_endpoints,
+    make_payload,
+    make_spec,
+    SERVER_URL,
+)
+
+
+class PhaseRecorder:
+    """Collects the phase durations reported by the server or client metrics hooks."""
+
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase."""
+        self.samples[operation_id][phase].append(duration)
+
+    def observe_validation_error(self, operation_id: str, kind: str = "response"):
+        """Fails the benchmark, which should only make valid calls."""
+        raise RuntimeError(f"Invalid {kind} of {operation_id}.")
+
+    def observe_body_size(self, operation_id: str, kind: str, size: int):
+        """Ignores the body sizes."""
+
+    def observe_response(self, operation_id: str, status_code: int):
+        """Ignores the response status codes."""
+
+    def observe_error(self, operation_id: str, error: Exception):
+        """Ignores the errors, which are raised by the client anyway."""
+
+    def observe_retry(self, operation_id: str):
+        """Ignores the retries."""
+
+    def observe_in_flight(self, count: int):
+        """Ignores the number of requests in flight."""
+
+    def clear(self):
+        """Discards the phase durations recorded so far, e.g. of warm-up calls."""
+        self.samples.clear()
+
+    def get_timings(
+        self, operation_id: str, samples: List[float]
+    ) -> Dict[str, Dict[str, float]]:
+        """Summarises the total durations of the calls of an operation and their phases."""
+        timings = {TOTAL: summarise(samples)}
+        for phase, durations in self.samples[operation_id].items():
+            timings[phase] = summarise(durations)
+        return timings
+
+
+def _check_status(response: httpx.Response, status_code: int):
+    if response.status_code != status_code:
+        raise RuntimeError(f"Unexpected response {response.status_code}: {response.text[:200]}")
+
+
+def bench_server(operations: int, payload_size: int, timer: Timer) -> List[Result]:
+    """Times the handling of GET and POST requests by the application.
+
+    The requests are sent through the in-process ASGI transport of `httpx`. The
+    phases are the ones reported to the server metrics hook.
+    """
+    payload = make_payload(payload_size)
+    body = json.dumps(payload).encode()
+    recorder = PhaseRecorder()
+    app = Application(
+        make_spec(operations),
+        module=make_endpoints(operations, payload),
+        metrics=recorder,
+    )
+    get_id, post_id = get_operation_ids(operations)
+    get_path, post_path = get_paths(operations)
+    headers = {"content-type": "application/json"}
+    params = {"operations": operations, "payload_size": payload_size}
+
+    async def run() -> List[Result]:
+        async with httpx.AsyncClient(app=app, base_url=SERVER_URL) as client:
+
+            async def get():
+                _check_status(await client.get(get_path), 200)
+
+            async def post():
+                _check_status(await client.post(post_path, content=body, headers=headers), 201)
+
+            results = []
+            for name, operation_id, fn in (
+                ("server.get", get_id, get),
+                ("server.post", post_id, post),
+            ):
+                await fn()
+                recorder.clear()
+                samples = await timer.run_async(fn)
+                timings = recorder.get_timings(operation_id, samples)
+                results.append(Result(name, params, len(samples), timings))
+            return results
+
+    return asyncio.run(run())
+
+
+def bench_client(operations: int, payload_size: int, timer: Timer) -> List[Result]:
+    """Times the calls of GET and POST operations by the client.
+
+    The requests are handled by a stand-in server using the mock transport of
+    `httpx`, which returns prepared responses. The phases are the ones reported
+    to the client metrics hook.
+    """
+    payload = make_payload(payload_size)
+    payload_body = json.dumps(payload).encode()
+    count_body = json.dumps({"count": len(payload["items"])}).encode()
+    headers = {"content-type": "application/json"}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, content=payload_body, headers=headers)
+        return httpx.Response(201, content=count_body, headers=headers)
+
+    recorder = PhaseRecorder()
+    client = Client(
+        make_spec(operations),
+        client=httpx.Client(transport=httpx.MockTransport(handler)),  # type: ignore
+        metrics=recorder,
+    )
+    get_id, post_id = get_operation_ids(operations)
+    get_operation = getattr(client, snakecase(get_id))
+    post_operation = getattr(client, snakecase(post_id))
+    params = {"operations": operations, "payload_size": payload_size}
+    results = []
+    calls: List[tuple] = [
+        ("client.get", get_id, lambda: get_operation(1)),
+        ("client.post", post_id, lambda: post_operation(body_=payload)),
+    ]
+    for name, operation_id, fn in calls:
+        fn()
+        recorder.clear()
+        samples = timer.run(fn)
+        results.append(
+            Result(name, params, len(samples), recorder.get_timings(operation_id, samples))
+        )
+    return results
+
+
+def bench_startup(operations: int, timer: Timer) -> List[Result]:
+    """Times creating the application and the client from a spec file.
+
+    Each is timed without the spec cache and with a warm one.
+    """
+    spec = make_spec(operations)
+    endpoints = make_endpoints(operations, {})
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        spec_path = Path(temp_dir) / "openapi.json"
+        spec_path.write_text(json.dumps(spec))
+        cache_dir = Path(temp_dir) / "cache"
+        factories: List[tuple] = [
+            (
+                "startup.application",
+                partial(Application.from_file, spec_path, module=endpoints),
+            ),
+            ("startup.client", partial(Client.from_file, spec_path)),
+        ]
+        for name, factory in factories:
+            for spec_cache in (False, True):
+                kwargs: Dict[str, Any] = {"spec_cache_dir": cache_dir} if spec_cache else {}
+                factory(**kwargs)
+                samples = timer.run(partial(factory, **kwargs))
+                params = {"operations": operations, "spec_cache": spec_cache}
+                results.append(Result(name, params, len(samples), {TOTAL: summarise(samples)}))
+    return results
@@ -0,0 +1,159 @@
+"""Timing, storing and comparing the benchmark results."""
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Union
+
+STATISTICS = ("mean", "median", "min", "max", "stdev")
+TOTAL = "total"
+
+
+class Result(NamedTuple):
+    """The timings of a benchmark case, in seconds, summarised by `summarise`.
+
+    The `total` timing is the duration of a whole call; others are its phases.
+    """
+
+    name: str
+    params: Dict[str, Any]
+    rounds: int
+    timings: Dict[str, Dict[str, float]]
+
+    @property
+    def key(self) -> str:
+        """Identifies the case across benchmark runs."""
+        params = ",".join(f"{name}={value}" for name, value in sorted(self.params.items()))
+        return f"{self.name}[{params}]"
+
+
+class Comparison(NamedTuple):
+    """A timing of a benchmark case in the baseline and the current results."""
+
+    key: str
+    timing: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        """The relative change of the timing; positive if it is slower."""
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+    def __str__(self) -> str:
+        """Formats the comparison for the console."""
+        return (
+            f"{self.key} {self.timing}: {_format_duration(self.baseline)} -> "
+            f"{_format_duration(self.current)} ({self.change:+.1%})"
+        )
+
+
+class Timer:
+    """Repeats a call and collects its durations.
+
+    The call is repeated `rounds` times, but stops earlier once `max_time` seconds
+    have passed, as long as it has been repeated at least three times. Any warm-up
+    calls need to be made before.
+    """
+
+    def __init__(self, rounds: int, max_time: float):
+        self.rounds = rounds
+        self.max_time = max_time
+
+    def run(self, fn: Callable[[], Any]) -> List[float]:
+        """Times the calls of a function."""
+        samples: List[float] = []
+        deadline = time.perf_counter() + self.max_time
+        while self._should_continue(samples, deadline):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    async def run_async(self, fn: Callable[[], Awaitable[Any]]) -> List[float]:
+        """Times the calls of a coroutine function."""
+        samples: List[float] = []
+        deadline = time.perf_counter() + self.max_time
+        while self._should_continue(samples, deadline):
+            start = time.perf_counter()
+            await fn()
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def _should_continue(self, samples: List[float], deadline: float) -> bool:
+        return len(samples) < self.rounds and (
+            len(samples) < 3 or time.perf_counter() < deadline
+        )
+
+
+def summarise(samples: Iterable[float]) -> Dict[str, float]:
+    """Summarises the durations of the calls."""
+    values = list(samples)
+    return {
+        "mean": statistics.mean(values),
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+    }
+
+
+def write_results(results: Iterable[Result], path: Union[Path, str, None] = None):
+    """Writes the results as JSON to a file, or to the standard output if no path is given."""
+    document = {
+        "metadata": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "pyotr": _get_version(),
+        },
+        "results": [result._asdict() for result in results],
+    }
+    if path is None:
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, "w") as output:
+            json.dump(document, output, indent=2)
+
+
+def read_results(path: Union[Path, str]) -> Dict[str, Result]:
+    """Reads the results written by `write_results`, keyed by the cases."""
+    with open(path) as results_file:
+        document = json.load(results_file)
+    results = (Result(**result) for result in document["results"])
+    return {result.key: result for result in results}
+
+
+def compare(
+    baseline: Dict[str, Result], current: Dict[str, Result], statistic: str = "median"
+) -> List[Comparison]:
+    """Compares a statistic of the timings of the cases found in both results."""
+    return [
+        Comparison(key, timing, baseline[key].timings[timing][statistic], stats[statistic])
+        for key, result in current.items()
+        if key in baseline
+        for timing, stats in result.timings.items()
+        if timing in baseline[key].timings
+    ]
+
+
+def _get_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("pyotr")
+    except Exception:
+        return "unknown"
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f}ms"
+    return f"{seconds * 1e6:.1f}us"
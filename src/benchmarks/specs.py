@@ -0,0 +1,135 @@
+"""Synthetic specs, endpoints and payloads of the benchmarks."""
+import json
+from types import ModuleType
+from typing import Any, Dict, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+SERVER_URL = "http://bench.local"
+
+SCHEMAS = {
+    "Item": {
+        "type": "object",
+        "required": ["id", "name"],
+        "properties": {
+            "id": {"type": "integer", "minimum": 0},
+            "name": {"type": "string", "maxLength": 64},
+            "tags": {"type": "array", "items": {"type": "string"}},
+            "active": {"type": "boolean"},
+        },
+    },
+    "Collection": {
+        "type": "object",
+        "required": ["items"],
+        "properties": {
+            "items": {"type": "array", "items": {"$ref": "#/components/schemas/Item"}}
+        },
+    },
+    "Count": {
+        "type": "object",
+        "required": ["count"],
+        "properties": {"count": {"type": "integer"}},
+    },
+}
+
+
+def _json_content(schema_name: str) -> dict:
+    return {"application/json": {"schema": {"$ref": f"#/components/schemas/{schema_name}"}}}
+
+
+def get_operation_ids(operations: int) -> Tuple[str, str]:
+    """Returns the IDs of the last pair of GET and POST operations of a synthetic spec."""
+    resource = operations // 2 - 1
+    return f"getCollection{resource}", f"createCollection{resource}"
+
+
+def get_paths(operations: int) -> Tuple[str, str]:
+    """Returns the paths of the operations returned by `get_operation_ids`."""
+    resource = operations // 2 - 1
+    return f"/collections{resource}/1", f"/collections{resource}"
+
+
+def make_spec(operations: int) -> Dict[str, Any]:
+    """Creates a spec with the given number of operations, at least two.
+
+    The operations alternate between getting a collection of items by its ID and
+    creating a collection from the request body, each with its own path.
+    """
+    if operations < 2:
+        raise ValueError("A benchmark spec needs at least two operations.")
+    paths: Dict[str, Any] = {}
+    for index in range(operations):
+        resource, is_post = divmod(index, 2)
+        if is_post:
+            paths[f"/collections{resource}"] = {
+                "post": {
+                    "operationId": f"createCollection{resource}",
+                    "requestBody": {"required": True, "content": _json_content("Collection")},
+                    "responses": {
+                        "201": {"description": "Created.", "content": _json_content("Count")}
+                    },
+                }
+            }
+        else:
+            paths[f"/collections{resource}/{{collection_id}}"] = {
+                "get": {
+                    "operationId": f"getCollection{resource}",
+                    "parameters": [
+                        {
+                            "name": "collection_id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "integer"},
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "A collection.",
+                            "content": _json_content("Collection"),
+                        }
+                    },
+                }
+            }
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "Benchmark API", "version": "1.0.0"},
+        "servers": [{"url": SERVER_URL}],
+        "paths": paths,
+        "components": {"schemas": SCHEMAS},
+    }
+
+
+def make_payload(size: int) -> Dict[str, Any]:
+    """Creates a collection whose JSON encoding is approximately `size` bytes long."""
+    item_size = len(json.dumps(_make_item(0))) + 2
+    return {"items": [_make_item(index) for index in range(max(1, size // item_size))]}
+
+
+def _make_item(index: int) -> Dict[str, Any]:
+    return {
+        "id": index,
+        "name": f"item-{index:010d}",
+        "tags": ["alpha", "beta", "gamma"],
+        "active": index % 2 == 0,
+    }
+
+
+def make_endpoints(operations: int, payload: Dict[str, Any]) -> ModuleType:
+    """Creates a module with the endpoint functions of a synthetic spec.
+
+    The GET endpoints return the payload, and the POST ones count the items of the request body.
+    """
+    module = ModuleType("benchmark_endpoints")
+
+    async def get_collection(request: Request) -> Dict[str, Any]:
+        return payload
+
+    async def create_collection(request: Request) -> JSONResponse:
+        body = await request.json()
+        return JSONResponse({"count": len(body["items"])}, status_code=201)
+
+    for resource in range((operations + 1) // 2):
+        setattr(module, f"get_collection{resource}", get_collection)
+        setattr(module, f"create_collection{resource}", create_collection)
+    return module
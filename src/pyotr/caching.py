@@ -0,0 +1,72 @@
+"""Response caching shared by the client and the server."""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """In-process response cache, discarding the least recently used entries.
+
+    The entries are expected to have a `size` attribute, the size of the response body.
+
+    Arguments:
+        max_entries: The maximum number of stored responses.
+        max_bytes: The maximum total size of the stored response bodies, if any.
+        ttl: The maximum number of seconds a response is kept, including the time it
+            is stale and can only be used after revalidation.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, max_bytes: Optional[int] = None, ttl: float = 300
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the entry stored under the key, if any."""
+        with self._lock:
+            try:
+                stored_at, entry = self._entries[key]
+            except KeyError:
+                return None
+            if time.time() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: Any):
+        """Stores an entry under the key."""
+        if self.max_bytes is not None and _get_size(entry) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time(), entry)
+            self._size += _get_size(entry)
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._size > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable):
+        """Removes the entry stored under the key, if any."""
+        with self._lock:
+            self._remove(key)
+
+    def __len__(self) -> int:
+        """Number of stored entries."""
+        return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        stored = self._entries.pop(key, None)
+        if stored is not None:
+            self._size -= _get_size(stored[1])
+
+
+def _get_size(entry: Any) -> int:
+    return getattr(entry, "size", 0)
@@ -0,0 +1,34 @@
+"""Pyotr command line interface."""
+import argparse
+import os
+from typing import List, Optional
+
+from pyotr.utils import load_spec, SPEC_CACHE_DIR_ENV
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the `pyotr` command."""
+    parser = argparse.ArgumentParser(prog="pyotr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm_cache = commands.add_parser(
+        "cache-spec", help="Parse and validate spec files, and store them in the spec cache."
+    )
+    warm_cache.add_argument("paths", nargs="+", help="Spec files to cache.")
+    warm_cache.add_argument(
+        "--cache-dir",
+        default=os.environ.get(SPEC_CACHE_DIR_ENV),
+        help=f"Spec cache directory; defaults to the value of {SPEC_CACHE_DIR_ENV}.",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "cache-spec":
+        if not args.cache_dir:
+            parser.error(f"either --cache-dir or {SPEC_CACHE_DIR_ENV} is required")
+        for path in args.paths:
+            load_spec(path, cache_dir=args.cache_dir)
+            print(f"Cached {path}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
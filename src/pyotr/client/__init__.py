@@ -1,17 +1,47 @@
 """Pyotr client."""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from http import HTTPStatus
+from itertools import islice
 from pathlib import Path
+from threading import Lock
 from types import ModuleType
-from typing import Any, Callable, Optional, Protocol, Type, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    cast,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Tuple,
+    Type,
+    Union,
+)
 
 import httpx
 from openapi_core import create_spec
-from openapi_core.shortcuts import ResponseValidator
+from openapi_core.exceptions import OpenAPIError
 from openapi_core.spec.paths import SpecPath
 from openapi_core.validation.response.datatypes import OpenAPIResponse
 from stringcase import snakecase
 
-from pyotr.utils import get_spec_from_file, OperationSpec
-from .validation import client_response_factory, ClientOpenAPIRequest
+from pyotr.metrics import NULL_TIMER, PhaseTimer
+from pyotr.utils import is_json, load_spec, OperationSpec
+from pyotr.validation import OperationResponseValidator, ValidationPolicy
+from . import metrics as phases
+from .caching import CacheBackend, CacheEntry, get_cache_key, SAFE_METHODS
+from .metrics import ClientMetricsHook, get_pool_stats, PoolStats
+from .policies import CallPolicy, CircuitBreaker, RetryPolicy
+from .streaming import AsyncStreamedResponse, BaseStreamedResponse, StreamedResponse
+from .validation import client_response_factory, ClientOpenAPIRequest, RequestTemplate
 
 
 class Requestable(Protocol):  # pragma: no cover
@@ -22,6 +52,15 @@ class Requestable(Protocol):  # pragma: no cover
         ...
 
 
+class BatchResult(NamedTuple):
+    """The outcome of a single operation call in a batch."""
+
+    position: int
+    item: Any
+    response: Optional[OpenAPIResponse] = None
+    error: Optional[Exception] = None
+
+
 class Client:
     """Pyotr client class."""
 
@@ -34,6 +73,13 @@ class Client:
         request_class: Type[ClientOpenAPIRequest] = ClientOpenAPIRequest,
         response_factory: Callable[[Any], OpenAPIResponse] = client_response_factory,
         headers: Optional[dict] = None,
+        validate_responses: Union[bool, ValidationPolicy] = True,
+        cache: Optional[CacheBackend] = None,
+        metrics: Optional[ClientMetricsHook] = None,
+        timeout: Optional[float] = None,
+        retry: Union[bool, Mapping, RetryPolicy] = False,
+        circuit_breaker: Union[bool, Mapping, CircuitBreaker] = False,
+        operation_policies: Optional[Mapping[str, Mapping[str, Any]]] = None,
     ):
         if not isinstance(spec, SpecPath):
             spec = create_spec(spec)
@@ -42,6 +88,11 @@ class Client:
         self.request_class = request_class
         self.response_factory = response_factory
         self.common_headers = headers or {}
+        self.validate_responses = validate_responses
+        self.cache = cache
+        self.metrics = metrics
+        self._in_flight = 0
+        self._in_flight_lock = Lock()
 
         if server_url is None:
             server_url = self.spec["servers"][0]["url"]
@@ -53,15 +104,44 @@ class Client:
             else:
                 self.spec["servers"].append({"url": server_url})
         self.server_url = server_url
-        self.validator = ResponseValidator(self.spec)
 
-        for operation_id, op_spec in OperationSpec.get_all(spec).items():
+        self._request_templates: Dict[str, RequestTemplate] = {}
+        self._validators: Dict[str, OperationResponseValidator] = {}
+        self._call_policies: Dict[str, CallPolicy] = {}
+        default_policy = {
+            "timeout": timeout,
+            "retry": retry,
+            "circuit_breaker": circuit_breaker,
+        }
+        operations = OperationSpec.get_all(spec)
+        operation_policies = operation_policies or {}
+        unknown = set(operation_policies) - set(operations)
+        if unknown:
+            raise ValueError(
+                f"Unknown operationIds in operation_policies: {', '.join(sorted(unknown))}."
+            )
+        for operation_id, op_spec in operations.items():
+            self._request_templates[operation_id] = RequestTemplate.compile(server_url, op_spec)
+            self._validators[operation_id] = OperationResponseValidator(self.spec, op_spec)
+            self._call_policies[operation_id] = CallPolicy.create(
+                op_spec.spec, default_policy, operation_policies.get(operation_id)
+            )
             setattr(
                 self,
                 snakecase(operation_id),
                 self._get_operation(op_spec).__get__(self),
             )
 
+    @property
+    def validate_responses(self) -> Union[bool, ValidationPolicy]:
+        """Whether, or according to which policy, the responses are validated."""
+        return self._validate_responses
+
+    @validate_responses.setter
+    def validate_responses(self, value: Union[bool, ValidationPolicy]):
+        self._validate_responses = value
+        self._response_validation = ValidationPolicy.create(value)
+
     @staticmethod
     def _get_operation(op_spec: OperationSpec):
         # TODO: extract args and kwargs from operation parameters
@@ -70,32 +150,525 @@ class Client:
             *args,
             body_: Optional[Union[dict, list]] = None,
             headers_: Optional[dict] = None,
+            stream_: bool = False,
             **kwargs,
         ):
-            request_headers = self.common_headers.copy()
-            request_headers.update(headers_ or {})
-            request = self.request_class(self.server_url, op_spec)
-            request.prepare(*args, body_=body_, headers_=request_headers, **kwargs)
-            request_params = {
-                "method": request.method,
-                "url": request.url,
-                "headers": request.headers,
+            timer = self._start_timer(op_spec.operation_id)
+            request, request_params = self._prepare_request(
+                op_spec, *args, body_=body_, headers_=headers_, **kwargs
+            )
+            timer.lap(phases.PREPARE)
+            if stream_:
+                stream = self.client.stream(
+                    **request_params, **self._call_policies[op_spec.operation_id].request_kwargs
+                )
+                with self._track_sending(op_spec.operation_id, timer):
+                    api_response = stream.__enter__()
+                try:
+                    return self._process_streamed_response(
+                        StreamedResponse, request, stream, api_response
+                    )
+                except BaseException:
+                    stream.__exit__(None, None, None)
+                    raise
+            cache_key, cached = self._get_cached(request, request_params)
+            if cached is not None and cached.is_fresh():
+                return cached.response
+            api_response = self._send(op_spec.operation_id, request_params, timer)
+            return self._process_response(request, api_response, cache_key, cached, timer)
+
+        return _set_docstring(operation, op_spec)
+
+    def _prepare_request(
+        self,
+        op_spec: OperationSpec,
+        *args,
+        body_: Optional[Union[dict, list]] = None,
+        headers_: Optional[dict] = None,
+        **kwargs,
+    ) -> Tuple[ClientOpenAPIRequest, dict]:
+        """Builds the OpenAPI request and the arguments for the HTTP client call."""
+        request_headers = self.common_headers.copy()
+        request_headers.update(headers_ or {})
+        request = self.request_class(
+            self.server_url, op_spec, self._request_templates[op_spec.operation_id]
+        )
+        request.prepare(*args, body_=body_, headers_=request_headers, **kwargs)
+        request_params = {
+            "method": request.method,
+            "url": request.url,
+            "headers": request.headers,
+        }
+        if request.body:
+            request_params[
+                "json" if "json" in cast(str, request.mimetype) else "data"
+            ] = request.body
+        return request, request_params
+
+    def _send(self, operation_id: str, request_params: dict, timer: PhaseTimer) -> Any:
+        """Sends a request, retrying it according to the call policy of the operation."""
+        policy = self._call_policies[operation_id]
+        if policy.retry is not None:
+            policy.retry.record_call()
+        attempt = 0
+        while True:
+            attempt += 1
+            if policy.circuit_breaker is not None:
+                policy.circuit_breaker.before_call(operation_id)
+            try:
+                with self._track_sending(operation_id, timer):
+                    api_response = self.client.request(
+                        **request_params, **policy.request_kwargs
+                    )
+            except Exception as ex:
+                delay = self._get_retry_delay(operation_id, request_params, attempt, error=ex)
+                if delay is None:
+                    raise
+            except BaseException:  # e.g. cancelled, with no outcome to record
+                if policy.circuit_breaker is not None:
+                    policy.circuit_breaker.record_cancellation()
+                raise
+            else:
+                delay = self._get_retry_delay(
+                    operation_id, request_params, attempt, api_response=api_response
+                )
+                if delay is None:
+                    return api_response
+            time.sleep(delay)
+
+    def _get_retry_delay(
+        self,
+        operation_id: str,
+        request_params: dict,
+        attempt: int,
+        *,
+        api_response: Any = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """Records the outcome of an attempt and decides whether to retry the request.
+
+        Errors and server error responses count as failures for the circuit breaker.
+        """
+        policy = self._call_policies[operation_id]
+        status_code: Optional[int] = None
+        retry_after: Optional[str] = None
+        if api_response is not None:
+            status_code = api_response.status_code
+            retry_after = api_response.headers.get("retry-after")
+        if policy.circuit_breaker is not None:
+            if status_code is None or status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                policy.circuit_breaker.record_failure()
+            else:
+                policy.circuit_breaker.record_success()
+        if policy.retry is None:
+            return None
+        delay = policy.retry.get_delay(
+            request_params["method"],
+            attempt,
+            status_code=status_code,
+            error=error,
+            retry_after=retry_after,
+        )
+        if delay is not None and self.metrics is not None:
+            self.metrics.observe_retry(operation_id)
+        return delay
+
+    def _start_timer(self, operation_id: str) -> PhaseTimer:
+        """Starts measuring the phases of a call, if the metrics are enabled."""
+        return NULL_TIMER if self.metrics is None else PhaseTimer(self.metrics, operation_id)
+
+    @contextmanager
+    def _track_sending(self, operation_id: str, timer: PhaseTimer):
+        """Reports the requests in flight, the errors and the duration of sending a request."""
+        metrics = self.metrics
+        if metrics is None:
+            yield
+            return
+        metrics.observe_in_flight(self._update_in_flight(1))
+        try:
+            yield
+        except Exception as ex:
+            metrics.observe_error(operation_id, ex)
+            raise
+        finally:
+            metrics.observe_in_flight(self._update_in_flight(-1))
+        timer.lap(phases.SEND)
+
+    def _update_in_flight(self, change: int) -> int:
+        with self._in_flight_lock:
+            self._in_flight += change
+            return self._in_flight
+
+    def pool_stats(self) -> Optional[PoolStats]:
+        """Returns the numbers of connections in the pool of the HTTP client.
+
+        Returns `None` if the client is not an `httpx` client with the default transport.
+        """
+        return get_pool_stats(self.client)
+
+    def _get_cached(
+        self, request: ClientOpenAPIRequest, request_params: dict
+    ) -> Tuple[Optional[str], Optional[CacheEntry]]:
+        """Looks up the cached response to a request of a safe method.
+
+        Returns the cache key, or `None` if the response is not cacheable, and the
+        cached entry, if any. If the entry is stale, the request is made conditional.
+        """
+        if self.cache is None or request.method not in SAFE_METHODS:
+            return None, None
+        cache_key = get_cache_key(request_params)
+        cached = self.cache.get(cache_key)
+        if cached is not None and cached.etag and not cached.is_fresh():
+            request_params["headers"] = {
+                **request_params["headers"],
+                "If-None-Match": cached.etag,
             }
-            if request.body:
-                request_params["json" if "json" in request.mimetype else "data"] = request.body
-            api_response = self.client.request(**request_params)
-            api_response.raise_for_status()
-            response = self.response_factory(api_response)
-            self.validator.validate(request, response).raise_for_errors()
-            return response
-
-        operation.__doc__ = op_spec.spec.get("summary") or op_spec.operation_id
-        if description := op_spec.spec.get("description"):
-            operation.__doc__ = f"{ operation.__doc__ }\n\n{ description }"
-        return operation
+        return cache_key, cached
+
+    def _process_response(
+        self,
+        request: ClientOpenAPIRequest,
+        api_response: Any,
+        cache_key: Optional[str] = None,
+        cached: Optional[CacheEntry] = None,
+        timer: PhaseTimer = NULL_TIMER,
+    ) -> OpenAPIResponse:
+        """Checks the status of the HTTP client response and validates it.
+
+        A `304 Not Modified` response to a revalidated request returns the cached
+        response, and cacheable responses are stored in the cache.
+        """
+        if self.metrics is not None:
+            self.metrics.observe_response(request.spec.operation_id, api_response.status_code)
+        if cached is not None and api_response.status_code == HTTPStatus.NOT_MODIFIED:
+            self._update_cache(
+                cache_key,  # type: ignore
+                CacheEntry.create(cached.response, api_response.headers, etag=cached.etag),
+            )
+            return cached.response
+        api_response.raise_for_status()
+        response = self.response_factory(api_response)
+        operation_id = request.spec.operation_id
+        policy = self._response_validation
+        if policy is not None and policy.should_validate(operation_id):
+            try:
+                self._validators[operation_id].validate(request, response).raise_for_errors()
+            except OpenAPIError as ex:
+                self._handle_validation_error(policy, operation_id, ex)
+        timer.lap(phases.VALIDATE)
+        if cache_key is not None:
+            self._update_cache(cache_key, CacheEntry.create(response, api_response.headers))
+        return response
+
+    def _handle_validation_error(
+        self, policy: ValidationPolicy, operation_id: str, error: OpenAPIError
+    ):
+        """Reports a response validation error to the metrics and the policy."""
+        if self.metrics is not None:
+            self.metrics.observe_validation_error(operation_id)
+        policy.handle_error(operation_id, error)
+
+    def _update_cache(self, cache_key: str, entry: Optional[CacheEntry]):
+        """Stores a cache entry, or removes the stale one if the response is not cacheable."""
+        if entry is None:
+            self.cache.delete(cache_key)  # type: ignore
+        else:
+            self.cache.set(cache_key, entry)  # type: ignore
+
+    def _process_streamed_response(
+        self,
+        response_class: Type[BaseStreamedResponse],
+        request: ClientOpenAPIRequest,
+        stream: Any,
+        api_response: Any,
+    ) -> BaseStreamedResponse:
+        """Checks the status and content type of a streamed response before its body is read.
+
+        The body is decoded as JSON items if the spec defines it as an array, and
+        the items are validated as they are read.
+        """
+        operation_id = request.spec.operation_id
+        if self.metrics is not None:
+            self.metrics.observe_response(operation_id, api_response.status_code)
+        api_response.raise_for_status()
+        validator = self._validators[operation_id]
+        mimetype, *_ = api_response.headers.get("content-type", "").split(";")
+        response = OpenAPIResponse(
+            data=b"", status_code=api_response.status_code, mimetype=mimetype.strip()
+        )
+        policy = self._response_validation
+        validate = policy is not None and policy.should_validate(operation_id)
+
+        try:
+            media_type = validator.find_media_type(response)
+        except OpenAPIError as ex:
+            if validate:
+                self._handle_validation_error(policy, operation_id, ex)  # type: ignore
+            media_type = None
+
+        json_items = (
+            media_type is not None
+            and is_json(mimetype)
+            and "schema" in media_type
+            and (media_type / "schema").getkey("type") == "array"
+        )
+        if not (json_items and validate):
+            return response_class(stream, api_response, json_items=json_items)
+
+        def validate_item(item):
+            try:
+                validator.validate_item(media_type, item)
+            except OpenAPIError as ex:
+                self._handle_validation_error(policy, operation_id, ex)  # type: ignore
+
+        return response_class(
+            stream, api_response, json_items=True, validate_item=validate_item
+        )
+
+    def batch(
+        self,
+        operation: Callable,
+        items: Iterable,
+        *,
+        concurrency: int = 16,
+        ordered: bool = True,
+    ) -> Iterator[BatchResult]:
+        """Calls an operation for each of the items, running the calls concurrently.
+
+        Arguments:
+            operation: An operation method of this client.
+            items: Arguments of the individual calls; a tuple is passed as positional
+                arguments, a dict as keyword arguments, and anything else as the
+                single positional argument.
+            concurrency: The maximum number of calls in progress at the same time.
+            ordered: If `True`, the results are returned in the order of the items,
+                otherwise as the calls complete.
+
+        Returns:
+            An iterator of `BatchResult`, one for each item. An error raised by a call
+            is stored in its result and does not stop the rest of the batch.
+        """
+        if concurrency < 1:
+            raise ValueError("The concurrency must be at least 1.")
+
+        def call(position: int, item: Any) -> BatchResult:
+            args, kwargs = _get_call_arguments(item)
+            try:
+                return BatchResult(position, item, response=operation(*args, **kwargs))
+            except Exception as ex:
+                return BatchResult(position, item, error=ex)
+
+        def schedule(count: int) -> list:
+            return [executor.submit(call, *item) for item in islice(items_iter, count)]
+
+        items_iter = enumerate(items)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if ordered:
+                queue = deque(schedule(concurrency))
+                while queue:
+                    result = queue.popleft().result()
+                    queue.extend(schedule(1))
+                    yield result
+            else:
+                pending = set(schedule(concurrency))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.update(schedule(len(done)))
+                    for future in done:
+                        yield future.result()
 
     @classmethod
-    def from_file(cls, path: Union[Path, str], **kwargs):
-        """Creates an instance of the class by loading the spec from a local file."""
-        spec = get_spec_from_file(path)
+    def from_file(
+        cls,
+        path: Union[Path, str],
+        *,
+        spec_cache_dir: Optional[Union[Path, str]] = None,
+        **kwargs,
+    ):
+        """Creates an instance of the class by loading the spec from a local file.
+
+        The parsed spec is cached in `spec_cache_dir`, if given; see `pyotr.utils.load_spec`.
+        """
+        spec = load_spec(path, cache_dir=spec_cache_dir)
         return cls(spec, **kwargs)
+
+
+class AsyncRequestable(Protocol):  # pragma: no cover
+    """Defines the asynchronous `request` method compatible with `httpx.AsyncClient`."""
+
+    async def request(self, method: str, url: str, **kwargs) -> Any:
+        """Construct and send a `Request`."""
+        ...
+
+
+class AsyncClient(Client):
+    """Pyotr asynchronous client class.
+
+    The operation methods are coroutines, sending requests through a shared
+    `httpx.AsyncClient` which keeps the connections alive in a pool.
+    """
+
+    def __init__(
+        self,
+        spec: Union[SpecPath, dict],
+        *,
+        client: Optional[AsyncRequestable] = None,
+        limits: httpx.Limits = httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        http2: bool = False,
+        **kwargs,
+    ):
+        super().__init__(
+            spec,
+            client=client or httpx.AsyncClient(limits=limits, http2=http2),  # type: ignore
+            **kwargs,
+        )
+
+    @staticmethod
+    def _get_operation(op_spec: OperationSpec):
+        async def operation(
+            self,
+            *args,
+            body_: Optional[Union[dict, list]] = None,
+            headers_: Optional[dict] = None,
+            stream_: bool = False,
+            **kwargs,
+        ):
+            timer = self._start_timer(op_spec.operation_id)
+            request, request_params = self._prepare_request(
+                op_spec, *args, body_=body_, headers_=headers_, **kwargs
+            )
+            timer.lap(phases.PREPARE)
+            if stream_:
+                stream = self.client.stream(
+                    **request_params, **self._call_policies[op_spec.operation_id].request_kwargs
+                )
+                with self._track_sending(op_spec.operation_id, timer):
+                    api_response = await stream.__aenter__()
+                try:
+                    return self._process_streamed_response(
+                        AsyncStreamedResponse, request, stream, api_response
+                    )
+                except BaseException:
+                    await stream.__aexit__(None, None, None)
+                    raise
+            cache_key, cached = self._get_cached(request, request_params)
+            if cached is not None and cached.is_fresh():
+                return cached.response
+            api_response = await self._send(op_spec.operation_id, request_params, timer)
+            return self._process_response(request, api_response, cache_key, cached, timer)
+
+        return _set_docstring(operation, op_spec)
+
+    async def _send(  # type: ignore[override]
+        self, operation_id: str, request_params: dict, timer: PhaseTimer
+    ) -> Any:
+        """Sends a request, retrying it according to the call policy of the operation."""
+        policy = self._call_policies[operation_id]
+        if policy.retry is not None:
+            policy.retry.record_call()
+        attempt = 0
+        while True:
+            attempt += 1
+            if policy.circuit_breaker is not None:
+                policy.circuit_breaker.before_call(operation_id)
+            try:
+                with self._track_sending(operation_id, timer):
+                    api_response = await self.client.request(
+                        **request_params, **policy.request_kwargs
+                    )
+            except Exception as ex:
+                delay = self._get_retry_delay(operation_id, request_params, attempt, error=ex)
+                if delay is None:
+                    raise
+            except BaseException:  # e.g. cancelled, with no outcome to record
+                if policy.circuit_breaker is not None:
+                    policy.circuit_breaker.record_cancellation()
+                raise
+            else:
+                delay = self._get_retry_delay(
+                    operation_id, request_params, attempt, api_response=api_response
+                )
+                if delay is None:
+                    return api_response
+            await asyncio.sleep(delay)
+
+    async def batch(  # type: ignore[override]
+        self,
+        operation: Callable,
+        items: Iterable,
+        *,
+        concurrency: int = 16,
+        ordered: bool = True,
+    ) -> AsyncIterator[BatchResult]:
+        """Calls an operation for each of the items, running the calls concurrently.
+
+        Works like `Client.batch`, except that it returns an asynchronous iterator
+        and the calls are run as tasks on the event loop.
+        """
+        if concurrency < 1:
+            raise ValueError("The concurrency must be at least 1.")
+
+        async def call(position: int, item: Any) -> BatchResult:
+            args, kwargs = _get_call_arguments(item)
+            try:
+                return BatchResult(position, item, response=await operation(*args, **kwargs))
+            except Exception as ex:
+                return BatchResult(position, item, error=ex)
+
+        def schedule(count: int) -> list:
+            return [asyncio.ensure_future(call(*item)) for item in islice(items_iter, count)]
+
+        items_iter = enumerate(items)
+        if ordered:
+            queue = deque(schedule(concurrency))
+            try:
+                while queue:
+                    result = await queue[0]
+                    queue.popleft()
+                    queue.extend(schedule(1))
+                    yield result
+            finally:
+                for task in queue:
+                    task.cancel()
+        else:
+            pending = set(schedule(concurrency))
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    pending.update(schedule(len(done)))
+                    for task in done:
+                        yield task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    async def aclose(self):
+        """Closes the underlying HTTP client and its connections."""
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncClient":
+        """Enters the client context."""
+        return self
+
+    async def __aexit__(self, *args):
+        """Closes the client on exiting the context."""
+        await self.aclose()
+
+
+def _get_call_arguments(item: Any) -> Tuple[tuple, dict]:
+    """Converts a batch item into the positional and keyword arguments of a call."""
+    if isinstance(item, tuple):
+        return item, {}
+    if isinstance(item, dict):
+        return (), item
+    return (item,), {}
+
+
+def _set_docstring(operation: Callable, op_spec: OperationSpec) -> Callable:
+    """Sets the operation docstring from its summary and description."""
+    operation.__doc__ = op_spec.spec.get("summary") or op_spec.operation_id
+    if description := op_spec.spec.get("description"):
+        operation.__doc__ = f"{ operation.__doc__ }\n\n{ description }"
+    return operation
@@ -0,0 +1,79 @@
+"""Client-side HTTP response caching."""
+from __future__ import annotations
+
+import time
+from typing import Any, Mapping, NamedTuple, Optional, Protocol
+
+SAFE_METHODS = frozenset(("get", "head", "options"))
+
+
+class CacheEntry(NamedTuple):
+    """A cached response with its validator and expiry time."""
+
+    response: Any
+    etag: Optional[str]
+    expires: float
+    size: int = 0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Checks whether the response can be used without revalidation."""
+        return (time.time() if now is None else now) < self.expires
+
+    @classmethod
+    def create(cls, response: Any, headers: Mapping, etag: Optional[str] = None):
+        """Creates an entry according to the response `Cache-Control` and `ETag` headers.
+
+        Returns `None` if the response may not be cached, or would be neither fresh
+        nor possible to revalidate.
+        """
+        directives = parse_cache_control(headers.get("cache-control", ""))
+        if "no-store" in directives:
+            return None
+        max_age = 0
+        if "no-cache" not in directives:
+            try:
+                max_age = max(int(directives.get("max-age", 0)), 0)
+            except ValueError:
+                pass
+        etag = headers.get("etag") or etag
+        if not max_age and not etag:
+            return None
+        data = getattr(response, "data", None)
+        return cls(
+            response=response,
+            etag=etag,
+            expires=time.time() + max_age,
+            size=len(data) if isinstance(data, (bytes, str)) else 0,
+        )
+
+
+class CacheBackend(Protocol):  # pragma: no cover
+    """Defines the interface of a response cache."""
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns the entry stored under the key, if any."""
+        ...
+
+    def set(self, key: str, entry: CacheEntry):
+        """Stores an entry under the key."""
+        ...
+
+    def delete(self, key: str):
+        """Removes the entry stored under the key, if any."""
+        ...
+
+
+def parse_cache_control(header: str) -> dict:
+    """Parses the directives of a `Cache-Control` header."""
+    directives: dict = {}
+    for directive in header.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') if value else True
+    return directives
+
+
+def get_cache_key(request_params: Mapping) -> str:
+    """Builds a cache key from the method, URL and headers of a request."""
+    headers = sorted((name.lower(), value) for name, value in request_params["headers"].items())
+    return f"{request_params['method'].upper()} {request_params['url']} {headers}"
@@ -0,0 +1,217 @@
+"""Client metrics."""
+from __future__ import annotations
+
+from collections import defaultdict
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+
+from pyotr.metrics import (
+    DEFAULT_DURATION_BUCKETS,
+    get_histogram,
+    Histogram,
+    render_histograms,
+    render_values,
+)
+
+PREPARE = "prepare"
+SEND = "send"
+VALIDATE = "validate"
+
+
+class ClientMetricsHook(Protocol):  # pragma: no cover
+    """Defines the interface for receiving the client metrics.
+
+    The phases of a call are `prepare` (building the request), `send` (sending the request
+    and receiving the response) and `validate` (creating and validating the OpenAPI response).
+    The methods may be called from several threads, so they need to be fast and thread-safe.
+    """
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase, in seconds."""
+        ...
+
+    def observe_response(self, operation_id: str, status_code: int):
+        """Records the status code of a response."""
+        ...
+
+    def observe_error(self, operation_id: str, error: Exception):
+        """Records an error raised while sending a request."""
+        ...
+
+    def observe_validation_error(self, operation_id: str):
+        """Records a failed response validation."""
+        ...
+
+    def observe_retry(self, operation_id: str):
+        """Records a retried request."""
+        ...
+
+    def observe_in_flight(self, count: int):
+        """Records the number of requests currently being sent by the client."""
+        ...
+
+
+class PoolStats(NamedTuple):
+    """Connections in the pool of an HTTP client."""
+
+    connections: int
+    idle: int
+    max_connections: Optional[int]
+
+
+class ClientMetricsCollector:
+    """In-memory aggregator of the client metrics.
+
+    The metrics can be exported in the Prometheus text format using `render`, or
+    dumped as a dict using `as_dict`.
+
+    Arguments:
+        duration_buckets: The upper bounds of the phase duration buckets, in seconds.
+        prefix: The prefix of the metric names.
+    """
+
+    def __init__(
+        self,
+        duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+        prefix: str = "pyotr_client",
+    ):
+        self.duration_buckets = tuple(duration_buckets)
+        self.prefix = prefix
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.validation_errors: Dict[Tuple[str], int] = defaultdict(int)
+        self.retries: Dict[Tuple[str], int] = defaultdict(int)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = Lock()
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase, in seconds."""
+        with self._lock:
+            get_histogram(self.durations, (operation_id, phase), self.duration_buckets).observe(
+                duration
+            )
+
+    def observe_response(self, operation_id: str, status_code: int):
+        """Records the status code of a response."""
+        with self._lock:
+            self.responses[operation_id, status_code] += 1
+
+    def observe_error(self, operation_id: str, error: Exception):
+        """Records an error raised while sending a request."""
+        with self._lock:
+            self.errors[operation_id, type(error).__name__] += 1
+
+    def observe_validation_error(self, operation_id: str):
+        """Records a failed response validation."""
+        with self._lock:
+            self.validation_errors[(operation_id,)] += 1
+
+    def observe_retry(self, operation_id: str):
+        """Records a retried request."""
+        with self._lock:
+            self.retries[(operation_id,)] += 1
+
+    def observe_in_flight(self, count: int):
+        """Records the number of requests currently being sent by the client."""
+        with self._lock:
+            self.in_flight = count
+            self.max_in_flight = max(self.max_in_flight, count)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Returns a snapshot of the metrics.
+
+        The phase durations are summarised by their count, total and mean, in seconds.
+        """
+        with self._lock:
+            durations: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+            for (operation_id, phase), histogram in self.durations.items():
+                durations[operation_id][phase] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count,
+                }
+            return {
+                "durations": dict(durations),
+                "responses": _group(self.responses),
+                "errors": _group(self.errors),
+                "validation_errors": {
+                    key[0]: count for key, count in self.validation_errors.items()
+                },
+                "retries": {key[0]: count for key, count in self.retries.items()},
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            render_histograms(
+                lines,
+                f"{self.prefix}_phase_duration_seconds",
+                "Duration of the phases of operation calls.",
+                ("operation_id", "phase"),
+                self.durations,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_responses_total",
+                "Number of responses by status code.",
+                ("operation_id", "status_code"),
+                self.responses,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_errors_total",
+                "Number of errors raised while sending requests, by type.",
+                ("operation_id", "error"),
+                self.errors,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_validation_errors_total",
+                "Number of failed response validations.",
+                ("operation_id",),
+                self.validation_errors,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_retries_total",
+                "Number of retried requests.",
+                ("operation_id",),
+                self.retries,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_requests_in_flight",
+                "Number of requests currently being sent.",
+                (),
+                {(): self.in_flight},
+                metric_type="gauge",
+            )
+        return "\n".join(lines) + "\n"
+
+
+def get_pool_stats(http_client: Any) -> Optional[PoolStats]:
+    """Inspects the connection pool of an `httpx` client.
+
+    Returns `None` if the client does not use the default `httpx` transport.
+    """
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return None
+    return PoolStats(
+        connections=len(connections),
+        idle=sum(1 for connection in connections if connection.is_idle()),
+        max_connections=getattr(pool, "_max_connections", None),
+    )
+
+
+def _group(values: Dict[Tuple[str, Any], int]) -> Dict[str, Dict[Any, int]]:
+    grouped: Dict[str, Dict[Any, int]] = defaultdict(dict)
+    for (operation_id, key), count in values.items():
+        grouped[operation_id][key] = count
+    return dict(grouped)
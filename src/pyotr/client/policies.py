@@ -0,0 +1,281 @@
+"""Timeout, retry and circuit breaker policies of client operations."""
+from __future__ import annotations
+
+import random
+import time
+from threading import Lock
+from typing import Any, Collection, Mapping, NamedTuple, Optional, Tuple, Type, Union
+
+import httpx
+from stringcase import snakecase
+
+TIMEOUT_EXTENSION = "x-pyotr-timeout"
+RETRY_EXTENSION = "x-pyotr-retry"
+CIRCUIT_BREAKER_EXTENSION = "x-pyotr-circuit-breaker"
+
+IDEMPOTENT_METHODS = frozenset(("get", "head", "options", "put", "delete", "trace"))
+RETRY_STATUS_CODES = frozenset((429, 502, 503, 504))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an operation while its circuit breaker is open."""
+
+
+class RetryBudget:
+    """Limits the retries to a fraction of the calls.
+
+    Each call adds `ratio` to the balance, up to `burst`, and each retry takes one
+    from it; when the balance is below one, failed calls are not retried. This
+    keeps the retries from multiplying the load on a service which is failing.
+
+    Arguments:
+        ratio: The number of retries allowed per call.
+        burst: The maximum number of retries allowed at once, also initially.
+    """
+
+    def __init__(self, ratio: float = 0.2, burst: int = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self._balance = float(burst)
+        self._lock = Lock()
+
+    def deposit(self):
+        """Records a call."""
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.burst)
+
+    def withdraw(self) -> bool:
+        """Records a retry, if the budget allows it."""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RetryPolicy:
+    """Defines which failed calls are retried and how long to wait before each retry.
+
+    The delays grow exponentially, with "full jitter": a random duration between
+    zero and `backoff_factor * 2 ** (retry - 1)`, capped at `max_backoff`. The
+    `Retry-After` header of a response is used instead, if present.
+
+    Arguments:
+        max_attempts: The maximum number of attempts, including the first call.
+        backoff_factor: The base of the delay between attempts, in seconds.
+        max_backoff: The maximum delay between attempts, in seconds.
+        status_codes: The response status codes which are retried.
+        methods: The HTTP methods which are retried; only idempotent ones by default.
+        errors: The exceptions raised by the HTTP client which are retried.
+        budget: An optional `RetryBudget`; it can be shared by several policies.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        backoff_factor: float = 0.1,
+        max_backoff: float = 10.0,
+        status_codes: Collection[int] = RETRY_STATUS_CODES,
+        methods: Collection[str] = IDEMPOTENT_METHODS,
+        errors: Tuple[Type[Exception], ...] = (httpx.TransportError,),
+        budget: Optional[RetryBudget] = None,
+    ):
+        if max_attempts < 1:
+            raise ValueError("The maximum number of attempts must be at least 1.")
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(method.lower() for method in methods)
+        self.errors = errors
+        self.budget = budget
+
+    @classmethod
+    def create(cls, config: Union[bool, Mapping, RetryPolicy, None]) -> Optional[RetryPolicy]:
+        """Creates a policy from a configuration; `None` means no retries.
+
+        The configuration is either a boolean flag or a mapping of the arguments,
+        whose names can also be in camel case, e.g. `maxAttempts`.
+        """
+        if isinstance(config, cls):
+            return config
+        return _create(cls, config)
+
+    def record_call(self):
+        """Records a call, adding to the retry budget."""
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def get_delay(
+        self,
+        method: str,
+        attempt: int,
+        *,
+        status_code: Optional[int] = None,
+        error: Optional[Exception] = None,
+        retry_after: Optional[str] = None,
+    ) -> Optional[float]:
+        """Decides whether to retry a failed attempt.
+
+        Returns:
+            The number of seconds to wait before the next attempt, or `None` if the
+            failure is not retried.
+        """
+        if attempt >= self.max_attempts or method.lower() not in self.methods:
+            return None
+        if error is not None:
+            if not isinstance(error, self.errors):
+                return None
+        elif status_code not in self.status_codes:
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+        try:
+            return min(float(retry_after), self.max_backoff)  # type: ignore
+        except (TypeError, ValueError):
+            return random.uniform(
+                0, min(self.backoff_factor * 2 ** (attempt - 1), self.max_backoff)
+            )
+
+
+class CircuitBreaker:
+    """Fails calls fast while an operation is consistently failing.
+
+    After `failure_threshold` consecutive failed attempts, the circuit opens and
+    calls raise `CircuitOpenError` without sending a request. Once `reset_timeout`
+    seconds have passed, a single trial call is let through: the circuit closes
+    again if it succeeds, and stays open for another period if it fails.
+
+    Arguments:
+        failure_threshold: The number of consecutive failures opening the circuit.
+        reset_timeout: The number of seconds the circuit stays open.
+    """
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = Lock()
+
+    @classmethod
+    def create(
+        cls, config: Union[bool, Mapping, CircuitBreaker, None]
+    ) -> Optional[CircuitBreaker]:
+        """Creates a circuit breaker from a configuration; `None` means no circuit breaker.
+
+        The configuration is either a boolean flag or a mapping of the arguments,
+        whose names can also be in camel case, e.g. `failureThreshold`.
+        """
+        if isinstance(config, cls):
+            return config
+        return _create(cls, config)
+
+    def copy(self) -> CircuitBreaker:
+        """Creates a closed circuit breaker with the same settings."""
+        return type(self)(
+            failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout
+        )
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the calls are currently failing fast."""
+        return self._opened_at is not None
+
+    def before_call(self, operation_id: str):
+        """Checks whether a call can be made.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"The circuit of {operation_id} is open.")
+            self._trial = True
+
+    def record_success(self):
+        """Records a successful attempt, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """Records a failed attempt, opening the circuit if there were too many."""
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def record_cancellation(self):
+        """Records an attempt interrupted before its outcome was known, e.g. cancelled.
+
+        It counts neither as a success nor as a failure, but an interrupted trial
+        call lets the next call through as a new trial.
+        """
+        with self._lock:
+            self._trial = False
+
+
+class CallPolicy(NamedTuple):
+    """The timeout, retry policy and circuit breaker of an operation."""
+
+    timeout: Optional[float] = None
+    retry: Optional[RetryPolicy] = None
+    circuit_breaker: Optional[CircuitBreaker] = None
+
+    @classmethod
+    def create(
+        cls,
+        operation: Mapping[str, Any],
+        defaults: Mapping[str, Any],
+        overrides: Optional[Mapping[str, Any]] = None,
+    ) -> CallPolicy:
+        """Creates the policy of an operation from its spec.
+
+        The settings are taken from the `overrides`, the `x-pyotr-timeout`,
+        `x-pyotr-retry` and `x-pyotr-circuit-breaker` extensions of the operation
+        spec, or the `defaults`, in this order. A `CircuitBreaker` instance in the
+        `defaults` is copied, while one in the `overrides` is used as is.
+        """
+        settings = dict(defaults)
+        if isinstance(settings.get("circuit_breaker"), CircuitBreaker):
+            # a default circuit breaker instance is a template, each operation has its own
+            settings["circuit_breaker"] = settings["circuit_breaker"].copy()
+        for name, extension in (
+            ("timeout", TIMEOUT_EXTENSION),
+            ("retry", RETRY_EXTENSION),
+            ("circuit_breaker", CIRCUIT_BREAKER_EXTENSION),
+        ):
+            value = operation.get(extension)
+            if value is not None:
+                settings[name] = value
+        settings.update(overrides or {})
+        unknown = set(settings) - set(cls._fields)
+        if unknown:
+            raise ValueError(f"Unknown operation settings: {', '.join(sorted(unknown))}")
+        return cls(
+            timeout=settings.get("timeout"),
+            retry=RetryPolicy.create(settings.get("retry")),
+            circuit_breaker=CircuitBreaker.create(settings.get("circuit_breaker")),
+        )
+
+    @property
+    def request_kwargs(self) -> dict:
+        """Additional arguments of the HTTP client calls."""
+        return {} if self.timeout is None else {"timeout": self.timeout}
+
+
+def _create(cls, config: Any):
+    if config is None or config is False:
+        return None
+    kwargs = {} if config is True else {snakecase(key): value for key, value in config.items()}
+    try:
+        return cls(**kwargs)
+    except TypeError as ex:
+        raise ValueError(f"Invalid {cls.__name__} configuration: {config}") from ex
@@ -0,0 +1,206 @@
+"""Streamed client responses."""
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from enum import Enum
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITERS = frozenset(" \t\n\r,]")
+
+
+class _ArrayState(Enum):
+    START = "start"
+    FIRST = "first"
+    VALUE = "value"
+    SEPARATOR = "separator"
+    END = "end"
+
+
+class JSONArrayDecoder:
+    """Incrementally decodes the items of a JSON array from chunks of text.
+
+    Only the text of the item currently being decoded is kept in memory.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = _ArrayState.START
+
+    def feed(self, text: str, final: bool = False) -> List[Any]:
+        """Adds a chunk of text and returns the items completed by it.
+
+        Raises:
+            ValueError: If the text is not a valid JSON array.
+        """
+        buffer = self._buffer + text
+        position = 0
+        items = []
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()  # type: ignore
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if self._state is _ArrayState.START:
+                if char != "[":
+                    raise ValueError("The response body is not a JSON array.")
+                position += 1
+                self._state = _ArrayState.FIRST
+            elif self._state is _ArrayState.FIRST and char == "]":
+                position += 1
+                self._state = _ArrayState.END
+            elif self._state in (_ArrayState.FIRST, _ArrayState.VALUE):
+                try:
+                    item, end = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # a value not followed by a delimiter, e.g. a number, may be incomplete
+                next_char = buffer[end] if end < len(buffer) else ""
+                if next_char not in _DELIMITERS:
+                    if not final:
+                        break
+                    if next_char:
+                        raise ValueError(
+                            f"Unexpected character {next_char!r} in the JSON array."
+                        )
+                items.append(item)
+                position = end
+                self._state = _ArrayState.SEPARATOR
+            elif self._state is _ArrayState.SEPARATOR and char in ",]":
+                position += 1
+                self._state = _ArrayState.VALUE if char == "," else _ArrayState.END
+            else:
+                raise ValueError(f"Unexpected character {char!r} in the JSON array.")
+
+        self._buffer = buffer[position:]
+        if final and self._state is not _ArrayState.END:
+            raise ValueError("Incomplete JSON array.")
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decodes the items of a JSON array from an iterable of byte chunks."""
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    array_decoder = JSONArrayDecoder()
+    for chunk in chunks:
+        yield from array_decoder.feed(text_decoder.decode(chunk))
+    yield from array_decoder.feed(text_decoder.decode(b"", final=True), final=True)
+
+
+async def aiter_json_array(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """Decodes the items of a JSON array from an asynchronous iterable of byte chunks."""
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    array_decoder = JSONArrayDecoder()
+    async for chunk in chunks:
+        for item in array_decoder.feed(text_decoder.decode(chunk)):
+            yield item
+    for item in array_decoder.feed(text_decoder.decode(b"", final=True), final=True):
+        yield item
+
+
+class BaseStreamedResponse:
+    """Client response with a body that is read while it is being iterated.
+
+    Iterating yields the items of a JSON array body if the spec defines the
+    response as an array, otherwise the raw chunks of the body. The response
+    is closed once it has been iterated, or on leaving it as a context manager.
+    """
+
+    def __init__(
+        self,
+        stream: Any,
+        response: Any,
+        *,
+        json_items: bool = False,
+        validate_item: Optional[Callable[[Any], Any]] = None,
+    ):
+        self._stream = stream
+        self._response = response
+        self._json_items = json_items
+        self._validate_item = validate_item
+        self._closed = False
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.mimetype = response.headers.get("content-type")
+
+
+class StreamedResponse(BaseStreamedResponse):
+    """Streamed response of the synchronous client."""
+
+    def __iter__(self) -> Iterator:
+        """Iterates over the response body."""
+        try:
+            chunks = self._response.iter_bytes()
+            if not self._json_items:
+                yield from chunks
+                return
+            for item in iter_json_array(chunks):
+                if self._validate_item is not None:
+                    self._validate_item(item)
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Closes the response."""
+        if not self._closed:
+            self._closed = True
+            self._stream.__exit__(None, None, None)
+
+    def __enter__(self) -> StreamedResponse:
+        """Enters the response context."""
+        return self
+
+    def __exit__(self, *args):
+        """Closes the response on exiting the context."""
+        self.close()
+
+
+class AsyncStreamedResponse(BaseStreamedResponse):
+    """Streamed response of the asynchronous client."""
+
+    def __aiter__(self) -> AsyncIterator:
+        """Iterates over the response body."""
+        return self._aiter()
+
+    async def _aiter(self) -> AsyncIterator:
+        try:
+            chunks = self._response.aiter_bytes()
+            if not self._json_items:
+                async for chunk in chunks:
+                    yield chunk
+                return
+            async for item in aiter_json_array(chunks):
+                if self._validate_item is not None:
+                    self._validate_item(item)
+                yield item
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        """Closes the response."""
+        if not self._closed:
+            self._closed = True
+            await self._stream.__aexit__(None, None, None)
+
+    async def __aenter__(self) -> AsyncStreamedResponse:
+        """Enters the response context."""
+        return self
+
+    async def __aexit__(self, *args):
+        """Closes the response on exiting the context."""
+        await self.aclose()
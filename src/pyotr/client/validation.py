@@ -1,57 +1,89 @@
 """Pyotr API client."""
 from __future__ import annotations
 
-from string import Formatter
-from typing import Mapping, Optional
+import json
+from functools import cached_property
+from typing import Any, Mapping, NamedTuple, Optional, Tuple, Union
 from urllib.parse import parse_qs, urlencode, urljoin, urlsplit, urlunsplit
 
 from openapi_core.validation.request.datatypes import OpenAPIRequest, RequestParameters
 from openapi_core.validation.response.datatypes import OpenAPIResponse
 from requests import Response
 
+from pyotr.utils import is_json, OperationSpec
+from pyotr.validation import DeserializedOpenAPIResponse
+
+
+class RequestTemplate(NamedTuple):
+    """The parts of an operation request that are the same for each call."""
+
+    url_prefix: str
+    path_pattern: str
+    full_url_pattern: str
+    method: str
+    url_vars: Tuple[str, ...]
+    server_query: Mapping
+    mimetype: Optional[str]
+
+    @classmethod
+    def compile(cls, host_url: str, op_spec: OperationSpec) -> RequestTemplate:
+        """Creates the request template for an operation on a server."""
+        url_parts = urlsplit(host_url)
+        path_pattern = url_parts.path + op_spec.path
+
+        mimetype = None
+        media_types = op_spec.request_media_types
+        default_mimetype = "application/json"
+        if media_types:
+            mimetype = default_mimetype if default_mimetype in media_types else media_types[0]
+
+        return cls(
+            url_prefix=urlunsplit((url_parts.scheme, url_parts.netloc, "", "", "")),
+            path_pattern=path_pattern,
+            full_url_pattern=urljoin(host_url, path_pattern),
+            method=op_spec.method,
+            url_vars=op_spec.path_vars,
+            server_query=parse_qs(url_parts.query),
+            mimetype=mimetype,
+        )
+
 
 class ClientOpenAPIRequest(OpenAPIRequest):
     """Client request."""
 
-    def __init__(self, host_url: str, op_spec):
+    def __init__(
+        self, host_url: str, op_spec: OperationSpec, template: Optional[RequestTemplate] = None
+    ):
+        if template is None:
+            template = RequestTemplate.compile(host_url, op_spec)
         self.spec = op_spec
-        self._url_parts = urlsplit(host_url)
-        self.mimetype = None
-
-        formatter = Formatter()
-        self.url_vars = [
-            var for _, var, _, _ in formatter.parse(op_spec.path) if var is not None
-        ]
-        self._path_pattern = self._url_parts.path + op_spec.path
-
-        self.full_url_pattern = urljoin(host_url, self._path_pattern)
-        self.method = op_spec.method.lower()
-        self.body: Mapping = {}
+        self.template = template
+        self.mimetype = template.mimetype
+        self.url_vars = template.url_vars
+        self.full_url_pattern = template.full_url_pattern
+        self.method = template.method
+        self.body: Union[Mapping, list] = {}
         self.parameters = RequestParameters(
             path={},
-            query=parse_qs(self._url_parts.query),
+            query=dict(template.server_query),
             header={},
             cookie={},
         )
-        content = getattr(op_spec, "request_body", {}).get("content", {})
-        default_mimetipe = "application/json"
-        if content:
-            self.mimetype = (
-                default_mimetipe if default_mimetipe in content else list(content)[0]
-            )
 
     @property
     def url(self):
         """Request URL."""
-        url_parts = self._url_parts._asdict()
-        url_parts["path"] = self._path_pattern.format(**self.parameters.path)
-        url_parts["query"] = urlencode(self.parameters.query)
-        return urlunsplit(tuple(url_parts.values()))
+        url = self.template.url_prefix + self.template.path_pattern.format(
+            **self.parameters.path
+        )
+        if self.parameters.query:
+            url = f"{url}?{urlencode(self.parameters.query)}"
+        return url
 
     def prepare(
         self,
         *args,
-        body_: Optional[Mapping] = None,
+        body_: Optional[Union[Mapping, list]] = None,
         headers_: Optional[Mapping] = None,
         **kwargs,
     ) -> ClientOpenAPIRequest:
@@ -95,8 +127,32 @@ class ClientOpenAPIRequest(OpenAPIRequest):
         return self.parameters.header
 
 
+class JSONOpenAPIResponse(DeserializedOpenAPIResponse):
+    """Client response with a JSON body.
+
+    The `data` is the raw body; it is decoded once, when first needed either
+    for validation or by calling `json`.
+    """
+
+    @cached_property
+    def deserialized_data(self) -> Any:
+        """The decoded JSON body."""
+        return json.loads(self.data)
+
+    def json(self) -> Any:
+        """Returns the decoded JSON body."""
+        return self.deserialized_data
+
+
 def client_response_factory(response: Response) -> OpenAPIResponse:
     """Create client response."""
+    mimetype = response.headers.get("content-type")
+    if response.content and is_json(mimetype):
+        return JSONOpenAPIResponse(
+            data=response.content,
+            status_code=response.status_code,
+            mimetype=mimetype,
+        )
     return OpenAPIResponse(
         data=response.content,
         status_code=response.status_code,
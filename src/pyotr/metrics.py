@@ -0,0 +1,150 @@
+"""Metrics shared by the client and the server."""
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+DEFAULT_DURATION_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class PhaseObserver(Protocol):  # pragma: no cover
+    """Defines the method receiving the durations of phases."""
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase, in seconds."""
+        ...
+
+
+class PhaseTimer:
+    """Measures the consecutive phases of a call to an operation."""
+
+    def __init__(self, metrics: PhaseObserver, operation_id: str):
+        self.metrics = metrics
+        self.operation_id = operation_id
+        self._started_at = time.perf_counter()
+
+    def lap(self, phase: str):
+        """Records the time since the end of the previous phase as the given one."""
+        now = time.perf_counter()
+        self.metrics.observe_phase(self.operation_id, phase, now - self._started_at)
+        self._started_at = now
+
+
+class NullPhaseTimer(PhaseTimer):
+    """Phase timer used when the metrics are disabled."""
+
+    def __init__(self):
+        pass
+
+    def lap(self, phase: str):
+        """Does nothing."""
+
+
+NULL_TIMER = NullPhaseTimer()
+
+
+class Histogram:
+    """Counts of observed values in cumulative buckets, as defined by Prometheus."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Adds a value to the histogram."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[Tuple[str, int]]:
+        """Returns the upper bounds of the buckets with the number of values within each."""
+        bounds = [_format_value(bucket) for bucket in self.buckets] + ["+Inf"]
+        cumulative = []
+        total = 0
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+def get_histogram(
+    histograms: Dict[Any, Histogram],
+    key: Tuple,
+    buckets: Sequence[float],
+) -> Histogram:
+    """Returns the histogram stored under the key, creating it if needed."""
+    histogram: Optional[Histogram] = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram(buckets)
+    return histogram
+
+
+def render_histograms(
+    lines: List[str],
+    name: str,
+    description: str,
+    label_names: Sequence[str],
+    histograms: Mapping[Any, Histogram],
+):
+    """Appends histograms in the Prometheus text format to the lines."""
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for label_values, histogram in sorted(histograms.items(), key=_sort_key):
+        labels = format_labels(dict(zip(label_names, label_values)))
+        for bound, count in histogram.cumulative_counts():
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def render_values(
+    lines: List[str],
+    name: str,
+    description: str,
+    label_names: Sequence[str],
+    values: Mapping[Any, Any],
+    metric_type: str = "counter",
+):
+    """Appends counters or gauges in the Prometheus text format to the lines."""
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for label_values, value in sorted(values.items(), key=_sort_key):
+        labels = format_labels(dict(zip(label_names, label_values)))
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+
+def format_labels(labels: Mapping[str, Hashable]) -> str:
+    """Formats the labels of a metric, escaping their values."""
+    return ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items())
+
+
+def _sort_key(item: tuple) -> tuple:
+    return tuple(str(value) for value in item[0])
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
@@ -0,0 +1,567 @@
+"""Schemas compiled into Python functions.
+
+openapi-core checks a value against a schema by interpreting the schema with
+jsonschema, and then walks the schema again to unmarshal the value, creating and
+running new validators for each nested object and array. For large bodies, this is
+where most of the validation time is spent.
+
+`SchemaCompiler` generates the source code of a specialised function for each schema
+instead, checking a value and building its unmarshalled copy in a single pass. The
+compiled functions only tell valid values from invalid ones; the values they reject
+are passed to the openapi-core unmarshaller, which reports the errors exactly as
+before. Schemas with keywords or references the compiler does not support are not
+compiled, and always unmarshalled by openapi-core.
+"""
+from __future__ import annotations
+
+import re
+from threading import Lock
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from openapi_core.spec.paths import SpecPath
+from openapi_core.types import NoValue
+from openapi_core.unmarshalling.schemas.enums import UnmarshalContext
+from openapi_core.unmarshalling.schemas.factories import SchemaUnmarshallersFactory
+
+ANNOTATIONS = frozenset({"description", "title", "example", "externalDocs", "xml"})
+COMMON_KEYWORDS = ANNOTATIONS | {
+    "type",
+    "format",
+    "nullable",
+    "enum",
+    "default",
+    "readOnly",
+    "writeOnly",
+    "deprecated",
+}
+NUMBER_KEYWORDS = frozenset(
+    {"minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "multipleOf"}
+)
+TYPE_KEYWORDS = {
+    "string": frozenset({"minLength", "maxLength", "pattern"}),
+    "integer": NUMBER_KEYWORDS,
+    "number": NUMBER_KEYWORDS,
+    "boolean": frozenset(),
+    "array": frozenset({"items", "minItems", "maxItems"}),
+    "object": frozenset(
+        {"properties", "required", "additionalProperties", "minProperties", "maxProperties"}
+    ),
+}
+REFERENCE_KEYWORDS = ANNOTATIONS | {"$ref", "nullable", "default", "deprecated"}
+
+# formats whose unmarshalling returns valid values unchanged
+IDENTITY_FORMATS = {
+    "string": (None, "password"),
+    "integer": (None, "int32", "int64"),
+    "number": (None, "float", "double"),
+    "boolean": (None,),
+}
+TYPE_CHECKS = {
+    "string": "type({0}) is not str",
+    "integer": "type({0}) is not int",
+    "number": "(type({0}) is not int and type({0}) is not float)",
+    "boolean": "type({0}) is not bool",
+    "array": "type({0}) is not list",
+    "object": "type({0}) is not dict",
+}
+FLOAT_TYPE_CHECK = "type({0}) is not float"
+INVALID_ACCESS = {UnmarshalContext.REQUEST: "readOnly", UnmarshalContext.RESPONSE: "writeOnly"}
+
+_MISSING = object()
+
+
+class InvalidValue(Exception):
+    """Raised by the compiled functions for values not conforming to their schema."""
+
+
+class UnsupportedSchema(Exception):
+    """Raised for schemas the compiler cannot translate exactly."""
+
+
+def _in_enum(value: Any, enum: List[Any]) -> bool:
+    """Checks a value against the `enum` keyword, telling booleans from numbers."""
+    if value is True or value is False:
+        return any(item is value for item in enum)
+    return any(item == value and item is not True and item is not False for item in enum)
+
+
+def _is_multiple_of(value: Any, multiple_of: Any) -> bool:
+    """Checks a number against the `multipleOf` keyword, as jsonschema does."""
+    if isinstance(multiple_of, float):
+        quotient = value / multiple_of
+        return int(quotient) == quotient
+    return not value % multiple_of
+
+
+class CompiledUnmarshaller:
+    """Unmarshals values with a compiled function, falling back to openapi-core.
+
+    The openapi-core unmarshaller handles the values rejected by the compiled function,
+    raising the same errors as it would without it, and the missing and null values.
+    It is only created when first needed.
+    """
+
+    __slots__ = ("function", "schema", "unmarshallers_factory", "_unmarshaller")
+
+    def __init__(
+        self,
+        function: Callable[[Any], Any],
+        schema: SpecPath,
+        unmarshallers_factory: SchemaUnmarshallersFactory,
+    ):
+        self.function = function
+        self.schema = schema
+        self.unmarshallers_factory = unmarshallers_factory
+        self._unmarshaller: Optional[Callable[[Any], Any]] = None
+
+    def __call__(self, value: Any = NoValue) -> Any:
+        """Unmarshals a value."""
+        if value is not None and value is not NoValue:
+            try:
+                return self.function(value)
+            except Exception:  # reported by the openapi-core unmarshaller
+                pass
+        return self.unmarshaller(value)
+
+    @property
+    def unmarshaller(self) -> Callable[[Any], Any]:
+        """The openapi-core unmarshaller of the schema."""
+        if self._unmarshaller is None:
+            self._unmarshaller = self.unmarshallers_factory.create(self.schema)
+        return self._unmarshaller
+
+
+class SchemaCompiler:
+    """Compiles the schemas of a spec into Python functions validating and unmarshalling values.
+
+    The functions of each schema are shared by all the schemas referencing it, so
+    a single compiler should be used for all the operations of a spec; use
+    `get_schema_compiler` to get the one bound to a spec and a validation context.
+
+    Arguments:
+        unmarshallers_factory: The factory of the openapi-core unmarshallers, which
+            provides the validation context and the custom formatters.
+    """
+
+    def __init__(self, unmarshallers_factory: SchemaUnmarshallersFactory):
+        self.context = unmarshallers_factory.context
+        self.format_checker = unmarshallers_factory.format_checker
+        self.custom_formatters = unmarshallers_factory.custom_formatters
+        # the keyword making a value invalid in the validation context
+        self._invalid_access = INVALID_ACCESS.get(self.context)
+        self._namespace: Dict[str, Any] = {
+            "_INVALID": InvalidValue,
+            "_fc": self.format_checker,
+            "_MISSING": _MISSING,
+            "_in_enum": _in_enum,
+            "_is_multiple_of": _is_multiple_of,
+        }
+        self._functions: Dict[int, str] = {}
+        self._schemas: List[dict] = []
+        self._sources: List[str] = []
+        self._counter = 0
+        self._root: Any = None
+        self._lock = Lock()
+
+    def compile(self, schema: SpecPath) -> Optional[Callable[[Any], Any]]:
+        """Compiles a schema into a function returning the unmarshalled value.
+
+        The function raises an exception if the value is not valid, or is `None`.
+
+        Returns:
+            The compiled function, or `None` if the schema is not supported.
+        """
+        with self._lock:
+            functions, sources = dict(self._functions), len(self._sources)
+            self._root = schema.accessor.dict_or_list
+            try:
+                with schema.open() as schema_dict:
+                    name = self._get_function(schema_dict)
+            except UnsupportedSchema:
+                self._functions = functions
+                del self._sources[sources:]
+                return None
+            finally:
+                self._root = None
+            if len(self._sources) > sources:
+                exec("\n".join(self._sources[sources:]), self._namespace)  # nosec
+            return self._namespace[name]
+
+    def get_source(self) -> str:
+        """Returns the source code of all the compiled functions."""
+        return "\n".join(self._sources)
+
+    def _get_name(self, prefix: str) -> str:
+        self._counter += 1
+        return f"_{prefix}{self._counter}"
+
+    def _add_constant(self, value: Any) -> str:
+        name = self._get_name("c")
+        self._namespace[name] = value
+        return name
+
+    def _get_literal(self, value: Any) -> str:
+        """Returns the source code of a number, or the name of a constant holding it."""
+        return repr(value) if isinstance(value, int) else self._add_constant(value)
+
+    def _resolve(self, schema: Any) -> Tuple[dict, bool]:
+        """Resolves a local reference of a subschema.
+
+        Returns:
+            The referenced schema, and whether the subschema was a reference.
+        """
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(schema)
+        if "$ref" not in schema:
+            return schema, False
+        ref = schema["$ref"]
+        scope = schema.get("x-scope", [""])
+        if (
+            not isinstance(ref, str)
+            or not ref.startswith("#/")
+            or not scope
+            or scope[0] != ""
+            or not _is_extension_subset(schema, REFERENCE_KEYWORDS)
+        ):
+            raise UnsupportedSchema(schema)
+        resolved = self._root
+        try:
+            for part in ref[2:].split("/"):
+                resolved = resolved[part.replace("~1", "/").replace("~0", "~")]
+        except (KeyError, IndexError, TypeError):
+            raise UnsupportedSchema(schema)
+        if not isinstance(resolved, dict) or "$ref" in resolved:
+            raise UnsupportedSchema(schema)
+        return resolved, True
+
+    def _get_function(self, schema: dict) -> str:
+        """Returns the name of the function of a schema, compiling it if needed."""
+        key = id(schema)
+        if key in self._functions:
+            return self._functions[key]
+        self._check(schema)
+        name = self._functions[key] = self._get_name("f")
+        self._schemas.append(schema)
+        schema_type = schema["type"]
+        lines = [f"def {name}(value):"]
+        if schema_type == "object":
+            lines.extend(self._get_object_lines(schema))
+        elif schema_type == "array":
+            lines.extend(self._get_array_lines(schema))
+        else:
+            lines.append(f"    if {' or '.join(self._get_conditions(schema, 'value'))}:")
+            lines.append("        raise _INVALID")
+            lines.append(f"    return {self._get_output(schema, 'value')}")
+        self._sources.append("\n".join(lines))
+        return name
+
+    def _check(self, schema: dict):
+        """Checks that a schema only has the supported keywords."""
+        schema_type = schema.get("type")
+        if schema_type not in TYPE_KEYWORDS or not _is_extension_subset(
+            schema, COMMON_KEYWORDS | TYPE_KEYWORDS[schema_type]
+        ):
+            raise UnsupportedSchema(schema)
+        if schema.get("deprecated") or "x-model" in schema:
+            raise UnsupportedSchema(schema)
+        if self._invalid_access is not None and schema.get(self._invalid_access, False):
+            raise UnsupportedSchema(schema)
+        if not isinstance(schema.get("nullable", False), bool):
+            raise UnsupportedSchema(schema)
+        if "enum" in schema and not isinstance(schema["enum"], list):
+            raise UnsupportedSchema(schema)
+        if None in self.custom_formatters:
+            raise UnsupportedSchema(schema)
+        if schema_type in ("array", "object"):
+            if "format" in schema:
+                raise UnsupportedSchema(schema)
+        elif not self._is_identity(schema) and self._get_formatter(schema) is None:
+            raise UnsupportedSchema(schema)
+        for keyword in ("minLength", "maxLength", "minItems", "maxItems"):
+            if keyword in schema and not _is_integer(schema[keyword]):
+                raise UnsupportedSchema(schema)
+        for keyword in ("minimum", "maximum", "multipleOf"):
+            if keyword in schema and not _is_number(schema[keyword]):
+                raise UnsupportedSchema(schema)
+        for keyword in ("exclusiveMinimum", "exclusiveMaximum"):
+            if not isinstance(schema.get(keyword, False), bool):
+                raise UnsupportedSchema(schema)
+        if "pattern" in schema:
+            try:
+                re.compile(schema["pattern"])
+            except (re.error, TypeError):
+                raise UnsupportedSchema(schema)
+        if schema_type == "array" and "items" not in schema:
+            raise UnsupportedSchema(schema)
+
+    def _is_identity(self, schema: dict) -> bool:
+        """Checks whether unmarshalling a valid primitive value returns it unchanged."""
+        schema_format = schema.get("format")
+        return (
+            schema_format in IDENTITY_FORMATS[schema["type"]]
+            and schema_format not in self.custom_formatters
+        )
+
+    def _get_formatter(self, schema: dict) -> Any:
+        schema_format = schema.get("format")
+        try:
+            return self.custom_formatters[schema_format]
+        except KeyError:
+            unmarshaller_class = SchemaUnmarshallersFactory.PRIMITIVE_UNMARSHALLERS[
+                schema["type"]
+            ]
+            return unmarshaller_class.FORMATTERS.get(schema_format)
+
+    def _get_conditions(self, schema: dict, var: str) -> List[str]:
+        """Returns the conditions of a primitive value being invalid."""
+        schema_type = schema["type"]
+        schema_format = schema.get("format")
+        if schema_type == "number" and schema_format in ("float", "double"):
+            conditions = [FLOAT_TYPE_CHECK.format(var)]
+        else:
+            conditions = [TYPE_CHECKS[schema_type].format(var)]
+        if not self._is_identity(schema):
+            conditions.append(f"not _fc.conforms({var}, {schema_format!r})")
+        if "minLength" in schema:
+            conditions.append(f"len({var}) < {schema['minLength']!r}")
+        if "maxLength" in schema:
+            conditions.append(f"len({var}) > {schema['maxLength']!r}")
+        if "pattern" in schema:
+            pattern = self._add_constant(re.compile(schema["pattern"]))
+            conditions.append(f"{pattern}.search({var}) is None")
+        if "minimum" in schema:
+            operator = "<=" if schema.get("exclusiveMinimum", False) else "<"
+            conditions.append(f"{var} {operator} {self._get_literal(schema['minimum'])}")
+        if "maximum" in schema:
+            operator = ">=" if schema.get("exclusiveMaximum", False) else ">"
+            conditions.append(f"{var} {operator} {self._get_literal(schema['maximum'])}")
+        if "multipleOf" in schema:
+            multiple_of = self._get_literal(schema["multipleOf"])
+            conditions.append(f"not _is_multiple_of({var}, {multiple_of})")
+        conditions.extend(self._get_enum_conditions(schema, var))
+        return conditions
+
+    def _get_enum_conditions(self, schema: dict, var: str) -> List[str]:
+        if "enum" not in schema:
+            return []
+        enum = schema["enum"]
+        if schema["type"] == "string" and all(isinstance(item, str) for item in enum):
+            return [f"{var} not in {self._add_constant(frozenset(enum))}"]
+        return [f"not _in_enum({var}, {self._add_constant(enum)})"]
+
+    def _get_output(self, schema: dict, var: str) -> str:
+        """Returns the expression of an unmarshalled primitive value."""
+        if self._is_identity(schema):
+            return var
+        return f"{self._add_constant(self._get_formatter(schema).unmarshal)}({var})"
+
+    def _get_value_lines(self, subschema: Any, var: str, store: Optional[str]) -> List[str]:
+        """Returns the lines validating a value and storing its unmarshalled copy.
+
+        Arguments:
+            subschema: The schema of the value, possibly a reference.
+            var: The name of the variable holding the value.
+            store: The template of the statement storing the unmarshalled value; if
+                `None`, the value is only validated.
+        """
+        schema, is_reference = self._resolve(subschema)
+        self._check(schema)
+        # jsonschema also applies the keywords next to a reference, including the
+        # default `nullable: false`, so null references are left to openapi-core
+        nullable = not is_reference and _is_nullable(schema)
+        if store is None:
+            if schema["type"] in ("object", "array") or not self._is_identity(schema):
+                raise UnsupportedSchema(schema)
+            conditions = " or ".join(self._get_conditions(schema, var))
+            if nullable:
+                conditions = f"{var} is not None and ({conditions})"
+            return [f"if {conditions}:", "    raise _INVALID"]
+        if schema["type"] in ("object", "array"):
+            call = store.format(f"{self._get_function(schema)}({var})")
+            if not nullable:
+                return [call]
+            return [f"if {var} is None:", f"    {store.format('None')}", "else:", f"    {call}"]
+        conditions = " or ".join(self._get_conditions(schema, var))
+        output = store.format(self._get_output(schema, var))
+        if not nullable:
+            return [f"if {conditions}:", "    raise _INVALID", output]
+        return [
+            f"if {var} is None:",
+            f"    {store.format('None')}",
+            f"elif {conditions}:",
+            "    raise _INVALID",
+            "else:",
+            f"    {output}",
+        ]
+
+    def _get_array_lines(self, schema: dict) -> List[str]:
+        lines = [f"    if {TYPE_CHECKS['array'].format('value')}:", "        raise _INVALID"]
+        conditions = []
+        if "minItems" in schema:
+            conditions.append(f"len(value) < {schema['minItems']!r}")
+        if "maxItems" in schema:
+            conditions.append(f"len(value) > {schema['maxItems']!r}")
+        conditions.extend(self._get_enum_conditions(schema, "value"))
+        if conditions:
+            lines.append(f"    if {' or '.join(conditions)}:")
+            lines.append("        raise _INVALID")
+        items, is_reference = self._resolve(schema["items"])
+        self._check(items)
+        if items["type"] in ("object", "array"):
+            function = self._get_function(items)
+            if not is_reference and _is_nullable(items):
+                lines.append(
+                    f"    return [None if item is None else {function}(item) for item in value]"
+                )
+            else:
+                lines.append(f"    return [{function}(item) for item in value]")
+            return lines
+        if self._is_identity(items):
+            lines.append("    for item in value:")
+            lines.extend(
+                f"        {line}"
+                for line in self._get_value_lines(schema["items"], "item", None)
+            )
+            lines.append("    return list(value)")
+            return lines
+        lines.append("    result = []")
+        lines.append("    append = result.append")
+        lines.append("    for item in value:")
+        lines.extend(
+            f"        {line}"
+            for line in self._get_value_lines(schema["items"], "item", "append({})")
+        )
+        lines.append("    return result")
+        return lines
+
+    def _get_object_lines(self, schema: dict) -> List[str]:
+        lines = [f"    if {TYPE_CHECKS['object'].format('value')}:", "        raise _INVALID"]
+        conditions = []
+        if "minProperties" in schema:
+            conditions.append(f"len(value) < {schema['minProperties']!r}")
+        if "maxProperties" in schema:
+            conditions.append(f"len(value) > {schema['maxProperties']!r}")
+        conditions.extend(self._get_enum_conditions(schema, "value"))
+        properties = schema.get("properties", {})
+        required = schema.get("required", [])
+        if not isinstance(properties, dict) or not isinstance(required, list):
+            raise UnsupportedSchema(schema)
+        if not all(isinstance(name, str) for name in [*properties, *required]):
+            raise UnsupportedSchema(schema)
+        resolved = {name: self._resolve(prop)[0] for name, prop in properties.items()}
+        skipped = {
+            name
+            for name, prop in resolved.items()
+            if self._invalid_access is not None and prop.get(self._invalid_access)
+        }
+        indexed = set()
+        for name in required:
+            # the `required` keyword ignores the read-only or write-only properties,
+            # but only if they are not references
+            if name in skipped:
+                if properties[name] is not resolved[name]:
+                    conditions.append(f"{name!r} not in value")
+            elif name in properties:
+                indexed.add(name)
+            else:
+                conditions.append(f"{name!r} not in value")
+        if conditions:
+            lines.append(f"    if {' or '.join(conditions)}:")
+            lines.append("        raise _INVALID")
+
+        lines.append("    result = {}")
+        additional = schema.get("additionalProperties", True)
+        if additional is not True:
+            names = self._add_constant(frozenset(properties))
+            lines.append(f"    if not {names}.issuperset(value):")
+            if additional is False:
+                lines.append("        raise _INVALID")
+            elif isinstance(additional, dict):
+                lines.append("        for key, x in value.items():")
+                lines.append(f"            if key not in {names}:")
+                lines.extend(
+                    f"                {line}"
+                    for line in self._get_value_lines(additional, "x", "result[key] = {}")
+                )
+            else:
+                raise UnsupportedSchema(schema)
+        elif properties:
+            names = self._add_constant(frozenset(properties))
+            lines.append(f"    if not {names}.issuperset(value):")
+            lines.append("        for key, x in value.items():")
+            lines.append(f"            if key not in {names}:")
+            lines.append("                result[key] = x")
+        else:
+            lines.append("    result.update(value)")
+
+        for name, prop in properties.items():
+            if name in skipped:
+                lines.append(f"    if {name!r} in value:")
+                lines.append("        raise _INVALID")
+                continue
+            store = f"result[{name!r}] = {{}}"
+            value_lines = [f"    {line}" for line in self._get_value_lines(prop, "x", store)]
+            if name in indexed:
+                lines.append(f"    x = value[{name!r}]")
+                lines.extend(value_lines)
+                continue
+            lines.append(f"    x = value.get({name!r}, _MISSING)")
+            lines.append("    if x is not _MISSING:")
+            lines.extend(f"    {line}" for line in value_lines)
+            if "default" in resolved[name]:
+                default = resolved[name]["default"]
+                if default is None or isinstance(default, (dict, list)):
+                    raise UnsupportedSchema(schema)
+                function = self._get_function(resolved[name])
+                lines.append("    else:")
+                lines.append(
+                    f"        {store.format(f'{function}({self._add_constant(default)})')}"
+                )
+        lines.append("    return result")
+        return lines
+
+
+def _is_extension_subset(schema: dict, keywords: frozenset) -> bool:
+    """Checks whether the keys of a schema are either extensions or in `keywords`."""
+    return all(
+        isinstance(key, str) and (key in keywords or key.startswith("x-")) for key in schema
+    )
+
+
+def _is_nullable(schema: dict) -> bool:
+    """Checks whether `None` is a valid value of a schema within another one."""
+    return schema.get("nullable", False) is True and (
+        "enum" not in schema or any(item is None for item in schema["enum"])
+    )
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_compilers: MutableMapping[Any, Dict[Any, SchemaCompiler]] = WeakKeyDictionary()
+_compilers_lock = Lock()
+
+
+def get_schema_compiler(
+    spec: SpecPath, unmarshallers_factory: SchemaUnmarshallersFactory
+) -> SchemaCompiler:
+    """Returns the schema compiler of a spec for the context of an unmarshallers factory.
+
+    The compilers are cached alongside the parsed spec, and shared by all the
+    validators created with the same context and custom formatters.
+    """
+    key = (
+        unmarshallers_factory.context,
+        frozenset(unmarshallers_factory.custom_formatters.items()),
+    )
+    with _compilers_lock:
+        compilers = _compilers.setdefault(spec.accessor, {})
+        if key not in compilers:
+            compilers[key] = SchemaCompiler(unmarshallers_factory)
+        return compilers[key]
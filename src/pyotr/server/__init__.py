@@ -1,26 +1,51 @@
 """Pyotr server."""
-from functools import wraps
+import time
+from functools import cached_property, partial, wraps
 from http import HTTPStatus
 from importlib import import_module
-from inspect import iscoroutine
+from inspect import iscoroutine, iscoroutinefunction
 from pathlib import Path
 from types import ModuleType
-from typing import Callable, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple, Union
 from urllib.parse import urlsplit
 
+import anyio
 from openapi_core import create_spec
 from openapi_core.exceptions import OpenAPIError
-from openapi_core.shortcuts import RequestValidator, ResponseValidator
 from openapi_core.spec.paths import SpecPath
 from openapi_core.validation.exceptions import InvalidSecurity
+from openapi_core.validation.request.datatypes import OpenAPIRequest
+from openapi_core.validation.response.datatypes import OpenAPIResponse
 from starlette.applications import Starlette
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
 from stringcase import snakecase
 
-from pyotr.utils import get_spec_from_file, OperationSpec
-from .validation import request_factory, response_factory
+from pyotr.metrics import NULL_TIMER, PhaseTimer
+from pyotr.utils import load_spec, OperationSpec
+from pyotr.validation import (
+    get_operation_validators,
+    OperationRequestValidator,
+    OperationResponseValidator,
+    ValidationPolicy,
+)
+from . import metrics as phases
+from .arguments import EndpointArguments
+from .caching import CACHE_EXTENSION, ResponseCache
+from .metrics import MetricsHook
+from .routing import OperationRoutes
+from .validation import (
+    RenderedOpenAPIResponse,
+    request_factory,
+    response_factory,
+    ValidationPool,
+)
+
+INLINE_EXTENSION = "x-pyotr-inline"
 
 
 class Application(Starlette):
@@ -31,8 +56,16 @@ class Application(Starlette):
         spec: Union[SpecPath, dict],
         *,
         module: Optional[Union[str, ModuleType]] = None,
-        validate_responses: bool = True,
+        validate_responses: Union[bool, ValidationPolicy] = True,
         enforce_case: bool = True,
+        stream_request_bodies: bool = False,
+        max_body_size: Optional[int] = None,
+        response_cache: Optional[Mapping[str, Union[bool, Mapping]]] = None,
+        threadpool_size: Optional[int] = None,
+        validation_pool: Optional[ValidationPool] = None,
+        metrics: Optional[MetricsHook] = None,
+        lazy: bool = False,
+        validated_arguments: bool = False,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -41,60 +74,301 @@ class Application(Starlette):
         self.spec = spec
         self.validate_responses = validate_responses
         self.enforce_case = enforce_case
-        self.custom_formatters = None
-        self.custom_media_type_deserializers = None
+        self.stream_request_bodies = stream_request_bodies
+        self.max_body_size = max_body_size
+        self.response_cache = dict(response_cache or {})
+        self.threadpool_size = threadpool_size
+        self._threadpool_limiter: Optional[anyio.CapacityLimiter] = None
+        self.validation_pool = validation_pool
+        self.metrics = metrics
+        self.lazy = lazy
+        self.validated_arguments = validated_arguments
+        self._custom_formatters: Optional[dict] = None
+        self._custom_media_type_deserializers: Optional[dict] = None
+        self._validators: Dict[
+            str, Tuple[OperationRequestValidator, OperationResponseValidator]
+        ] = {}
+        self._response_caches: Dict[str, ResponseCache] = {}
+        self._endpoint_module = module
+        self._endpoint_modules: Dict[str, ModuleType] = {}
+        self._lazy_endpoints: Set[str] = set()
 
         self._operations = OperationSpec.get_all(self.spec)
-        self._server_paths = {urlsplit(server["url"]).path for server in self.spec["servers"]}
+        self._operation_routes = OperationRoutes(
+            urlsplit(server["url"]).path for server in self.spec["servers"]
+        )
+        unknown = set(self.response_cache) - set(self._operations)
+        if unknown:
+            raise ValueError(
+                f"Unknown operationIds in response_cache: {', '.join(sorted(unknown))}."
+            )
+        for operation_id in self._operations:
+            self._set_response_cache(operation_id)
 
         if module is not None:
-            if isinstance(module, str):
-                module = _load_module(module)
-
-            for operation_id, operation in self._operations.items():
-                name = operation_id
-                if "." in name:
-                    base, name = name.rsplit(".", 1)
-                    base_module = _load_module(f"{module.__name__}.{base}")
-                else:
-                    base_module = module
-                if self.enforce_case:
-                    name = snakecase(name)
-                try:
-                    endpoint_fn = getattr(base_module, name)
-                except AttributeError as e:
-                    raise RuntimeError(
-                        f"The function `{base_module}.{name}` does not exist!"
-                    ) from e
-                self.set_endpoint(endpoint_fn, operation_id=operation_id)
-
-    def set_endpoint(self, endpoint_fn: Callable, *, operation_id: Optional[str] = None):
+            if lazy:
+                for operation_id in self._operations:
+                    self._set_lazy_endpoint(operation_id)
+            else:
+                self._get_endpoint_module("")
+                for operation_id in self._operations:
+                    self.set_endpoint(
+                        self._find_endpoint(operation_id), operation_id=operation_id
+                    )
+
+    @cached_property
+    def _operation_aliases(self) -> Dict[str, str]:
+        """Maps the snake case versions of the `operationId`s to the original ones."""
+        return {snakecase(operation_id): operation_id for operation_id in self._operations}
+
+    def _get_endpoint_module(self, base: str) -> ModuleType:
+        """Returns the endpoint module, or its submodule, importing it on first use."""
+        module = self._endpoint_modules.get(base)
+        if module is None:
+            if base:
+                module = _load_module(f"{self._get_endpoint_module('').__name__}.{base}")
+            elif isinstance(self._endpoint_module, ModuleType):
+                module = self._endpoint_module
+            else:
+                module = _load_module(self._endpoint_module)  # type: ignore
+            self._endpoint_modules[base] = module
+        return module
+
+    def _find_endpoint(self, operation_id: str) -> Callable:
+        """Finds the endpoint function of an operation in the endpoint module.
+
+        The part of a dotted `operationId` before the last dot is the submodule.
+        """
+        base, _, name = operation_id.rpartition(".")
+        module = self._get_endpoint_module(base)
+        if self.enforce_case:
+            name = snakecase(name)
+        try:
+            return getattr(module, name)
+        except AttributeError as e:
+            raise RuntimeError(f"The function `{module}.{name}` does not exist!") from e
+
+    def _get_operation_id(self, operation_id: str) -> str:
+        """Resolves the snake case alias of an `operationId`.
+
+        Raises:
+            ValueError: If the `operationId` is not in the spec.
+        """
+        if self.enforce_case and operation_id not in self._operations:
+            operation_id = self._operation_aliases.get(operation_id, operation_id)
+        if operation_id not in self._operations:
+            raise ValueError(f"Unknown operationId: {operation_id}.")
+        return operation_id
+
+    @property
+    def validate_responses(self) -> Union[bool, ValidationPolicy]:
+        """Whether, or according to which policy, the responses are validated."""
+        return self._validate_responses
+
+    @validate_responses.setter
+    def validate_responses(self, value: Union[bool, ValidationPolicy]):
+        self._validate_responses = value
+        self._response_validation = ValidationPolicy.create(value)
+
+    @property
+    def custom_formatters(self) -> Optional[dict]:
+        """Custom formatters applied to both requests and responses."""
+        return self._custom_formatters
+
+    @custom_formatters.setter
+    def custom_formatters(self, value: Optional[dict]):
+        self._custom_formatters = value
+        self._compile_validators()
+
+    @property
+    def custom_media_type_deserializers(self) -> Optional[dict]:
+        """Custom deserializers for request and response media types."""
+        return self._custom_media_type_deserializers
+
+    @custom_media_type_deserializers.setter
+    def custom_media_type_deserializers(self, value: Optional[dict]):
+        self._custom_media_type_deserializers = value
+        self._compile_validators()
+
+    def _compile_validators(self, *operation_ids: str):
+        """(Re)creates validators for the given operations, or all registered ones."""
+        for operation_id in operation_ids or tuple(self._validators):
+            self._validators[operation_id] = get_operation_validators(
+                self.spec,
+                self._operations[operation_id],
+                custom_formatters=self.custom_formatters,
+                custom_media_type_deserializers=self.custom_media_type_deserializers,
+            )
+
+    def set_endpoint(
+        self,
+        endpoint_fn: Callable,
+        *,
+        operation_id: Optional[str] = None,
+        inline: Optional[bool] = None,
+        validated_arguments: Optional[bool] = None,
+    ):
         """Sets endpoint function for a given `operationId`.
 
         If the `operation_id` is not given, it will try to determine it
         based on the function name.
+
+        Synchronous endpoint functions are run in a thread pool, unless `inline`
+        is `True`; if not given, it is taken from the `x-pyotr-inline` extension
+        of the operation in the spec.
+
+        If `validated_arguments` is `True`, or if not given and it is enabled for the
+        application, the function receives the validated request parameters and body
+        as keyword arguments; see `pyotr.server.arguments.EndpointArguments`.
+
+        In the lazy mode, the validators of the operation are compiled on its first request.
         """
         if operation_id is None:
             operation_id = endpoint_fn.__name__
-        if self.enforce_case and operation_id not in self._operations:
-            operation_id_key = {snakecase(op_id): op_id for op_id in self._operations}.get(
-                operation_id
-            )
+        operation_id_key = self._get_operation_id(operation_id)
+        operation = self._operations[operation_id_key]
+        if self.lazy:
+            # compiled on the first request
+            self._validators.pop(operation_id_key, None)
         else:
-            operation_id_key = operation_id
+            self._compile_validators(operation_id_key)
+        if (
+            operation_id_key not in self._lazy_endpoints
+            and self._operation_routes.get_route(operation_id_key) is not None
+        ):
+            # the responses of the replaced endpoint are dropped
+            self._set_response_cache(operation_id_key)
+        if inline is None:
+            inline = bool(operation.spec.get(INLINE_EXTENSION, False))
+        if validated_arguments is None:
+            validated_arguments = self.validated_arguments
+
+        route = Route(
+            operation.path,
+            self._wrap_endpoint(
+                endpoint_fn,
+                operation_id_key,
+                operation.path,
+                in_threadpool=not inline and not _is_async(endpoint_fn),
+                arguments=(
+                    EndpointArguments.create(endpoint_fn, operation)
+                    if validated_arguments
+                    else None
+                ),
+            ),
+            methods=[operation.method],
+            name=operation_id,
+        )
+        self._lazy_endpoints.discard(operation_id_key)
+        self._add_route(operation_id_key, route)
+
+    def _set_lazy_endpoint(self, operation_id: str):
+        """Registers a route which sets the endpoint of an operation on its first request."""
+        operation = self._operations[operation_id]
+
+        async def load_endpoint(request: Request) -> Response:
+            if operation_id in self._lazy_endpoints:
+                self.set_endpoint(self._find_endpoint(operation_id), operation_id=operation_id)
+            loaded_route = self._operation_routes.get_route(operation_id)
+            if loaded_route is None:
+                raise RuntimeError(f"No endpoint is set for operationId: {operation_id}.")
+            return await loaded_route.endpoint(request)
+
+        route = Route(
+            operation.path, load_endpoint, methods=[operation.method], name=operation_id
+        )
+        self._lazy_endpoints.add(operation_id)
+        self._add_route(operation_id, route)
+
+    def _add_route(self, operation_id: str, route: Route):
+        self._operation_routes.add_route(operation_id, route)
+        if self._operation_routes not in self.router.routes:
+            self.router.routes.append(self._operation_routes)
+
+    def warm(self, operation_ids: Optional[Iterable[str]] = None):
+        """Prepares operations ahead of their first requests; all of them by default.
+
+        Loads the endpoint functions of the operations not loaded yet in the lazy
+        mode, and compiles the validators of the operations with endpoints.
+        """
+        for operation_id in self._operations if operation_ids is None else operation_ids:
+            operation_id = self._get_operation_id(operation_id)
+            if operation_id in self._lazy_endpoints:
+                self.set_endpoint(self._find_endpoint(operation_id), operation_id=operation_id)
+            if self._operation_routes.get_route(operation_id) is not None:
+                self._get_validators(operation_id)
+
+    def _get_validators(
+        self, operation_id: str
+    ) -> Tuple[OperationRequestValidator, OperationResponseValidator]:
+        """Returns the validators of an operation, compiling them if needed."""
         try:
-            operation = self._operations[operation_id_key]
-        except KeyError as ex:
-            raise ValueError(f"Unknown operationId: {operation_id}.") from ex
+            return self._validators[operation_id]
+        except KeyError:
+            self._compile_validators(operation_id)
+            return self._validators[operation_id]
+
+    def _set_response_cache(self, operation_id: str):
+        """Creates the response cache of an operation, if configured.
+
+        The configuration in the `response_cache` argument takes precedence over
+        the `x-pyotr-cache` extension of the operation in the spec. The validators
+        of a cached operation are compiled, even in the lazy mode.
+        """
+        config = self.response_cache.get(
+            operation_id, self._operations[operation_id].spec.get(CACHE_EXTENSION)
+        )
+        if config is None or config is False:
+            self._response_caches.pop(operation_id, None)
+            return
+        request_validator, _ = self._get_validators(operation_id)
+        cache = ResponseCache.create(request_validator, config)
+        if cache is not None:
+            self._response_caches[operation_id] = cache
+
+    def _wrap_endpoint(
+        self,
+        endpoint_fn: Callable,
+        operation_id: str,
+        path_pattern: str,
+        in_threadpool: bool = False,
+        arguments: Optional[EndpointArguments] = None,
+    ) -> Callable:
+        """Wraps an endpoint function with request and response validation.
+
+        The `path_pattern` is relative to the server base path, which is taken from
+        the `root_path` of the request. If `arguments` are given, the validated
+        request parts are passed to the function as keyword arguments.
+        """
 
         @wraps(endpoint_fn)
         async def wrapper(request: Request, **kwargs) -> Response:
-            openapi_request = await request_factory(request)
-            validated_request = RequestValidator(
-                self.spec,
-                custom_formatters=self.custom_formatters,
-                custom_media_type_deserializers=self.custom_media_type_deserializers,
-            ).validate(openapi_request)
+            request_validator, response_validator = self._get_validators(operation_id)
+            cache = self._response_caches.get(operation_id)
+            if cache is not None:
+                cache_key = cache.get_key(request)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached.to_response(request.headers.get("if-none-match"))
+
+            metrics = self.metrics
+            timer = NULL_TIMER if metrics is None else PhaseTimer(metrics, operation_id)
+            openapi_request = await request_factory(
+                request,
+                request.scope.get("root_path", "") + path_pattern,
+                stream=self.stream_request_bodies,
+                max_body_size=self.max_body_size,
+            )
+            request_size = _get_body_size(request, openapi_request.body)
+            timer.lap(phases.REQUEST)
+            validated_request = await self._run_validation(
+                request_size, request_validator.validate, openapi_request
+            )
+            timer.lap(phases.REQUEST_VALIDATION)
+            if metrics is not None:
+                metrics.observe_body_size(operation_id, "request", request_size)
+                if validated_request.errors:
+                    metrics.observe_validation_error(operation_id, "request")
             try:
                 validated_request.raise_for_errors()
             except InvalidSecurity as ex:
@@ -102,32 +376,118 @@ class Application(Starlette):
             except OpenAPIError as ex:
                 raise HTTPException(HTTPStatus.BAD_REQUEST, "Bad request") from ex
 
-            response = endpoint_fn(request, **kwargs)
+            if arguments is not None:
+                kwargs.update(arguments.get_kwargs(validated_request))
+            if in_threadpool:
+                response = await self._run_in_threadpool(endpoint_fn, request, **kwargs)
+            else:
+                response = endpoint_fn(request, **kwargs)
             if iscoroutine(response):
                 response = await response
+            timer.lap(phases.ENDPOINT)
+            data = None
             if isinstance(response, dict):
-                response = JSONResponse(response)
+                data, response = response, JSONResponse(response)
+                timer.lap(phases.SERIALIZATION)
             elif not isinstance(response, Response):
                 raise ValueError(
                     f"The endpoint function `{endpoint_fn.__name__}` must return"
                     " either a dict or a Starlette Response instance."
                 )
+            response_size = len(getattr(response, "body", b""))
+            if metrics is not None:
+                metrics.observe_body_size(operation_id, "response", response_size)
 
-            # TODO: pass a list of operation IDs to specify which responses not to validate
-            if self.validate_responses:
-                ResponseValidator(
-                    self.spec,
-                    custom_formatters=self.custom_formatters,
-                    custom_media_type_deserializers=self.custom_media_type_deserializers,
-                ).validate(openapi_request, response_factory(response)).raise_for_errors()
+            policy = self._response_validation
+            deferred_validation = None
+            if policy is not None and policy.should_validate(operation_id):
+                validation_args = (
+                    policy,
+                    operation_id,
+                    response_validator,
+                    openapi_request,
+                    response_factory(response, data),
+                )
+                if policy.deferred:
+                    deferred_validation = BackgroundTask(
+                        self._validate_response, *validation_args
+                    )
+                else:
+                    await self._run_validation(
+                        response_size,
+                        self._validate_response,
+                        *validation_args,
+                    )
+
+            if cache is not None:
+                response = cache.store(
+                    cache_key, response, request.headers.get("if-none-match")
+                )
+            if deferred_validation is not None:
+                if response.background is not None:
+                    deferred_validation = BackgroundTasks(
+                        [response.background, deferred_validation]
+                    )
+                response.background = deferred_validation
             return response
 
-        for server_path in self._server_paths:
-            self.add_route(
-                server_path + operation.path, wrapper, [operation.method], name=operation_id
-            )
+        return wrapper
+
+    async def _run_in_threadpool(self, fn: Callable, *args, **kwargs) -> Any:
+        """Runs a function in a worker thread, limited by `threadpool_size` if set."""
+        if self.threadpool_size is None:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        if self._threadpool_limiter is None:
+            self._threadpool_limiter = anyio.CapacityLimiter(self.threadpool_size)
+        return await anyio.to_thread.run_sync(
+            partial(fn, *args, **kwargs), limiter=self._threadpool_limiter
+        )
+
+    async def _run_validation(self, body_size: int, validate: Callable, *args) -> Any:
+        """Runs a validation in the validation pool if the body is large enough."""
+        if self.validation_pool is not None and self.validation_pool.should_offload(body_size):
+            return await self.validation_pool.run(validate, *args)
+        return validate(*args)
 
-    def endpoint(self, operation_id: Union[Callable, str]):
+    def _validate_response(
+        self,
+        policy: ValidationPolicy,
+        operation_id: str,
+        response_validator: OperationResponseValidator,
+        openapi_request: OpenAPIRequest,
+        openapi_response: OpenAPIResponse,
+    ):
+        """Validates a response, reporting any errors according to the policy."""
+        metrics = self.metrics
+        started_at = time.perf_counter() if metrics is not None else 0.0
+        try:
+            result = response_validator.validate(openapi_request, openapi_response)
+            if result.errors and isinstance(openapi_response, RenderedOpenAPIResponse):
+                # the rendered body is what the client gets, so it has the final say
+                result = response_validator.validate(
+                    openapi_request, openapi_response.from_body()
+                )
+        finally:
+            if metrics is not None:
+                metrics.observe_phase(
+                    operation_id,
+                    phases.RESPONSE_VALIDATION,
+                    time.perf_counter() - started_at,
+                )
+        try:
+            result.raise_for_errors()
+        except OpenAPIError as ex:
+            if metrics is not None:
+                metrics.observe_validation_error(operation_id, "response")
+            policy.handle_error(operation_id, ex)
+
+    def endpoint(
+        self,
+        operation_id: Union[Callable, str, None] = None,
+        *,
+        inline: Optional[bool] = None,
+        validated_arguments: Optional[bool] = None,
+    ):
         """Decorator for setting endpoints.
 
         If used without arguments, it will try to determine the `operationId` based on the
@@ -142,25 +502,68 @@ class Application(Starlette):
             @app.endpoint('fooBar'):
             def my_endpoint():
                 ...
+
+        A synchronous endpoint can be run directly instead of in a thread pool:
+
+            @app.endpoint(inline=True)
+            def foo_bar(request):
+                ...
+
+        Or receive the validated request parameters and body as arguments:
+
+            @app.endpoint(validated_arguments=True)
+            async def foo_bar(request, limit: int = 10, body: dict = None):
+                ...
         """
         if callable(operation_id):
-            self.set_endpoint(operation_id)
+            self.set_endpoint(
+                operation_id, inline=inline, validated_arguments=validated_arguments
+            )
             return operation_id
         else:
 
             def decorator(fn):
-                self.set_endpoint(fn, operation_id=operation_id)
+                self.set_endpoint(
+                    fn,
+                    operation_id=operation_id,
+                    inline=inline,
+                    validated_arguments=validated_arguments,
+                )
                 return fn
 
             return decorator
 
     @classmethod
-    def from_file(cls, path: Union[Path, str], *args, **kwargs) -> "Application":
-        """Creates an instance of the class by loading the spec from a local file."""
-        spec = get_spec_from_file(path)
+    def from_file(
+        cls,
+        path: Union[Path, str],
+        *args,
+        spec_cache_dir: Optional[Union[Path, str]] = None,
+        **kwargs,
+    ) -> "Application":
+        """Creates an instance of the class by loading the spec from a local file.
+
+        The parsed spec is cached in `spec_cache_dir`, if given; see `pyotr.utils.load_spec`.
+        """
+        spec = load_spec(path, cache_dir=spec_cache_dir)
         return cls(spec, *args, **kwargs)
 
 
+def _get_body_size(request: Request, body: Any) -> int:
+    """Returns the size of the raw request body, also if it has already been decoded."""
+    if isinstance(body, bytes):
+        return len(body)
+    try:
+        return int(request.headers.get("content-length") or 0)
+    except ValueError:
+        return 0
+
+
+def _is_async(fn: Callable) -> bool:
+    """Checks whether calling a function or another callable returns a coroutine."""
+    return iscoroutinefunction(fn) or iscoroutinefunction(getattr(fn, "__call__", None))
+
+
 def _load_module(name: str) -> ModuleType:
     """Helper function to load a module based on its dotted-string name."""
     try:
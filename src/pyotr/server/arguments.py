@@ -0,0 +1,79 @@
+"""Passing the validated request parameters and body to endpoint functions."""
+from __future__ import annotations
+
+import re
+from inspect import Parameter, signature
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+from openapi_core.validation.request.datatypes import RequestValidationResult
+
+from pyotr.utils import OperationSpec, PARAMETER_LOCATIONS
+
+BODY_ARGUMENT = "body"
+VALIDATED_ARGUMENT = "validated"
+
+
+class EndpointArguments(NamedTuple):
+    """Maps the arguments of an endpoint function to the parts of the validated request.
+
+    The parameters are matched by their names, either as they are in the spec or
+    converted to snake case, e.g. `petId` to `pet_id` and `X-Request-Id` to
+    `x_request_id`; if the names clash, path parameters take precedence, followed
+    by query, header and cookie ones. The `body` argument receives the request body,
+    and `validated` the whole `RequestValidationResult`. A function accepting
+    arbitrary keyword arguments receives all the parameters.
+    """
+
+    parameters: Tuple[Tuple[str, str, str], ...]
+    body: bool
+    validated: bool
+
+    @classmethod
+    def create(cls, endpoint_fn: Callable, op_spec: OperationSpec) -> EndpointArguments:
+        """Inspects the signature of an endpoint function of an operation."""
+        fn_params = list(signature(endpoint_fn).parameters.values())[1:]
+        names = {
+            param.name
+            for param in fn_params
+            if param.kind in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
+        }
+        any_names = any(param.kind == Parameter.VAR_KEYWORD for param in fn_params)
+        by_name: Dict[str, Tuple[str, str]] = {}
+        for location in reversed(PARAMETER_LOCATIONS):
+            for name in op_spec.parameters[location]:
+                by_name[name] = by_name[get_argument_name(name)] = (location, name)
+        for reserved in (BODY_ARGUMENT, VALIDATED_ARGUMENT):
+            by_name.pop(reserved, None)
+        if any_names:
+            parameters = {(get_argument_name(name), *by_name[name]) for name in by_name}
+        else:
+            parameters = {(name, *by_name[name]) for name in names if name in by_name}
+        return cls(
+            parameters=tuple(sorted(parameters)),
+            body=BODY_ARGUMENT in names or any_names,
+            validated=VALIDATED_ARGUMENT in names,
+        )
+
+    def get_kwargs(self, validated_request: RequestValidationResult) -> Dict[str, Any]:
+        """Builds the keyword arguments of an endpoint call.
+
+        Optional parameters missing from the request are left out, so that the
+        defaults of the function arguments apply.
+        """
+        kwargs = {}
+        parameters = validated_request.parameters
+        for argument, location, name in self.parameters:
+            values = getattr(parameters, location)
+            if name in values:
+                kwargs[argument] = values[name]
+        if self.body:
+            kwargs[BODY_ARGUMENT] = validated_request.body
+        if self.validated:
+            kwargs[VALIDATED_ARGUMENT] = validated_request
+        return kwargs
+
+
+def get_argument_name(name: str) -> str:
+    """Converts a parameter name into a snake case identifier."""
+    name = re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name)
+    return re.sub(r"\W", "_", name).lower()
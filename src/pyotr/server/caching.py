@@ -0,0 +1,176 @@
+"""Server-side response caching."""
+from __future__ import annotations
+
+import hashlib
+from http import HTTPStatus
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+from stringcase import snakecase
+
+from pyotr.caching import LRUCache
+from pyotr.validation import OperationRequestValidator
+
+CACHE_EXTENSION = "x-pyotr-cache"
+CACHEABLE_METHODS = frozenset(("get", "head"))
+
+
+class CachedResponse(NamedTuple):
+    """The parts of an endpoint response needed to send it again."""
+
+    status_code: int
+    body: bytes
+    raw_headers: List[Tuple[bytes, bytes]]
+    etag: str
+
+    @property
+    def size(self) -> int:
+        """Size of the response body."""
+        return len(self.body)
+
+    def to_response(self, if_none_match: Optional[str] = None) -> Response:
+        """Creates a response, or a `304 Not Modified` one if the ETag matches."""
+        if if_none_match and etag_matches(if_none_match, self.etag):
+            return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"etag": self.etag})
+        response = Response(self.body, status_code=self.status_code)
+        response.raw_headers = list(self.raw_headers)
+        return response
+
+
+class ResponseCache:
+    """Cache of the responses of a single operation.
+
+    The responses are keyed by the values of the operation parameters and security
+    credentials, so that a cached response is returned, or `304 Not Modified` if it
+    matches the `If-None-Match` request header, without calling the endpoint or
+    validating the request and the response again.
+
+    Arguments:
+        request_validator: The request validator of the operation.
+        ttl: The number of seconds a response is cached.
+        max_entries: The maximum number of cached responses.
+        max_bytes: The maximum total size of the cached response bodies, if any.
+    """
+
+    def __init__(
+        self,
+        request_validator: OperationRequestValidator,
+        *,
+        ttl: float = 60,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+    ):
+        self._key_fields = _get_key_fields(request_validator)
+        self._responses = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    @classmethod
+    def create(
+        cls, request_validator: OperationRequestValidator, config: Union[bool, Mapping, None]
+    ) -> Optional[ResponseCache]:
+        """Creates a cache from a configuration; `None` means no caching.
+
+        The configuration is either a boolean flag or a mapping of the arguments,
+        whose names can also be in camel case, e.g. `maxEntries`.
+
+        Raises:
+            ValueError: If the operation is not cacheable or the configuration is invalid.
+        """
+        if config is None or config is False:
+            return None
+        operation_spec = request_validator.operation_spec
+        if operation_spec.method not in CACHEABLE_METHODS:
+            raise ValueError(
+                "Only GET and HEAD operations can be cached,"
+                f" not {operation_spec.operation_id}."
+            )
+        kwargs = (
+            {} if config is True else {snakecase(key): value for key, value in config.items()}
+        )
+        try:
+            return cls(request_validator, **kwargs)
+        except TypeError as ex:
+            raise ValueError(
+                f"Invalid cache configuration of {operation_spec.operation_id}: {config}"
+            ) from ex
+
+    def get_key(self, request: Request) -> tuple:
+        """Builds the cache key of a request."""
+        sources: Dict[str, Any] = {
+            "path": request.path_params,
+            "query": request.query_params,
+            "header": request.headers,
+            "cookie": request.cookies,
+        }
+        return tuple(
+            tuple(sources[location].getlist(name))
+            if location in ("query", "header")
+            else sources[location].get(name)
+            for name, location in self._key_fields
+        )
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        """Returns the cached response for the key, if any."""
+        return self._responses.get(key)
+
+    def store(
+        self, key: tuple, response: Response, if_none_match: Optional[str] = None
+    ) -> Response:
+        """Caches a successful response and adds an `ETag` header to it.
+
+        Returns the response to send, which is `304 Not Modified` if the ETag
+        matches `if_none_match`. Other responses, streaming ones and those with
+        background tasks are not cached and returned unchanged.
+        """
+        if (
+            response.status_code != HTTPStatus.OK
+            or response.background is not None
+            or not isinstance(getattr(response, "body", None), bytes)
+        ):
+            return response
+        etag = response.headers.get("etag") or get_etag(response.body)
+        response.headers["etag"] = etag
+        cached = CachedResponse(response.status_code, response.body, response.raw_headers, etag)
+        self._responses.set(key, cached)
+        return cached.to_response(if_none_match) if if_none_match else response
+
+    def __len__(self) -> int:
+        """Number of cached responses."""
+        return len(self._responses)
+
+
+def get_etag(body: bytes) -> str:
+    """Creates a strong ETag from the response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Checks whether an `If-None-Match` header matches an ETag, using weak comparison."""
+    if if_none_match.strip() == "*":
+        return True
+    etag = _strip_weak(etag)
+    return any(_strip_weak(tag.strip()) == etag for tag in if_none_match.split(","))
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _get_key_fields(
+    request_validator: OperationRequestValidator,
+) -> Tuple[Tuple[str, str], ...]:
+    fields = [
+        (name, location)
+        for location, names in request_validator.operation_spec.parameters.items()
+        for name in names
+    ]
+    for requirement in request_validator.security:
+        for provider in requirement.values():
+            scheme: Any = getattr(provider, "scheme", None)
+            if scheme is None:
+                continue
+            if scheme["type"] == "apiKey":
+                fields.append((scheme["name"], scheme["in"]))
+            else:
+                fields.append(("authorization", "header"))
+    return tuple(dict.fromkeys(fields))
@@ -0,0 +1,127 @@
+"""Server metrics."""
+from __future__ import annotations
+
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, List, Protocol, Sequence, Tuple
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from pyotr.metrics import (
+    DEFAULT_DURATION_BUCKETS,
+    get_histogram,
+    Histogram,
+    render_histograms,
+    render_values,
+)
+
+REQUEST = "request"
+REQUEST_VALIDATION = "request_validation"
+ENDPOINT = "endpoint"
+SERIALIZATION = "serialization"
+RESPONSE_VALIDATION = "response_validation"
+
+DEFAULT_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class MetricsHook(Protocol):  # pragma: no cover
+    """Defines the interface for receiving the server metrics.
+
+    The phases of handling a request are `request` (reading the request), `request_validation`,
+    `endpoint`, `serialization` (of dict results to JSON) and `response_validation`; the kinds
+    of validation errors and bodies are `request` and `response`. The methods are called on the
+    event loop or in worker threads, so they need to be fast and thread-safe.
+    """
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase, in seconds."""
+        ...
+
+    def observe_validation_error(self, operation_id: str, kind: str):
+        """Records a failed request or response validation."""
+        ...
+
+    def observe_body_size(self, operation_id: str, kind: str, size: int):
+        """Records the size of a request or response body, in bytes."""
+        ...
+
+
+class MetricsCollector:
+    """In-memory aggregator of the server metrics, rendered in the Prometheus text format.
+
+    The metrics can be exposed by adding the `endpoint` method as a route:
+
+        metrics = MetricsCollector()
+        app = Application(spec, metrics=metrics)
+        app.add_route("/metrics", metrics.endpoint)
+
+    Arguments:
+        duration_buckets: The upper bounds of the phase duration buckets, in seconds.
+        size_buckets: The upper bounds of the body size buckets, in bytes.
+        prefix: The prefix of the metric names.
+    """
+
+    def __init__(
+        self,
+        duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+        size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+        prefix: str = "pyotr",
+    ):
+        self.duration_buckets = tuple(duration_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.prefix = prefix
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.body_sizes: Dict[Tuple[str, str], Histogram] = {}
+        self.validation_errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = Lock()
+
+    def observe_phase(self, operation_id: str, phase: str, duration: float):
+        """Records the duration of a phase, in seconds."""
+        with self._lock:
+            get_histogram(self.durations, (operation_id, phase), self.duration_buckets).observe(
+                duration
+            )
+
+    def observe_validation_error(self, operation_id: str, kind: str):
+        """Records a failed request or response validation."""
+        with self._lock:
+            self.validation_errors[operation_id, kind] += 1
+
+    def observe_body_size(self, operation_id: str, kind: str, size: int):
+        """Records the size of a request or response body, in bytes."""
+        with self._lock:
+            get_histogram(self.body_sizes, (operation_id, kind), self.size_buckets).observe(
+                size
+            )
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            render_histograms(
+                lines,
+                f"{self.prefix}_phase_duration_seconds",
+                "Duration of the phases of handling requests.",
+                ("operation_id", "phase"),
+                self.durations,
+            )
+            render_histograms(
+                lines,
+                f"{self.prefix}_body_size_bytes",
+                "Size of the request and response bodies.",
+                ("operation_id", "kind"),
+                self.body_sizes,
+            )
+            render_values(
+                lines,
+                f"{self.prefix}_validation_errors_total",
+                "Number of failed request and response validations.",
+                ("operation_id", "kind"),
+                self.validation_errors,
+            )
+        return "\n".join(lines) + "\n"
+
+    def endpoint(self, request: Request) -> PlainTextResponse:
+        """Endpoint function returning the rendered metrics."""
+        return PlainTextResponse(self.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,131 @@
+"""Routing of requests to the API operations."""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import URLPath
+from starlette.routing import BaseRoute, Match, NoMatchFound, Route
+from starlette.types import Receive, Scope, Send
+
+_IndexKey = Tuple[int, Optional[str]]
+
+
+class OperationRoutes(BaseRoute):
+    """Routes requests under the server base paths to the API operations.
+
+    Like a `Mount` for each distinct base path of the servers in the spec, but
+    sharing a single route per operation, looked up in an index of their paths
+    rather than by matching every route in turn. The matched base path is moved
+    from the `path` to the `root_path` of the request scope, and the matched
+    `Route` is available as `route`.
+
+    Arguments:
+        server_paths: The base paths of the servers; the first one is used when
+            building URLs with `url_path_for`.
+    """
+
+    def __init__(self, server_paths: Iterable[str]):
+        self.server_paths = list(dict.fromkeys(path.rstrip("/") for path in server_paths))
+        # the longest base paths are tried first
+        self._match_order = sorted(self.server_paths, key=len, reverse=True)
+        self._routes: Dict[str, Route] = {}
+        self._static: Dict[str, List[Route]] = defaultdict(list)
+        self._templated: Dict[_IndexKey, List[Route]] = defaultdict(list)
+
+    @property
+    def routes(self) -> List[Route]:
+        """The operation routes, with paths relative to the server base paths."""
+        return list(self._routes.values())
+
+    def get_route(self, operation_id: str) -> Optional[Route]:
+        """Returns the route of an operation, if any."""
+        return self._routes.get(operation_id)
+
+    def add_route(self, operation_id: str, route: Route):
+        """Adds or replaces the route of an operation.
+
+        A route replaced by one with the same path keeps its place in the index.
+        """
+        replaced = self._routes.get(operation_id)
+        self._routes[operation_id] = route
+        if replaced is None:
+            self._get_index(route).append(route)
+        elif replaced.path == route.path:
+            index = self._get_index(replaced)
+            position = next(pos for pos, indexed in enumerate(index) if indexed is replaced)
+            index[position] = route
+        else:
+            self._static.clear()
+            self._templated.clear()
+            for indexed_route in self._routes.values():
+                self._get_index(indexed_route).append(indexed_route)
+
+    def _get_index(self, route: Route) -> List[Route]:
+        if route.param_convertors:
+            return self._templated[_get_index_key(route.path, templated=True)]
+        return self._static[route.path]
+
+    def _get_candidates(self, path: str) -> List[Route]:
+        key = _get_index_key(path)
+        return [
+            *self._static.get(path, ()),
+            *self._templated.get(key, ()),
+            *self._templated.get((key[0], None), ()),
+        ]
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        """Matches the request against the operation routes."""
+        if scope["type"] != "http":
+            return Match.NONE, {}
+        path = scope["path"]
+        partial: Optional[Scope] = None
+        for server_path in self._match_order:
+            if server_path and path != server_path and not path.startswith(server_path + "/"):
+                continue
+            start = len(server_path)
+            route_scope = {**scope, "path": path[start:]}
+            for route in self._get_candidates(route_scope["path"]):
+                match, child_scope = route.matches(route_scope)
+                if match == Match.NONE:
+                    continue
+                root_path = scope.get("root_path", "")
+                child_scope.update(
+                    {
+                        "app_root_path": scope.get("app_root_path", root_path),
+                        "root_path": root_path + server_path,
+                        "path": route_scope["path"],
+                        "route": route,
+                    }
+                )
+                if match == Match.FULL:
+                    return match, child_scope
+                if partial is None:
+                    partial = child_scope
+        if partial is not None:
+            return Match.PARTIAL, partial
+        return Match.NONE, {}
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send):
+        """Handles the request with the matched route."""
+        await scope["route"].handle(scope, receive, send)
+
+    def url_path_for(self, name: str, **path_params: Any) -> URLPath:
+        """Builds the URL path of an operation under the first server base path."""
+        for route in self._routes.values():
+            try:
+                url_path = route.url_path_for(name, **path_params)
+            except NoMatchFound:
+                continue
+            return URLPath(path=self.server_paths[0] + url_path, protocol=url_path.protocol)
+        raise NoMatchFound(name, path_params)
+
+
+def _get_index_key(path: str, templated: bool = False) -> _IndexKey:
+    """Indexes paths by their number of segments and the first segment.
+
+    For templated route paths, the first segment is `None` if it contains a parameter.
+    """
+    segments = path.split("/")
+    first: Optional[str] = segments[1] if len(segments) > 1 else None
+    if templated and first is not None and "{" in first:
+        first = None
+    return len(segments), first
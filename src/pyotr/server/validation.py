@@ -1,21 +1,48 @@
 """Starlette requests."""
+import json
+import time
+from http import HTTPStatus
+from threading import Lock
+from typing import Any, Callable, NamedTuple, Optional
 from urllib.parse import urljoin
 
+import anyio
 from openapi_core.validation.request.datatypes import OpenAPIRequest, RequestParameters
 from openapi_core.validation.response.datatypes import OpenAPIResponse
+from starlette.exceptions import HTTPException
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.routing import Match
 
+from pyotr.utils import is_json
+from pyotr.validation import DeserializedOpenAPIRequest, DeserializedOpenAPIResponse
 
-async def request_factory(request: Request) -> OpenAPIRequest:
-    """Create Starlette reques."""
-    path_pattern = request["path"]
-    for route in request.app.router.routes:
-        match, _ = route.matches(request)
-        if match == Match.FULL:
-            path_pattern = route.path
-            break
+
+async def request_factory(
+    request: Request,
+    path_pattern: Optional[str] = None,
+    *,
+    stream: bool = False,
+    max_body_size: Optional[int] = None,
+) -> OpenAPIRequest:
+    """Create Starlette reques.
+
+    If the templated `path_pattern` of the matched route is not given, it is
+    recovered by matching the request against the application routes.
+
+    The body is read with `read_body`, so it is rejected once larger than
+    `max_body_size`. With `stream` enabled, JSON bodies are read with
+    `read_json_body` instead and validated as already deserialized data.
+    """
+    if path_pattern is None:
+        path_pattern = request["path"]
+        for route in request.app.router.routes:
+            match, child_scope = route.matches(request)
+            if match == Match.FULL:
+                # routes under a base path provide the matched route and base path
+                matched_route = child_scope.get("route", route)
+                path_pattern = child_scope.get("root_path", "") + matched_route.path
+                break
 
     host_url = f"{request.url.scheme}://{request.url.hostname}"
     if request.url.port:
@@ -28,20 +55,180 @@ async def request_factory(request: Request) -> OpenAPIRequest:
         cookie=request.cookies,
     )
 
+    mimetype = request.headers.get("content-type")
+    if stream and is_json(mimetype):
+        return DeserializedOpenAPIRequest(
+            full_url_pattern=urljoin(host_url, path_pattern),
+            method=request.method.lower(),
+            parameters=parameters,
+            body=await read_json_body(request, max_body_size),
+            mimetype=mimetype,
+        )
+
     return OpenAPIRequest(
         full_url_pattern=urljoin(host_url, path_pattern),
         method=request.method.lower(),
         parameters=parameters,
-        body=await request.body(),
-        mimetype=request.headers.get("content-type"),
+        body=await read_body(request, max_body_size),
+        mimetype=mimetype,
     )
 
 
-def response_factory(response: Response) -> OpenAPIResponse:
-    """Create Starlette response."""
+async def read_body(request: Request, max_size: Optional[int] = None) -> bytes:
+    """Reads a request body from the request stream, up to `max_size` bytes.
+
+    The request is rejected as soon as its declared length or the chunks read
+    so far exceed `max_size`. The body is stored so that `request.body()`
+    returns it without reading the stream again.
+    """
+    content_length = request.headers.get("content-length")
+    if max_size is not None and content_length:
+        try:
+            too_large = int(content_length) > max_size
+        except ValueError as ex:
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "Bad request") from ex
+        if too_large:
+            raise HTTPException(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        chunks.append(chunk)
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise HTTPException(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    request._body = body = b"".join(chunks)
+    return body
+
+
+async def read_json_body(request: Request, max_size: Optional[int] = None) -> Any:
+    """Decodes a JSON request body read with `read_body`.
+
+    The body is parsed once complete, and the decoded body is stored so that
+    `request.json()` does not parse it again; returns `None` if the body is
+    empty.
+    """
+    body = await read_body(request, max_size)
+    if not body:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError as ex:  # including UnicodeDecodeError
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "Bad request") from ex
+    request._json = data
+    return data
+
+
+class RenderedOpenAPIResponse(DeserializedOpenAPIResponse):
+    """Server response validated from the Python data its `body` was rendered from.
+
+    The data may not be made of the types it is decoded into from JSON, e.g.
+    tuples or dicts with integer keys, so it could fail a schema its rendered
+    body conforms to; `from_body` gives the response to validate in that case.
+    """
+
+    def __init__(self, body: bytes, **kwargs):
+        super().__init__(**kwargs)
+        self.body = body
+
+    def from_body(self) -> OpenAPIResponse:
+        """Returns the response to validate from the rendered body instead."""
+        return OpenAPIResponse(
+            data=self.body, status_code=self.status_code, mimetype=self.mimetype
+        )
+
+
+def response_factory(response: Response, data: Optional[Any] = None) -> OpenAPIResponse:
+    """Create Starlette response.
+
+    If the Python `data` the response body was rendered from is given, it is
+    validated directly instead of parsing the body back.
+    """
     mimetype, *_ = response.headers.get("content-type", "").split(";")
+    if data is not None:
+        return RenderedOpenAPIResponse(
+            response.body,
+            data=data,
+            status_code=response.status_code,
+            mimetype=mimetype,
+        )
     return OpenAPIResponse(
         data=response.body,
         status_code=response.status_code,
         mimetype=mimetype,
     )
+
+
+class ValidationPoolStats(NamedTuple):
+    """Statistics of a validation pool; the times are in seconds."""
+
+    queued: int
+    running: int
+    completed: int
+    max_queued: int
+    wait_time: float
+    validation_time: float
+
+
+class ValidationPool:
+    """Runs the validation of large request and response bodies in worker threads.
+
+    Validating a large body against a complex schema can take a while, during
+    which the event loop could not handle any other request. The validators are
+    bound to the spec, which cannot be sent to other processes, so they run in
+    threads instead.
+
+    Arguments:
+        threshold: The minimum size of a body, in bytes, to be validated in the pool.
+        max_workers: The maximum number of validations running at once; the others
+            wait in a queue.
+    """
+
+    def __init__(self, threshold: int = 64 * 1024, max_workers: int = 4):
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._lock = Lock()
+        self._queued = self._running = self._completed = self._max_queued = 0
+        self._wait_time = self._validation_time = 0.0
+
+    def should_offload(self, size: int) -> bool:
+        """Checks whether a body of the given size is validated in the pool."""
+        return size >= self.threshold
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Calls a validation function in a worker thread."""
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        def validate():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_time += started_at - queued_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._validation_time += time.perf_counter() - started_at
+
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_workers)
+        return await anyio.to_thread.run_sync(validate, limiter=self._limiter)
+
+    def stats(self) -> ValidationPoolStats:
+        """Returns the current queue depth and the accumulated timings."""
+        with self._lock:
+            return ValidationPoolStats(
+                queued=self._queued,
+                running=self._running,
+                completed=self._completed,
+                max_queued=self._max_queued,
+                wait_time=self._wait_time,
+                validation_time=self._validation_time,
+            )
@@ -1,45 +1,131 @@
 """Utility classes and functions."""
 from __future__ import annotations
 
+import hashlib
+import io
 import json
+import os
 from enum import Enum
+from functools import partial
 from itertools import chain
 from pathlib import Path
-from typing import Callable, Dict, Union
+from string import Formatter
+from tempfile import NamedTemporaryFile
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple, Union
 
 import yaml
+from openapi_core import create_spec
 from openapi_core.spec.paths import SpecPath
-from stringcase import camelcase
+
+SPEC_CACHE_DIR_ENV = "PYOTR_SPEC_CACHE_DIR"
+
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+HTTP_METHODS = frozenset(("get", "put", "post", "delete", "options", "head", "patch", "trace"))
+PARAMETER_LOCATIONS = ("path", "query", "header", "cookie")
 
 
 class OperationSpec:
-    """Utility class for defining API operations."""
+    """The fields of an API operation used by Pyotr, resolved once from the spec.
+
+    Attributes:
+        operation_id: The `operationId` of the operation.
+        path: The path template, relative to the server URL.
+        method: The HTTP method, in lower case.
+        path_vars: The names of the variables in the path template, in order.
+        parameters: The names of the declared parameters, including those declared on
+            the path, by their location: `path`, `query`, `header` and `cookie`.
+        request_media_types: The media types of the request body, if any.
+        response_codes: The response status codes, including `default` if declared.
+        spec: The raw operation spec, e.g. for its summary or vendor extensions.
+    """
 
-    def __init__(self, path: str, method: str, spec: dict):
+    __slots__ = (
+        "operation_id",
+        "path",
+        "method",
+        "path_vars",
+        "parameters",
+        "request_media_types",
+        "response_codes",
+        "spec",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        method: str,
+        spec: Mapping[str, Any],
+        *,
+        path_parameters: Iterable[Mapping[str, Any]] = (),
+        resolve: Callable[[Any], Any] = lambda value: value,
+    ):
+        self.operation_id: str = spec["operationId"]
         self.path = path
-        self.method = method
+        self.method = method.lower()
+        self.path_vars: Tuple[str, ...] = tuple(
+            var for _, var, _, _ in Formatter().parse(path) if var is not None
+        )
+        declared = {}
+        for param in chain(path_parameters, spec.get("parameters", ())):
+            param = resolve(param)
+            declared[param["name"], param["in"]] = param
+        parameters: Dict[str, Tuple[str, ...]] = {}
+        for location in PARAMETER_LOCATIONS:
+            parameters[location] = tuple(
+                name for name, param_location in declared if param_location == location
+            )
+        self.parameters = parameters
+        request_body = resolve(spec.get("requestBody") or {})
+        self.request_media_types: Tuple[str, ...] = tuple(request_body.get("content", ()))
+        self.response_codes: Tuple[str, ...] = tuple(str(code) for code in spec["responses"])
         self.spec = spec
 
-    def __getattr__(self, name):
-        """
-        Looks for values of the specification fields.
-
-        If the exact match of a name fails, also checks for the camel case version.
-        """
-        if name in self.spec:
-            return self.spec[name]
-        if (camelcase_name := camelcase(name)) in self.spec:
-            return self.spec[camelcase_name]
-        return super().__getattribute__(name)
+    def __repr__(self) -> str:
+        """Shows the operation."""
+        return f"<OperationSpec {self.operation_id}: {self.method.upper()} {self.path}>"
 
     @classmethod
-    def get_all(cls, spec: dict) -> Dict[str, OperationSpec]:
+    def get_all(cls, spec: Union[SpecPath, Mapping[str, Any]]) -> Dict[str, OperationSpec]:
         """Builds a dict of all operations in the spec."""
-        return {
-            op_spec["operationId"]: cls(path, method, op_spec)
-            for path, path_spec in spec["paths"].items()
-            for method, op_spec in path_spec.items()
-        }
+        resolve = _get_ref_resolver(spec)
+        operations = {}
+        for path, path_spec in spec["paths"].items():
+            path_spec = resolve(path_spec)
+            path_parameters = path_spec.get("parameters", ())
+            for method, op_spec in path_spec.items():
+                if method in HTTP_METHODS:
+                    operation = cls(
+                        path, method, op_spec, path_parameters=path_parameters, resolve=resolve
+                    )
+                    operations[operation.operation_id] = operation
+        return operations
+
+
+def is_json(mimetype: Optional[str]) -> bool:
+    """Checks whether a content type denotes JSON."""
+    if not mimetype:
+        return False
+    mimetype, *_ = mimetype.split(";")
+    return mimetype.strip().lower().endswith(("/json", "+json"))
+
+
+def _get_ref_resolver(spec: Union[SpecPath, Mapping[str, Any]]) -> Callable[[Any], Any]:
+    """Creates a function resolving the local references (`$ref`) in a spec."""
+    accessor = getattr(spec, "accessor", None)
+    root = spec if accessor is None else accessor.dict_or_list
+
+    def resolve(value: Any) -> Any:
+        while isinstance(value, Mapping) and isinstance(value.get("$ref"), str):
+            ref = value["$ref"]
+            if not ref.startswith("#/"):
+                break
+            value = root
+            for part in ref[2:].split("/"):
+                value = value[part.replace("~1", "/").replace("~0", "~")]
+        return value
+
+    return resolve
 
 
 class SpecFileTypes(tuple, Enum):
@@ -49,20 +135,78 @@ class SpecFileTypes(tuple, Enum):
     YAML = ("yaml", "yml")
 
 
-def get_spec_from_file(path: Union[Path, str]) -> SpecPath:
-    """Loads a local file and creates an OpenAPI `Spec` object."""
+def get_spec_from_file(path: Union[Path, str]) -> dict:
+    """Loads a local file and parses the OpenAPI specification."""
     path = Path(path)
-    suffix = path.suffix[1:].lower()
-
-    if suffix in SpecFileTypes.JSON:
-        spec_load: Callable = json.load
-    elif suffix in SpecFileTypes.YAML:
-        spec_load = yaml.safe_load
-    else:
-        raise RuntimeError(
-            f"Unknown specification file type."
-            f" Accepted types: {', '.join(chain(*SpecFileTypes))}"
-        )
-
+    spec_load = _get_spec_loader(path)
     with open(path) as spec_file:
         return spec_load(spec_file)
+
+
+def load_spec(
+    path: Union[Path, str], *, cache_dir: Optional[Union[Path, str]] = None
+) -> SpecPath:
+    """Loads a local file and creates an OpenAPI `Spec` object, using the spec cache.
+
+    The parsed specification is cached in `cache_dir`, or the directory set in the
+    `PYOTR_SPEC_CACHE_DIR` environment variable, keyed by the hash of the file content.
+    Cached specs have already been validated, so they are not validated again. The
+    cache files are JSON, so only specs made of plain JSON data are cached; a cache
+    file which cannot be read is ignored and replaced.
+    Without a cache directory, it is equivalent to `create_spec(get_spec_from_file(path))`.
+    """
+    path = Path(path)
+    spec_load = _get_spec_loader(path)
+    if cache_dir is None:
+        cache_dir = os.environ.get(SPEC_CACHE_DIR_ENV)
+    if not cache_dir:
+        with open(path) as spec_file:
+            return create_spec(spec_load(spec_file))
+
+    content = path.read_bytes()
+    cache_file = Path(cache_dir) / f"{hashlib.sha256(content).hexdigest()}.json"
+    try:
+        with open(cache_file, "rb") as cached:
+            cached_dict = json.load(cached)
+    except (OSError, ValueError, RecursionError):
+        cached_dict = None
+    if isinstance(cached_dict, dict):
+        return create_spec(cached_dict, validate_spec=False)
+
+    spec_dict = spec_load(io.StringIO(content.decode()))
+    # serialized before validation, which annotates the spec in place
+    cached_spec = _dump_spec(spec_dict)
+    spec = create_spec(spec_dict)
+    if cached_spec is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile("wb", dir=cache_file.parent, delete=False) as temp_file:
+            temp_file.write(cached_spec)
+        os.replace(temp_file.name, cache_file)
+    return spec
+
+
+def _dump_spec(spec_dict: dict) -> Optional[bytes]:
+    """Serializes a spec to JSON, if it is decoded back unchanged.
+
+    YAML specs may contain values with no exact JSON form, e.g. dates or integer keys.
+    """
+    try:
+        dumped = json.dumps(spec_dict, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+    if json.loads(dumped) != spec_dict:
+        return None
+    return dumped.encode()
+
+
+def _get_spec_loader(path: Path) -> Callable:
+    """Selects the parser based on the spec file extension."""
+    suffix = path.suffix[1:].lower()
+    if suffix in SpecFileTypes.JSON:
+        return json.load
+    if suffix in SpecFileTypes.YAML:
+        return partial(yaml.load, Loader=YamlLoader)
+    raise RuntimeError(
+        f"Unknown specification file type."
+        f" Accepted types: {', '.join(chain(*SpecFileTypes))}"
+    )
@@ -0,0 +1,369 @@
+"""Validators bound to individual API operations."""
+from __future__ import annotations
+
+import logging
+import random
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple, Union
+
+from openapi_core.casting.schemas.exceptions import CastError
+from openapi_core.exceptions import MissingRequiredRequestBody, OpenAPIError
+from openapi_core.security.exceptions import SecurityError
+from openapi_core.security.factories import SecurityProviderFactory
+from openapi_core.spec.paths import SpecPath
+from openapi_core.templating.datatypes import TemplateResult
+from openapi_core.templating.media_types.exceptions import MediaTypeFinderError
+from openapi_core.templating.paths.exceptions import PathError, ServerNotFound
+from openapi_core.templating.paths.finders import PathFinder
+from openapi_core.templating.responses.exceptions import ResponseFinderError
+from openapi_core.templating.responses.finders import ResponseFinder
+from openapi_core.unmarshalling.schemas.enums import UnmarshalContext
+from openapi_core.unmarshalling.schemas.exceptions import UnmarshalError, ValidateError
+from openapi_core.unmarshalling.schemas.factories import SchemaUnmarshallersFactory
+from openapi_core.validation.exceptions import InvalidSecurity
+from openapi_core.validation.request.datatypes import OpenAPIRequest, RequestValidationResult
+from openapi_core.validation.request.validators import RequestValidator
+from openapi_core.validation.response.datatypes import OpenAPIResponse, ResponseValidationResult
+from openapi_core.validation.response.validators import ResponseValidator
+
+from pyotr.schemas import CompiledUnmarshaller, get_schema_compiler
+from pyotr.utils import OperationSpec
+
+logger = logging.getLogger(__name__)
+
+
+class DeserializedOpenAPIRequest(OpenAPIRequest):
+    """OpenAPI request with `body` already deserialized into Python objects."""
+
+
+class DeserializedOpenAPIResponse(OpenAPIResponse):
+    """OpenAPI response with `data` already deserialized into Python objects."""
+
+    @property
+    def deserialized_data(self) -> Any:
+        """The response data as Python objects."""
+        return self.data
+
+
+class OperationValidatorMixin:
+    """Resolves the parts of the spec shared by all requests to a single operation.
+
+    The schemas of the operation are compiled into Python functions on instantiation;
+    see `pyotr.schemas`.
+    """
+
+    UNMARSHAL_CONTEXT: UnmarshalContext
+
+    def __init__(self, spec: SpecPath, op_spec: OperationSpec, **kwargs):
+        super().__init__(spec, **kwargs)  # type: ignore
+        self.operation_spec = op_spec
+        self.path = spec / "paths" / op_spec.path
+        self.operation = self.path / op_spec.method
+        self._unmarshallers: dict = {}
+        self._unmarshallers_factory = SchemaUnmarshallersFactory(
+            spec.accessor.dereferencer.resolver_manager.resolver,
+            self.format_checker,  # type: ignore
+            self.custom_formatters,  # type: ignore
+            context=self.UNMARSHAL_CONTEXT,
+        )
+        self._schema_compiler = get_schema_compiler(spec, self._unmarshallers_factory)
+
+    def _compile_schemas(self, schemas: Iterable[SpecPath]):
+        for schema in schemas:
+            try:
+                self._get_unmarshaller(schema)
+            except OpenAPIError:  # reported when validating
+                pass
+
+    def _unmarshal(self, param_or_media_type, value):
+        if "schema" not in param_or_media_type:
+            return value
+        return self._get_unmarshaller(param_or_media_type / "schema")(value)
+
+    def _get_unmarshaller(self, schema: SpecPath):
+        key = str(schema)
+        try:
+            return self._unmarshallers[key]
+        except KeyError:
+            function = self._schema_compiler.compile(schema)
+            if function is None:
+                unmarshaller = self._unmarshallers_factory.create(schema)
+            else:
+                unmarshaller = CompiledUnmarshaller(
+                    function, schema, self._unmarshallers_factory
+                )
+            self._unmarshallers[key] = unmarshaller
+            return unmarshaller
+
+    def _get_deserialized_data(self, content, request_or_response, data):
+        try:
+            media_type, _ = self._get_media_type(content, request_or_response)
+        except MediaTypeFinderError as exc:
+            return None, [exc]
+
+        try:
+            return self._unmarshal(media_type, self._cast(media_type, data)), []
+        except (CastError, ValidateError, UnmarshalError) as exc:
+            return None, [exc]
+
+
+class OperationRequestValidator(OperationValidatorMixin, RequestValidator):
+    """Request validator for a single operation.
+
+    The operation, its parameters, security requirements and request body are
+    looked up once on instantiation instead of on each validated request; only
+    the server of the request URL is still matched against the spec.
+    """
+
+    UNMARSHAL_CONTEXT = UnmarshalContext.REQUEST
+
+    def __init__(self, spec: SpecPath, op_spec: OperationSpec, **kwargs):
+        super().__init__(spec, op_spec, **kwargs)
+        self.parameters = self._resolve_parameters()
+        self.security = self._resolve_security()
+        self.request_body: Optional[SpecPath] = (
+            self.operation / "requestBody" if "requestBody" in self.operation else None
+        )
+        self._path_finder = PathFinder(spec, base_url=self.base_url)
+        self._path_result = TemplateResult(op_spec.path, {})
+        self._compile_schemas(self._get_schemas())
+
+    def validate(self, request) -> RequestValidationResult:
+        """Validates a request against the operation."""
+        try:
+            self._find_server(request)
+        except PathError as exc:
+            return RequestValidationResult(errors=[exc])
+
+        try:
+            security = self._get_security(request, self.operation)
+        except InvalidSecurity as exc:
+            return RequestValidationResult(errors=[exc])
+
+        params, params_errors = self._get_parameters(request, self.parameters)
+        body, body_errors = self._get_body(request, self.operation)
+
+        return RequestValidationResult(
+            errors=params_errors + body_errors,
+            body=body,
+            parameters=params,
+            security=security,
+        )
+
+    def _find_server(self, request):
+        if self.operation_spec.path not in request.full_url_pattern:
+            # not the templated path of the operation, so it is looked up in full
+            return self._find_path(request)
+        servers = self._path_finder._get_servers_iter(
+            request.full_url_pattern, [(self.path, self.operation, self._path_result)]
+        )
+        try:
+            return next(servers)
+        except StopIteration:
+            raise ServerNotFound(request.full_url_pattern)
+
+    def _get_body(self, request, operation):
+        if not isinstance(request, DeserializedOpenAPIRequest) or self.request_body is None:
+            return super()._get_body(request, operation)
+        if request.body is None:
+            if self.request_body.getkey("required", False):
+                return None, [MissingRequiredRequestBody(request)]
+            return None, []
+        return self._get_deserialized_data(self.request_body / "content", request, request.body)
+
+    def _get_schemas(self) -> Iterable[SpecPath]:
+        for param in self.parameters:
+            if "schema" in param:
+                yield param / "schema"
+        if self.request_body is not None:
+            yield from _get_content_schemas(self.request_body)
+
+    def _resolve_parameters(self) -> List[SpecPath]:
+        parameters = []
+        seen = set()
+        for container in (self.operation, self.path):
+            if "parameters" not in container:
+                continue
+            for param in container / "parameters":
+                key = (param["name"], param["in"])
+                if key not in seen:
+                    seen.add(key)
+                    parameters.append(param)
+        return parameters
+
+    def _resolve_security(self) -> List[Dict]:
+        if "security" in self.operation:
+            security = self.operation / "security"
+        elif "security" in self.spec:
+            security = self.spec / "security"
+        else:
+            return []
+
+        schemes = self.spec / "components#securitySchemes"
+        provider_factory = SecurityProviderFactory()
+        return [
+            {
+                name: provider_factory.create(schemes / name) if name in schemes else None
+                for name in requirement.keys()
+            }
+            for requirement in security
+        ]
+
+    def _get_security(self, request, operation):
+        if not self.security:
+            return {}
+
+        for requirement in self.security:
+            try:
+                return {
+                    name: provider(request) if provider is not None else None
+                    for name, provider in requirement.items()
+                }
+            except SecurityError:
+                continue
+
+        raise InvalidSecurity()
+
+
+class OperationResponseValidator(OperationValidatorMixin, ResponseValidator):
+    """Response validator for a single operation.
+
+    Since the operation is known in advance, the `request` argument of
+    `validate` is not used and can be `None`.
+    """
+
+    UNMARSHAL_CONTEXT = UnmarshalContext.RESPONSE
+
+    def __init__(self, spec: SpecPath, op_spec: OperationSpec, **kwargs):
+        super().__init__(spec, op_spec, **kwargs)
+        responses = self.operation / "responses"
+        self._response_finder = ResponseFinder(responses)
+        self._compile_schemas(
+            schema
+            for status_code in responses.keys()
+            for schema in _get_content_schemas(responses / status_code)
+        )
+
+    def validate(self, request, response) -> ResponseValidationResult:
+        """Validates a response against the operation."""
+        try:
+            operation_response = self._get_operation_response(self.operation, response)
+        except ResponseFinderError as exc:
+            return ResponseValidationResult(errors=[exc])
+
+        data, data_errors = self._get_data(response, operation_response)
+        headers, headers_errors = self._get_headers(response, operation_response)
+
+        return ResponseValidationResult(
+            errors=data_errors + headers_errors,
+            data=data,
+            headers=headers,
+        )
+
+    def _get_operation_response(self, operation, response):
+        return self._response_finder.find(str(response.status_code))
+
+    def find_media_type(self, response) -> Optional[SpecPath]:
+        """Validates the status code and the content type of a response, ignoring its data.
+
+        Returns:
+            The spec of the response media type, or `None` if the response has no content.
+
+        Raises:
+            OpenAPIError: If the status code or the content type are not in the spec.
+        """
+        operation_response = self._get_operation_response(self.operation, response)
+        if "content" not in operation_response:
+            return None
+        media_type, _ = self._get_media_type(operation_response / "content", response)
+        return media_type
+
+    def validate_item(self, media_type: SpecPath, item: Any) -> Any:
+        """Validates a deserialized item of an array response body.
+
+        Raises:
+            OpenAPIError: If the item does not conform to the spec.
+        """
+        return self._get_unmarshaller(media_type / "schema" / "items")(item)
+
+    def _get_data(self, response, operation_response):
+        if not isinstance(response, DeserializedOpenAPIResponse):
+            return super()._get_data(response, operation_response)
+        if "content" not in operation_response:
+            return None, []
+        try:
+            data = response.deserialized_data
+        except ValueError:  # reported by the base validator, e.g. as a DeserializeError
+            return super()._get_data(response, operation_response)
+        return self._get_deserialized_data(operation_response / "content", response, data)
+
+
+def _get_content_schemas(request_body_or_response: SpecPath) -> Iterable[SpecPath]:
+    with request_body_or_response.open() as request_body_or_response_dict:
+        content = request_body_or_response_dict.get("content", {})
+    for mime_type, media_type in content.items():
+        if "schema" in media_type:
+            yield request_body_or_response / "content" / mime_type / "schema"
+
+
+def get_operation_validators(
+    spec: SpecPath, op_spec: OperationSpec, **kwargs
+) -> Tuple[OperationRequestValidator, OperationResponseValidator]:
+    """Creates request and response validators for an operation."""
+    return (
+        OperationRequestValidator(spec, op_spec, **kwargs),
+        OperationResponseValidator(spec, op_spec, **kwargs),
+    )
+
+
+class ValidationPolicy:
+    """Defines which operations are validated, how often and how violations are handled.
+
+    Arguments:
+        include: If given, only the listed `operationId`s are validated.
+        exclude: The listed `operationId`s are never validated.
+        sample_rate: The fraction of calls to validate, between 0 and 1.
+        deferred: If `True`, the server validates responses after they have been sent.
+        on_error: A callable accepting the `operationId` and the validation error. If
+            not given, errors are raised, or logged if the validation is deferred.
+    """
+
+    def __init__(
+        self,
+        *,
+        include: Optional[Collection[str]] = None,
+        exclude: Optional[Collection[str]] = None,
+        sample_rate: float = 1.0,
+        deferred: bool = False,
+        on_error: Optional[Callable[[str, OpenAPIError], Any]] = None,
+    ):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("The sample rate must be between 0 and 1.")
+        self.include = None if include is None else frozenset(include)
+        self.exclude = frozenset(exclude or ())
+        self.sample_rate = sample_rate
+        self.deferred = deferred
+        self.on_error = on_error
+
+    @classmethod
+    def create(cls, policy: Union[bool, "ValidationPolicy"]) -> Optional["ValidationPolicy"]:
+        """Creates a policy from a boolean flag; `None` means no validation."""
+        if isinstance(policy, cls):
+            return policy
+        return cls() if policy else None
+
+    def should_validate(self, operation_id: str) -> bool:
+        """Decides whether to validate the current call to an operation."""
+        if operation_id in self.exclude:
+            return False
+        if self.include is not None and operation_id not in self.include:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def handle_error(self, operation_id: str, error: OpenAPIError):
+        """Reports a validation error."""
+        if self.on_error is not None:
+            self.on_error(operation_id, error)
+        elif self.deferred:
+            logger.error("Invalid response for operation %s: %s", operation_id, error)
+        else:
+            raise error
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from openapi_core import create_spec
+
+from benchmarks.__main__ import main, parse_size
+from benchmarks.runner import Result, Timer
+from benchmarks.specs import get_operation_ids, make_payload, make_spec
+
+
+@pytest.mark.parametrize("value, size", [("512", 512), ("1KB", 1024), ("10mb", 10 * 1024**2)])
+def test_parse_size(value, size):
+    assert parse_size(value) == size
+
+
+@pytest.mark.parametrize("operations", [2, 5, 10])
+def test_synthetic_spec_has_requested_operations(operations):
+    spec = make_spec(operations)
+    create_spec(spec)
+    operation_ids = [
+        operation["operationId"]
+        for path_spec in spec["paths"].values()
+        for operation in path_spec.values()
+    ]
+    assert len(operation_ids) == operations
+    assert set(get_operation_ids(operations)) <= set(operation_ids)
+
+
+def test_synthetic_payload_size():
+    size = len(json.dumps(make_payload(100 * 1024)))
+    assert 0.9 * 100 * 1024 <= size <= 1.1 * 100 * 1024
+
+
+def test_timer_stops_after_max_time():
+    assert len(Timer(rounds=100, max_time=0).run(lambda: None)) == 3
+    assert len(Timer(rounds=2, max_time=10).run(lambda: None)) == 2
+
+
+def test_benchmarks_run_and_compare(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    argv = ["run", "--operations", "2", "--payload-sizes", "1KB", "--rounds", "1"]
+    assert main([*argv, "--output", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+    assert {result["name"] for result in results} == {
+        "server.get",
+        "server.post",
+        "client.get",
+        "client.post",
+        "startup.application",
+        "startup.client",
+    }
+    server_get = next(result for result in results if result["name"] == "server.get")
+    assert {"total", "request_validation", "endpoint", "serialization"} <= set(
+        server_get["timings"]
+    )
+
+    slower = [
+        Result(
+            **{
+                **result,
+                "timings": {"total": {"median": 2 * result["timings"]["total"]["median"]}},
+            }
+        )._asdict()
+        for result in results
+    ]
+    current.write_text(json.dumps({"metadata": {}, "results": slower}))
+    capsys.readouterr()
+    assert main(["compare", str(baseline), str(current)]) == 1
+    assert (
+        "REGRESSION server.get[operations=2,payload_size=1024] total" in capsys.readouterr().out
+    )
+    assert main(["compare", str(baseline), str(baseline)]) == 0
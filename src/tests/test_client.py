@@ -1,10 +1,13 @@
 from http import HTTPStatus
+from inspect import iscoroutinefunction
 
+import httpx
 import pytest
 from openapi_core.validation.response.datatypes import OpenAPIResponse
+from starlette.responses import JSONResponse, Response
 from starlette.testclient import TestClient
 
-from pyotr.client import Client
+from pyotr.client import AsyncClient, Client
 from pyotr.server import Application
 
 
@@ -135,3 +138,731 @@ def test_common_headers_included_in_request(spec_dict, config, monkeypatch):
     client.dummy_test_endpoint(headers_={"baz": "bam"})
     headers = client.request_info["kwargs"]["headers"]
     assert dict(headers) == {"foo": "bar", "baz": "bam"}
+
+
+@pytest.mark.asyncio
+async def test_async_client_calls_endpoint(spec_dict, config):
+    app = Application(spec_dict, module=config.endpoint_base)
+    async with AsyncClient(spec_dict, client=httpx.AsyncClient(app=app)) as client:
+        response = await client.dummy_test_endpoint()
+    assert isinstance(response, OpenAPIResponse)
+    assert response.data == b'{"foo":"bar"}'
+
+
+@pytest.mark.asyncio
+async def test_async_client_calls_endpoint_with_body_and_argument(spec_dict, config):
+    app = Application(spec_dict, module=config.endpoint_base)
+    async with AsyncClient(spec_dict, client=httpx.AsyncClient(app=app)) as client:
+        response = await client.dummy_post_endpoint(body_={"foo": "bar"})
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        response = await client.dummy_test_endpoint_with_argument("baz")
+        assert response.data == b'{"foo":"baz"}'
+
+
+def test_async_client_operations_are_coroutine_functions(spec_dict):
+    client = AsyncClient(spec_dict)
+    assert iscoroutinefunction(client.dummy_test_endpoint)
+    assert client.dummy_test_endpoint.__doc__.startswith("A dummy test endpoint.")
+
+
+def test_async_client_creates_pooled_http_client(spec_dict):
+    limits = httpx.Limits(max_connections=5, max_keepalive_connections=2)
+    client = AsyncClient(spec_dict, limits=limits)
+    assert isinstance(client.client, httpx.AsyncClient)
+    pool = client.client._transport._pool
+    assert pool._max_connections == 5
+    assert pool._max_keepalive_connections == 2
+
+
+def _batch_client(spec_dict, config):
+    app = Application(spec_dict, module=config.endpoint_base)
+    return Client(spec_dict, client=TestClient(app))
+
+
+@pytest.mark.parametrize("ordered", (True, False))
+def test_client_batch_calls_operation_for_each_item(spec_dict, config, ordered):
+    client = _batch_client(spec_dict, config)
+    items = [f"item{i}" for i in range(10)]
+    results = list(
+        client.batch(
+            client.dummy_test_endpoint_with_argument, items, concurrency=3, ordered=ordered
+        )
+    )
+    if ordered:
+        assert [result.position for result in results] == list(range(10))
+    assert sorted(result.position for result in results) == list(range(10))
+    for result in results:
+        assert result.error is None
+        assert result.response.data == f'{{"foo":"{items[result.position]}"}}'.encode()
+
+
+def test_client_batch_collects_errors(spec_dict, config):
+    client = _batch_client(spec_dict, config)
+    items = [(), ("unexpected",), {"headers_": {"foo": "bar"}}]
+    results = list(client.batch(client.dummy_test_endpoint, items))
+    assert [result.item for result in results] == items
+    assert results[0].error is None and results[2].error is None
+    assert isinstance(results[1].error, RuntimeError)
+    assert results[1].response is None
+
+
+def test_client_batch_limits_concurrency(spec_dict):
+    import threading
+    import time
+
+    client = Client(spec_dict)
+    lock = threading.Lock()
+    in_flight = []
+    counter = {"current": 0}
+
+    def operation(item):
+        with lock:
+            counter["current"] += 1
+            in_flight.append(counter["current"])
+        time.sleep(0.01)
+        with lock:
+            counter["current"] -= 1
+        return item
+
+    results = list(client.batch(operation, range(20), concurrency=4))
+    assert [result.response for result in results] == list(range(20))
+    assert max(in_flight) <= 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", (True, False))
+async def test_async_client_batch(spec_dict, config, ordered):
+    app = Application(spec_dict, module=config.endpoint_base)
+    async with AsyncClient(spec_dict, client=httpx.AsyncClient(app=app)) as client:
+        items = ["foo", ("bar", "baz"), "bam"]
+        results = [
+            result
+            async for result in client.batch(
+                client.dummy_test_endpoint_with_argument, items, concurrency=2, ordered=ordered
+            )
+        ]
+    results.sort(key=lambda result: result.position)
+    assert results[0].response.data == b'{"foo":"foo"}'
+    assert isinstance(results[1].error, RuntimeError)
+    assert results[2].response.data == b'{"foo":"bam"}'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency", (0, -1))
+async def test_client_batch_requires_positive_concurrency(spec_dict, concurrency):
+    with pytest.raises(ValueError):
+        list(Client(spec_dict).batch(lambda item: item, [1], concurrency=concurrency))
+    async with AsyncClient(spec_dict) as client:
+        with pytest.raises(ValueError):
+            async for _ in client.batch(lambda item: item, [1], concurrency=concurrency):
+                pass
+
+
+def test_client_compiles_request_templates(spec_dict):
+    client = Client(spec_dict, server_url="http://localhost:8001/with/path")
+    template = client._request_templates["dummyTestEndpointWithArgument"]
+    assert template.url_prefix == "http://localhost:8001"
+    assert template.path_pattern == "/with/path/test/{test_arg}"
+    assert template.full_url_pattern == "http://localhost:8001/with/path/test/{test_arg}"
+    assert template.method == "get"
+    assert template.url_vars == ("test_arg",)
+    assert template.mimetype is None
+    assert client._request_templates["dummyPostEndpoint"].mimetype == "application/json"
+
+
+def test_request_url_built_from_template(spec_dict):
+    from pyotr.client.validation import ClientOpenAPIRequest, RequestTemplate
+    from pyotr.utils import OperationSpec
+
+    op_spec = OperationSpec.get_all(spec_dict)["dummyTestEndpointWithArgument"]
+    template = RequestTemplate.compile("http://localhost:8001/with/path", op_spec)
+    request = ClientOpenAPIRequest("http://localhost:8001/with/path", op_spec, template)
+    request.prepare("foo bar", baz="bam")
+    assert request.template is template
+    assert request.url == "http://localhost:8001/with/path/test/foo bar?baz=bam"
+    assert ClientOpenAPIRequest("foo.bar", op_spec).prepare("foo").url == "foo.bar/test/foo"
+
+
+def _invalid_response_client(spec_dict, **kwargs):
+    app = Application(spec_dict, validate_responses=False)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return {"baz": "not an integer"}
+
+    return Client(spec_dict, client=TestClient(app), **kwargs)
+
+
+def test_client_validates_responses_by_default(spec_dict):
+    from openapi_core.exceptions import OpenAPIError
+
+    client = _invalid_response_client(spec_dict)
+    with pytest.raises(OpenAPIError):
+        client.dummy_test_endpoint()
+
+
+def test_client_response_validation_can_be_disabled(spec_dict):
+    client = _invalid_response_client(spec_dict, validate_responses=False)
+    assert client.dummy_test_endpoint().json() == {"baz": "not an integer"}
+
+
+def test_client_response_validation_policy(spec_dict):
+    from pyotr.validation import ValidationPolicy
+
+    errors = []
+    policy = ValidationPolicy(on_error=lambda operation_id, error: errors.append(operation_id))
+    client = _invalid_response_client(spec_dict, validate_responses=policy)
+    client.dummy_test_endpoint()
+    assert errors == ["dummyTestEndpoint"]
+
+    client.validate_responses = ValidationPolicy(include={"dummyPostEndpoint"})
+    client.dummy_test_endpoint()
+    assert errors == ["dummyTestEndpoint"]
+
+
+@pytest.mark.parametrize("body", [b"{not json", b'{"foo": "\xff"}'])
+def test_client_reports_malformed_json_response(spec_dict, body):
+    from openapi_core.deserializing.exceptions import DeserializeError
+
+    from pyotr.validation import ValidationPolicy
+
+    app = Application(spec_dict, validate_responses=False)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return Response(body, media_type="application/json")
+
+    with pytest.raises(DeserializeError):
+        Client(spec_dict, client=TestClient(app)).dummy_test_endpoint()
+
+    errors = []
+    policy = ValidationPolicy(on_error=lambda operation_id, error: errors.append(error))
+    client = Client(spec_dict, client=TestClient(app), validate_responses=policy)
+    assert client.dummy_test_endpoint().data == body
+    assert [type(error) for error in errors] == [DeserializeError]
+
+
+def test_client_compiles_response_validators(spec_dict):
+    client = Client(spec_dict)
+    assert set(client._validators) == set(client._request_templates)
+    assert (
+        client._validators["dummyTestEndpoint"].operation_spec.operation_id
+        == "dummyTestEndpoint"
+    )
+
+
+def test_client_json_response_is_decoded_once(spec_dict, config, monkeypatch):
+    import json
+
+    from pyotr.client import validation
+
+    app = Application(spec_dict, module=config.endpoint_base)
+    client = Client(spec_dict, client=TestClient(app))
+    calls = []
+    original_loads = json.loads
+
+    def loads(*args, **kwargs):
+        calls.append(args)
+        return original_loads(*args, **kwargs)
+
+    monkeypatch.setattr(validation.json, "loads", loads)
+    response = client.dummy_test_endpoint()
+    assert response.json() == {"foo": "bar"}
+    assert response.data == b'{"foo":"bar"}'
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def streaming_spec_dict(spec_dict):
+    spec_dict["paths"]["/things"] = {
+        "get": {
+            "operationId": "listThings",
+            "responses": {
+                "200": {
+                    "description": "successful operation",
+                    "content": {
+                        "application/json": {
+                            "schema": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/Thing"},
+                            }
+                        }
+                    },
+                }
+            },
+        }
+    }
+    return spec_dict
+
+
+def _streaming_client(spec_dict, chunks, **kwargs):
+    def handler(request):
+        return httpx.Response(
+            200, headers={"content-type": "application/json"}, content=iter(chunks)
+        )
+
+    return Client(
+        spec_dict, client=httpx.Client(transport=httpx.MockTransport(handler)), **kwargs
+    )
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    (
+        [b'[{"foo": "a", "baz": 1}, {"foo": "b"}, {"baz": 23}]'],
+        [b" [", b'{"foo": "a", "ba', b'z": 1}', b', {"foo": "b"}, {"baz": 2', b"3}", b"] "],
+    ),
+)
+def test_client_streams_json_array_items(streaming_spec_dict, chunks):
+    client = _streaming_client(streaming_spec_dict, chunks)
+    with client.list_things(stream_=True) as response:
+        assert response.status_code == 200
+        items = list(response)
+    assert items == [{"foo": "a", "baz": 1}, {"foo": "b"}, {"baz": 23}]
+
+
+def test_client_streamed_items_are_validated(streaming_spec_dict):
+    from openapi_core.exceptions import OpenAPIError
+
+    client = _streaming_client(streaming_spec_dict, [b'[{"foo": "a"}, {"baz": "b"}]'])
+    response = client.list_things(stream_=True)
+    items = iter(response)
+    assert next(items) == {"foo": "a"}
+    with pytest.raises(OpenAPIError):
+        next(items)
+
+
+def test_client_streamed_response_content_type_is_validated(streaming_spec_dict):
+    from openapi_core.exceptions import OpenAPIError
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/plain"}, content=b"foo")
+
+    client = Client(
+        streaming_spec_dict, client=httpx.Client(transport=httpx.MockTransport(handler))
+    )
+    with pytest.raises(OpenAPIError):
+        client.list_things(stream_=True)
+    client.validate_responses = False
+    assert list(client.list_things(stream_=True)) == [b"foo"]
+
+
+def test_client_streams_raw_chunks_for_non_array_responses(streaming_spec_dict):
+    client = _streaming_client(streaming_spec_dict, [b'{"foo":', b' "bar"}'])
+    assert b"".join(client.dummy_test_endpoint(stream_=True)) == b'{"foo": "bar"}'
+
+
+@pytest.mark.asyncio
+async def test_async_client_streams_json_array_items(streaming_spec_dict):
+    app = Application(streaming_spec_dict)
+
+    @app.endpoint
+    async def list_things(request):
+        return JSONResponse([{"foo": str(i)} for i in range(100)])
+
+    async with AsyncClient(streaming_spec_dict, client=httpx.AsyncClient(app=app)) as client:
+        async with await client.list_things(stream_=True) as response:
+            items = [item async for item in response]
+    assert items == [{"foo": str(i)} for i in range(100)]
+
+
+@pytest.mark.parametrize("text", ("", "{}", "[1, 2", "[1 2]", "[1,, 2]", "[1] 2"))
+def test_json_array_decoder_rejects_invalid_arrays(text):
+    from pyotr.client.streaming import iter_json_array
+
+    with pytest.raises(ValueError):
+        list(iter_json_array([text.encode()]))
+
+
+def test_json_array_decoder_handles_split_values():
+    from pyotr.client.streaming import iter_json_array
+
+    text = '[12345, "é\\"x", true, [1, [2]], {"a": null}, -1.5e3]'.encode()
+    chunks = [bytes([byte]) for byte in text]
+    assert list(iter_json_array(chunks)) == [12345, 'é"x', True, [1, [2]], {"a": None}, -1500.0]
+    assert list(iter_json_array([b"[", b"]"])) == []
+
+
+def _caching_client(spec_dict, headers, status_codes=None, **kwargs):
+    from pyotr.caching import LRUCache
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        status_code = status_codes.pop(0) if status_codes else HTTPStatus.OK
+        return httpx.Response(status_code, json={"foo": "bar"}, headers=headers)
+
+    client = Client(
+        spec_dict,
+        client=httpx.Client(transport=httpx.MockTransport(handler)),
+        cache=LRUCache(),
+        **kwargs,
+    )
+    return client, requests
+
+
+def test_client_cache_returns_fresh_responses(spec_dict, monkeypatch):
+    client, requests = _caching_client(spec_dict, {"Cache-Control": "max-age=60"})
+    response = client.dummy_test_endpoint()
+    monkeypatch.setattr(client, "_process_response", None)
+    assert client.dummy_test_endpoint() is response
+    assert len(requests) == 1
+
+
+def test_client_cache_revalidates_stale_responses(spec_dict):
+    client, requests = _caching_client(
+        spec_dict, {"Cache-Control": "no-cache", "ETag": '"v1"'}, [HTTPStatus.OK, 304]
+    )
+    response = client.dummy_test_endpoint()
+    assert client.dummy_test_endpoint() is response
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[0].headers
+    assert requests[1].headers["if-none-match"] == '"v1"'
+
+
+@pytest.mark.parametrize("headers", ({"Cache-Control": "no-store, max-age=60"}, {}))
+def test_client_cache_skips_uncacheable_responses(spec_dict, headers):
+    client, requests = _caching_client(spec_dict, headers)
+    client.dummy_test_endpoint()
+    client.dummy_test_endpoint()
+    assert len(requests) == 2
+    assert len(client.cache) == 0
+
+
+def test_client_cache_ignores_unsafe_methods(spec_dict):
+    client, requests = _caching_client(spec_dict, {"Cache-Control": "max-age=60"})
+    client.validate_responses = False
+    client.dummy_post_endpoint(body_={"foo": "bar"})
+    client.dummy_post_endpoint(body_={"foo": "bar"})
+    assert len(requests) == 2
+
+
+def test_lru_cache_evicts_least_recently_used_entries():
+    from pyotr.caching import LRUCache
+    from pyotr.client.caching import CacheEntry
+
+    cache = LRUCache(max_entries=2, max_bytes=10)
+    entries = {key: CacheEntry(response=key, etag=None, expires=0, size=4) for key in "abcd"}
+    cache.set("a", entries["a"])
+    cache.set("b", entries["b"])
+    cache.get("a")
+    cache.set("c", entries["c"])
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (
+        entries["a"],
+        None,
+        entries["c"],
+    )
+
+    cache.set("d", entries["d"]._replace(size=8))
+    assert len(cache) == 1
+    cache.set("e", entries["a"]._replace(size=11))
+    assert cache.get("e") is None
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    from pyotr import caching
+    from pyotr.client.caching import CacheEntry
+
+    cache = caching.LRUCache(ttl=10)
+    cache.set("a", CacheEntry(response="a", etag=None, expires=0))
+    monkeypatch.setattr(caching.time, "time", lambda: 1e12)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def _mock_client(spec_dict, handler, client_class=Client, **kwargs):
+    http_client = (httpx.AsyncClient if client_class is AsyncClient else httpx.Client)(
+        transport=httpx.MockTransport(handler)
+    )
+    return client_class(spec_dict, client=http_client, **kwargs)
+
+
+def test_client_metrics_record_phases_and_statuses(spec_dict):
+    from pyotr.client.metrics import ClientMetricsCollector
+
+    statuses = [200, 200, 404]
+    metrics = ClientMetricsCollector()
+    client = _mock_client(
+        spec_dict,
+        lambda request: httpx.Response(statuses.pop(0), json={"foo": "bar"}),
+        metrics=metrics,
+    )
+    client.dummy_test_endpoint()
+    client.dummy_test_endpoint()
+    with pytest.raises(httpx.HTTPStatusError):
+        client.dummy_test_endpoint()
+
+    assert metrics.durations["dummyTestEndpoint", "prepare"].count == 3
+    assert metrics.durations["dummyTestEndpoint", "send"].count == 3
+    assert metrics.durations["dummyTestEndpoint", "validate"].count == 2
+    snapshot = metrics.as_dict()
+    assert snapshot["responses"] == {"dummyTestEndpoint": {200: 2, 404: 1}}
+    assert snapshot["durations"]["dummyTestEndpoint"]["send"]["count"] == 3
+    assert snapshot["in_flight"] == 0
+    assert snapshot["max_in_flight"] == 1
+    assert (
+        'pyotr_client_responses_total{operation_id="dummyTestEndpoint",status_code="404"} 1'
+        in metrics.render().splitlines()
+    )
+
+
+def test_client_metrics_record_errors(spec_dict):
+    from openapi_core.exceptions import OpenAPIError
+
+    from pyotr.client.metrics import ClientMetricsCollector
+
+    def handler(request):
+        if request.url.path == "/test":
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json={"foo": 1})
+
+    metrics = ClientMetricsCollector()
+    client = _mock_client(spec_dict, handler, metrics=metrics)
+    with pytest.raises(httpx.ConnectError):
+        client.dummy_test_endpoint()
+    with pytest.raises(OpenAPIError):
+        client.dummy_test_endpoint_with_argument("foo")
+
+    snapshot = metrics.as_dict()
+    assert snapshot["errors"] == {"dummyTestEndpoint": {"ConnectError": 1}}
+    assert snapshot["validation_errors"] == {"dummyTestEndpointWithArgument": 1}
+    assert snapshot["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_async_client_metrics_record_requests_in_flight(spec_dict):
+    import asyncio
+
+    from pyotr.client.metrics import ClientMetricsCollector
+
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"foo": "bar"})
+
+    metrics = ClientMetricsCollector()
+    client = _mock_client(spec_dict, handler, client_class=AsyncClient, metrics=metrics)
+    await asyncio.gather(*(client.dummy_test_endpoint() for _ in range(3)))
+    assert metrics.max_in_flight == 3
+    assert metrics.in_flight == 0
+    assert metrics.durations["dummyTestEndpoint", "send"].count == 3
+
+
+def test_client_pool_stats(spec_dict):
+    from pyotr.client.metrics import PoolStats
+
+    client = Client(spec_dict, client=httpx.Client(limits=httpx.Limits(max_connections=5)))
+    assert client.pool_stats() == PoolStats(connections=0, idle=0, max_connections=5)
+    assert Client(spec_dict).pool_stats() is None
+
+
+def test_client_retries_idempotent_requests(spec_dict, monkeypatch):
+    delays = []
+    monkeypatch.setattr("pyotr.client.time.sleep", delays.append)
+    statuses = [503, 502, 200]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(statuses.pop(0), json={"foo": "bar"})
+
+    client = _mock_client(spec_dict, handler, retry={"maxAttempts": 3, "backoffFactor": 1})
+    assert client.dummy_test_endpoint().data == b'{"foo": "bar"}'
+    assert len(requests) == 3
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 1 and 0 <= delays[1] <= 2
+
+
+def test_client_does_not_retry_unsafe_methods_by_default(spec_dict, monkeypatch):
+    monkeypatch.setattr("pyotr.client.time.sleep", lambda delay: None)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503)
+
+    client = _mock_client(spec_dict, handler, retry=True)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.dummy_post_endpoint(body_={"foo": "bar"})
+    assert len(requests) == 1
+
+
+def test_client_retries_transport_errors_up_to_max_attempts(spec_dict, monkeypatch):
+    from pyotr.client.metrics import ClientMetricsCollector
+
+    delays = []
+    monkeypatch.setattr("pyotr.client.time.sleep", delays.append)
+
+    def handler(request):
+        raise httpx.ConnectError("refused")
+
+    metrics = ClientMetricsCollector()
+    client = _mock_client(spec_dict, handler, retry={"max_attempts": 4}, metrics=metrics)
+    with pytest.raises(httpx.ConnectError):
+        client.dummy_test_endpoint()
+    assert len(delays) == 3
+    assert metrics.as_dict()["retries"] == {"dummyTestEndpoint": 3}
+    assert metrics.as_dict()["errors"] == {"dummyTestEndpoint": {"ConnectError": 4}}
+
+
+def test_client_retries_honour_retry_after_and_budget(spec_dict, monkeypatch):
+    from pyotr.client.policies import RetryBudget, RetryPolicy
+
+    delays = []
+    monkeypatch.setattr("pyotr.client.time.sleep", delays.append)
+
+    def handler(request):
+        return httpx.Response(503, headers={"retry-after": "3"})
+
+    budget = RetryBudget(ratio=0, burst=2)
+    client = _mock_client(spec_dict, handler, retry=RetryPolicy(max_attempts=10, budget=budget))
+    with pytest.raises(httpx.HTTPStatusError):
+        client.dummy_test_endpoint()
+    with pytest.raises(httpx.HTTPStatusError):
+        client.dummy_test_endpoint()
+    assert delays == [3, 3]
+
+
+def test_client_call_policies_from_spec_and_arguments(spec_dict):
+    from pyotr.client.policies import TIMEOUT_EXTENSION
+
+    spec_dict["paths"]["/test"]["get"][TIMEOUT_EXTENSION] = 2.5
+    spec_dict["paths"]["/test"]["post"]["x-pyotr-retry"] = {"methods": ["post"]}
+    client = Client(
+        spec_dict,
+        timeout=10,
+        operation_policies={"dummyTestEndpointCoro": {"timeout": 1, "retry": True}},
+    )
+    policies = client._call_policies
+    assert policies["dummyTestEndpoint"].request_kwargs == {"timeout": 2.5}
+    assert policies["dummyTestEndpointWithArgument"].request_kwargs == {"timeout": 10}
+    assert policies["dummyTestEndpointCoro"].timeout == 1
+    assert policies["dummyTestEndpointCoro"].retry is not None
+    assert policies["dummyPostEndpoint"].retry.methods == {"post"}
+    assert policies["dummyTestEndpoint"].retry is None
+
+    with pytest.raises(ValueError):
+        Client(spec_dict, operation_policies={"dummyTestEndpoint": {"timeuot": 1}})
+    with pytest.raises(ValueError, match="dummyTestEndpointz"):
+        Client(spec_dict, operation_policies={"dummyTestEndpointz": {"timeout": 1}})
+    with pytest.raises(ValueError):
+        Client(spec_dict, retry={"maxAttempt": 1})
+
+
+def test_client_passes_timeout_to_http_client(spec_dict):
+    seen = []
+
+    def handler(request):
+        seen.append(request.extensions["timeout"])
+        return httpx.Response(200, json={"foo": "bar"})
+
+    client = _mock_client(spec_dict, handler, timeout=1.5)
+    client.dummy_test_endpoint()
+    assert seen == [{"connect": 1.5, "read": 1.5, "write": 1.5, "pool": 1.5}]
+
+
+def test_client_circuit_breaker_fails_fast(spec_dict, monkeypatch):
+    from pyotr.client import policies
+    from pyotr.client.policies import CircuitOpenError
+
+    now = [1000.0]
+    monkeypatch.setattr(policies.time, "monotonic", lambda: now[0])
+    statuses = [500, 500, 500, 200]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(statuses.pop(0), json={"foo": "bar"})
+
+    client = _mock_client(
+        spec_dict, handler, circuit_breaker={"failureThreshold": 2, "resetTimeout": 10}
+    )
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            client.dummy_test_endpoint()
+    with pytest.raises(CircuitOpenError):
+        client.dummy_test_endpoint()
+    assert len(requests) == 2
+
+    now[0] += 10
+    with pytest.raises(httpx.HTTPStatusError):
+        client.dummy_test_endpoint()
+    with pytest.raises(CircuitOpenError):
+        client.dummy_test_endpoint()
+    assert len(requests) == 3
+
+    now[0] += 10
+    assert client.dummy_test_endpoint().data == b'{"foo": "bar"}'
+    assert not client._call_policies["dummyTestEndpoint"].circuit_breaker.is_open
+
+
+def test_client_circuit_breakers_are_per_operation(spec_dict):
+    from pyotr.client.policies import CircuitBreaker
+
+    shared = CircuitBreaker(failure_threshold=1)
+    client = Client(
+        spec_dict,
+        circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=5),
+        operation_policies={
+            "dummyPostEndpoint": {"circuit_breaker": shared},
+            "dummyTestEndpointCoro": {"circuit_breaker": shared},
+        },
+    )
+    breakers = {
+        operation_id: policy.circuit_breaker
+        for operation_id, policy in client._call_policies.items()
+    }
+    assert breakers["dummyPostEndpoint"] is breakers["dummyTestEndpointCoro"] is shared
+    assert breakers["dummyTestEndpoint"] is not breakers["dummyTestEndpointWithArgument"]
+    assert breakers["dummyTestEndpoint"].reset_timeout == 5
+
+    breakers["dummyTestEndpoint"].record_failure()
+    assert breakers["dummyTestEndpoint"].is_open
+    assert not breakers["dummyTestEndpointWithArgument"].is_open
+
+
+@pytest.mark.asyncio
+async def test_async_client_circuit_breaker_survives_cancelled_trial(spec_dict):
+    import asyncio
+
+    statuses = [500, None, 200]
+
+    async def handler(request):
+        status = statuses.pop(0)
+        if status is None:
+            await asyncio.sleep(10)
+        return httpx.Response(status, json={"foo": "bar"})
+
+    client = _mock_client(
+        spec_dict,
+        handler,
+        client_class=AsyncClient,
+        circuit_breaker={"failureThreshold": 1, "resetTimeout": 0},
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.dummy_test_endpoint()
+    assert client._call_policies["dummyTestEndpoint"].circuit_breaker.is_open
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.dummy_test_endpoint(), 0.05)
+    response = await client.dummy_test_endpoint()
+    assert response.data == b'{"foo": "bar"}'
+    assert not client._call_policies["dummyTestEndpoint"].circuit_breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries(spec_dict, monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr("pyotr.client.asyncio.sleep", sleep)
+    statuses = [504, 200]
+
+    async def handler(request):
+        return httpx.Response(statuses.pop(0), json={"foo": "bar"})
+
+    client = _mock_client(spec_dict, handler, client_class=AsyncClient, retry=True)
+    response = await client.dummy_test_endpoint()
+    assert response.data == b'{"foo": "bar"}'
+    assert len(delays) == 1
@@ -0,0 +1,158 @@
+import datetime
+
+import pytest
+from openapi_core import create_spec
+from openapi_core.unmarshalling.schemas.enums import UnmarshalContext
+from openapi_core.unmarshalling.schemas.factories import SchemaUnmarshallersFactory
+from openapi_core.unmarshalling.schemas.util import build_format_checker
+
+from pyotr.schemas import CompiledUnmarshaller, get_schema_compiler, SchemaCompiler
+
+SCHEMAS = {
+    "Tag": {"type": "string", "minLength": 1, "maxLength": 8, "pattern": "^[a-z]"},
+    "Pet": {
+        "type": "object",
+        "required": ["id", "name"],
+        "properties": {
+            "id": {"type": "integer", "minimum": 1, "readOnly": True},
+            "name": {"type": "string"},
+            "born": {"type": "string", "format": "date"},
+            "weight": {"type": "number", "exclusiveMinimum": True, "minimum": 0},
+            "status": {"type": "string", "enum": ["available", "sold"], "default": "available"},
+            "tags": {"type": "array", "items": {"$ref": "#/components/schemas/Tag"}},
+            "owner": {
+                "type": "object",
+                "nullable": True,
+                "properties": {"name": {"type": "string"}},
+            },
+            "secret": {"type": "string", "writeOnly": True},
+            "parent": {"$ref": "#/components/schemas/Pet"},
+        },
+    },
+    "Pets": {"type": "array", "items": {"$ref": "#/components/schemas/Pet"}, "maxItems": 3},
+    "Counts": {"type": "object", "additionalProperties": {"type": "integer", "multipleOf": 2}},
+    "Strict": {
+        "type": "object",
+        "additionalProperties": False,
+        "properties": {"flag": {"type": "boolean"}},
+    },
+    "Either": {"oneOf": [{"type": "string"}, {"type": "integer"}]},
+}
+
+VALUES = [
+    {"name": "Rex"},
+    {"id": 1, "name": "Rex"},
+    {"id": 0, "name": "Rex"},
+    {"id": 1, "name": "Rex", "born": "2020-02-02", "weight": 1.5, "extra": [1]},
+    {"id": 1, "name": "Rex", "born": "2020-02-30"},
+    {"id": 1, "name": "Rex", "weight": 0},
+    {"id": 1, "name": "Rex", "status": "lost"},
+    {"id": 1, "name": "Rex", "tags": ["a", "bc"], "owner": None},
+    {"id": 1, "name": "Rex", "tags": ["A"]},
+    {"id": 1, "name": "Rex", "tags": [None]},
+    {"id": 1, "name": "Rex", "owner": {"name": "Ann"}, "secret": "s"},
+    {"id": 1, "name": "Rex", "parent": {"id": 2, "name": "Max", "born": "2019-01-01"}},
+    {"id": 1, "name": "Rex", "parent": {"id": "2", "name": "Max"}},
+    {"id": True, "name": "Rex"},
+    [{"id": 1, "name": "Rex"}, {"id": 2, "name": "Max", "tags": ["b"]}],
+    [{"id": 1, "name": "Rex"}] * 4,
+    [{"name": "Rex"}],
+    {"a": 2, "b": 4},
+    {"a": 2, "b": 3},
+    {"flag": True},
+    {"flag": 1},
+    {"flag": False, "other": 1},
+    "abc",
+    "Abc",
+    "",
+    1,
+    None,
+]
+
+
+@pytest.fixture
+def spec():
+    return create_spec(
+        {
+            "openapi": "3.0.3",
+            "info": {"title": "Schemas", "version": "1.0.0"},
+            "paths": {},
+            "components": {"schemas": SCHEMAS},
+        }
+    )
+
+
+def _unmarshal(unmarshaller, value):
+    try:
+        return unmarshaller(value)
+    except Exception as exc:
+        return type(exc), str(exc)
+
+
+@pytest.mark.parametrize("context", list(UnmarshalContext))
+@pytest.mark.parametrize("schema_name", [name for name in SCHEMAS if name != "Either"])
+def test_compiled_schemas_unmarshal_as_openapi_core(spec, context, schema_name):
+    factory = SchemaUnmarshallersFactory(
+        spec.accessor.dereferencer.resolver_manager.resolver,
+        build_format_checker(),
+        context=context,
+    )
+    schema = spec / "components" / "schemas" / schema_name
+    function = SchemaCompiler(factory).compile(schema)
+    unmarshaller = factory.create(schema)
+    assert function is not None
+    compiled = 0
+    for value in VALUES:
+        expected = _unmarshal(unmarshaller, value)
+        compiled_unmarshaller = CompiledUnmarshaller(function, schema, factory)
+        assert _unmarshal(compiled_unmarshaller, value) == expected
+        try:
+            result = function(value)
+        except Exception:
+            continue
+        compiled += 1
+        assert result == expected
+        assert result is not value or not isinstance(value, (dict, list))
+    assert compiled
+
+
+def test_compiled_schemas_convert_formats_and_add_defaults(spec):
+    factory = SchemaUnmarshallersFactory(
+        spec.accessor.dereferencer.resolver_manager.resolver,
+        build_format_checker(),
+        context=UnmarshalContext.REQUEST,
+    )
+    function = SchemaCompiler(factory).compile(spec / "components" / "schemas" / "Pet")
+    assert function({"name": "Rex", "born": "2020-02-02", "secret": "s"}) == {
+        "name": "Rex",
+        "born": datetime.date(2020, 2, 2),
+        "status": "available",
+        "secret": "s",
+    }
+    with pytest.raises(Exception):
+        function({"id": 1, "name": "Rex"})
+
+
+def test_unsupported_schemas_are_not_compiled(spec):
+    factory = SchemaUnmarshallersFactory(context=UnmarshalContext.REQUEST)
+    assert SchemaCompiler(factory).compile(spec / "components" / "schemas" / "Either") is None
+
+
+def test_validators_use_compiled_schemas(spec_dict):
+    from pyotr.utils import OperationSpec
+    from pyotr.validation import get_operation_validators
+
+    spec = create_spec(spec_dict)
+    operations = OperationSpec.get_all(spec)
+    request_validator, response_validator = get_operation_validators(
+        spec, operations["dummyPostEndpoint"]
+    )
+    unmarshallers = list(request_validator._unmarshallers.values())
+    assert unmarshallers
+    assert all(isinstance(item, CompiledUnmarshaller) for item in unmarshallers)
+    other_validator, _ = get_operation_validators(spec, operations["dummyPostEndpoint"])
+    assert other_validator._schema_compiler is request_validator._schema_compiler
+    assert response_validator._schema_compiler is not request_validator._schema_compiler
+    assert get_schema_compiler(spec, request_validator._unmarshallers_factory) is (
+        request_validator._schema_compiler
+    )
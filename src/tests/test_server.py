@@ -2,10 +2,12 @@ from inspect import iscoroutinefunction
 
 import pytest
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 from pyotr.server import Application
 
+SERVER_URL = "http://localhost:8000"
+
 
 @pytest.mark.parametrize("filename", ("openapi.json", "openapi.yaml"))
 def test_server_from_file(config, filename):
@@ -28,17 +30,46 @@ def test_server_dotted_endpoint_name(spec_dict):
     ] = "endpoints.dummyTestEndpointWithArgument"
     spec_dict["paths"]["/test-async"]["get"]["operationId"] = "endpoints.dummyTestEndpointCoro"
     app = Application(spec_dict, module="tests")
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert callable(route.endpoint)
     assert route.endpoint.__name__ == "dummy_test_endpoint"
     assert route.path == "/test"
 
 
+def test_server_loads_each_endpoint_module_once(spec_dict, monkeypatch):
+    import pyotr.server
+
+    for path in spec_dict["paths"].values():
+        for operation in path.values():
+            operation["operationId"] = f"endpoints.{operation['operationId']}"
+    loaded = []
+    load_module = pyotr.server._load_module
+    monkeypatch.setattr(
+        pyotr.server, "_load_module", lambda name: loaded.append(name) or load_module(name)
+    )
+    Application(spec_dict, module="tests")
+    assert loaded == ["tests", "tests.endpoints"]
+
+
+def test_server_snake_case_aliases_are_computed_once(spec_dict, config, monkeypatch):
+    import pyotr.server
+
+    calls = []
+    snakecase = pyotr.server.snakecase
+    monkeypatch.setattr(
+        pyotr.server, "snakecase", lambda name: calls.append(name) or snakecase(name)
+    )
+    app = Application(spec_dict)
+    for operation_id in app._operations:
+        app.set_endpoint(lambda request: {}, operation_id=snakecase(operation_id))
+    assert len(calls) == len(app._operations)
+
+
 def test_server_endpoints_as_module(spec_dict):
     from tests import endpoints
 
     app = Application(spec_dict, module=endpoints)
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert callable(route.endpoint)
     assert route.endpoint.__name__ == "dummy_test_endpoint"
     assert route.path == "/test"
@@ -54,7 +85,7 @@ def test_server_endpoints_as_module_dotted_endpoint_name(spec_dict):
     ] = "endpoints.dummyTestEndpointWithArgument"
     spec_dict["paths"]["/test-async"]["get"]["operationId"] = "endpoints.dummyTestEndpointCoro"
     app = Application(spec_dict, module=tests)
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert callable(route.endpoint)
     assert route.endpoint.__name__ == "dummy_test_endpoint"
     assert route.path == "/test"
@@ -65,15 +96,51 @@ def test_server_with_path(spec_dict):
 
     spec_dict["servers"].insert(0, {"url": "http://localhost:8001/with/path"})
     app = Application(spec_dict, module=endpoints)
-    expected_routes = {
+    assert len(app.routes) == 1
+    assert app.routes[0].server_paths == ["/with/path", ""]
+    assert {route.path for route in app.routes[0].routes} == {
         "/test",
         "/test/{test_arg}",
-        "/with/path/test",
         "/test-async",
-        "/with/path/test/{test_arg}",
-        "/with/path/test-async",
     }
-    assert {route.path for route in app.routes} == expected_routes
+
+
+@pytest.mark.parametrize(
+    "server_url, base_path",
+    ((SERVER_URL, ""), ("http://localhost:8001", "/with/path")),
+)
+def test_server_routes_requests_under_each_server_path(
+    spec_dict, config, server_url, base_path
+):
+    from starlette.testclient import TestClient
+
+    spec_dict["servers"].insert(0, {"url": "http://localhost:8001/with/path/"})
+    client = TestClient(
+        Application(spec_dict, module=config.endpoint_base), base_url=server_url
+    )
+    assert client.get(f"{base_path}/test").json() == {"foo": "bar"}
+    assert client.get(f"{base_path}/test/baz").json() == {"foo": "baz"}
+    assert client.put(f"{base_path}/test").status_code == 405
+    assert client.get(f"{base_path}/test/baz/bam").status_code == 404
+    assert client.get("/with/pathtest").status_code == 404
+
+
+def test_server_rejects_requests_for_unknown_servers(spec_dict, config):
+    from starlette.testclient import TestClient
+
+    app = Application(spec_dict, module=config.endpoint_base)
+    assert TestClient(app, base_url=SERVER_URL).get("/test").status_code == 200
+    client = TestClient(app, base_url="http://otherhost:8000")
+    assert client.get("/test").status_code == 400
+
+
+def test_server_builds_operation_urls(spec_dict, config):
+    spec_dict["servers"].insert(0, {"url": "http://localhost:8001/with/path"})
+    app = Application(spec_dict, module=config.endpoint_base)
+    assert (
+        app.url_path_for("dummyTestEndpointWithArgument", test_arg="foo")
+        == "/with/path/test/foo"
+    )
 
 
 def test_server_no_endpoint_module(spec_dict):
@@ -91,7 +158,7 @@ def test_server_wraps_endpoint_function(spec_dict, config):
     from .endpoints import dummy_test_endpoint
 
     app = Application(spec_dict, module=config.endpoint_base)
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert route.endpoint is not dummy_test_endpoint
     assert route.endpoint.__wrapped__ is dummy_test_endpoint
     assert not iscoroutinefunction(dummy_test_endpoint)
@@ -104,7 +171,7 @@ async def test_server_wraps_endpoint_function_result_with_jsonresponse(spec_dict
         return {"type": "http.request"}
 
     app = Application(spec_dict, module=config.endpoint_base)
-    for route in app.routes:
+    for route in app.routes[0].routes:
         if route.path == "/test":
             break
     request = Request(
@@ -128,7 +195,7 @@ async def test_server_wraps_async_endpoint_function_result_with_jsonresponse(spe
         return {"type": "http.request"}
 
     app = Application(spec_dict, module=config.endpoint_base)
-    for route in app.routes:
+    for route in app.routes[0].routes:
         if route.path == "/test-async":
             break
     request = Request(
@@ -159,7 +226,7 @@ def test_set_endpoint_method(spec_dict):
 
     app.set_endpoint(dummy_test_endpoint)
 
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert route.endpoint is not dummy_test_endpoint
     assert route.endpoint.__wrapped__ is dummy_test_endpoint
     assert not iscoroutinefunction(dummy_test_endpoint)
@@ -174,7 +241,7 @@ def test_endpoint_decorator(spec_dict):
     def dummy_test_endpoint(request):
         return {}
 
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     assert route.endpoint is not dummy_test_endpoint
     assert route.endpoint.__wrapped__ is dummy_test_endpoint
     assert not iscoroutinefunction(dummy_test_endpoint)
@@ -190,7 +257,7 @@ def test_endpoint_decorator_with_operation_id(spec_dict):
     def foo_bar(request):
         return {}
 
-    route = app.routes[0]
+    route = app.routes[0].routes[0]
     operation = app._operations[operation_id]
     assert route.path.endswith(operation.path)
     assert operation.method.upper() in route.methods
@@ -212,3 +279,873 @@ def test_endpoint_decorator_with_incorrect_operation_id(spec_dict):
             return {}
 
         assert str(ex) == f"ValueError: Unknown operationId: {operation_id}."
+
+
+def test_set_endpoint_compiles_operation_validators(spec_dict):
+    from .endpoints import dummy_test_endpoint
+
+    app = Application(spec_dict)
+    assert app._validators == {}
+
+    app.set_endpoint(dummy_test_endpoint)
+
+    request_validator, response_validator = app._validators["dummyTestEndpoint"]
+    assert request_validator.operation_spec is app._operations["dummyTestEndpoint"]
+    assert response_validator.operation_spec is app._operations["dummyTestEndpoint"]
+
+
+def test_setting_custom_formatters_recompiles_validators(spec_dict, config):
+    app = Application(spec_dict, module=config.endpoint_base)
+    validators = dict(app._validators)
+    from openapi_core.unmarshalling.schemas.formatters import Formatter
+
+    formatters = {"foo": Formatter()}
+
+    app.custom_formatters = formatters
+
+    assert set(app._validators) == set(validators)
+    for operation_id, (request_validator, _) in app._validators.items():
+        assert request_validator is not validators[operation_id][0]
+        assert request_validator.custom_formatters is formatters
+
+
+def test_invalid_request_body_is_rejected(spec_dict, config):
+    from starlette.testclient import TestClient
+
+    client = TestClient(
+        Application(spec_dict, module=config.endpoint_base), base_url=SERVER_URL
+    )
+    response = client.post("/test", json={"foo": 123})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_wrapper_passes_bound_path_pattern_to_request_factory(
+    spec_dict, config, monkeypatch
+):
+    from pyotr.server import validation
+
+    async def dummy_receive():
+        return {"type": "http.request"}
+
+    path_patterns = []
+    original_factory = validation.request_factory
+
+    async def request_factory(request, path_pattern=None, **kwargs):
+        path_patterns.append(path_pattern)
+        return await original_factory(request, path_pattern, **kwargs)
+
+    monkeypatch.setattr("pyotr.server.request_factory", request_factory)
+    app = Application(spec_dict, module=config.endpoint_base)
+    for route in app.routes[0].routes:
+        if route.path == "/test/{test_arg}":
+            break
+    request = Request(
+        {
+            "type": "http",
+            "scheme": "http",
+            "server": ("localhost", 8000),
+            "path": "/test/foo",
+            "path_params": {"test_arg": "foo"},
+            "query_string": "",
+            "headers": {},
+            "app": app,
+            "method": "get",
+        },
+        dummy_receive,
+    )
+    await route.endpoint(request)
+    assert path_patterns == ["/test/{test_arg}"]
+
+
+@pytest.mark.asyncio
+async def test_request_factory_matches_routes_without_path_pattern(spec_dict, config):
+    from pyotr.server.validation import request_factory
+
+    async def dummy_receive():
+        return {"type": "http.request"}
+
+    app = Application(spec_dict, module=config.endpoint_base)
+    request = Request(
+        {
+            "type": "http",
+            "scheme": "http",
+            "server": ("localhost", 8000),
+            "path": "/test/foo",
+            "query_string": "",
+            "headers": {},
+            "app": app,
+            "method": "GET",
+        },
+        dummy_receive,
+    )
+    openapi_request = await request_factory(request)
+    assert openapi_request.full_url_pattern == "http://localhost:8000/test/{test_arg}"
+
+
+def test_dict_response_is_validated_without_parsing_body(spec_dict, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import OperationResponseValidator
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the response body should not be parsed")
+
+    monkeypatch.setattr(OperationResponseValidator, "_deserialise_data", fail)
+    app = Application(spec_dict)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return {"foo": "bar", "baz": 1}
+
+    response = TestClient(app, base_url=SERVER_URL).get("/test")
+    assert response.json() == {"foo": "bar", "baz": 1}
+
+
+def test_invalid_dict_response_fails_validation(spec_dict):
+    from openapi_core.exceptions import OpenAPIError
+    from starlette.testclient import TestClient
+
+    app = Application(spec_dict)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return {"baz": "not an integer"}
+
+    with pytest.raises(OpenAPIError):
+        TestClient(app, base_url=SERVER_URL).get("/test")
+
+
+def test_dict_response_with_non_json_types_is_validated_as_rendered(spec_dict):
+    from starlette.testclient import TestClient
+
+    spec_dict["components"]["schemas"]["Thing"]["properties"]["items"] = {
+        "type": "array",
+        "items": {"type": "integer"},
+    }
+    app = Application(spec_dict)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return {"foo": "bar", "items": (1, 2, 3)}
+
+    response = TestClient(app, base_url=SERVER_URL).get("/test")
+    assert response.status_code == 200
+    assert response.json() == {"foo": "bar", "items": [1, 2, 3]}
+
+
+def _invalid_response_app(spec_dict, validate_responses):
+    app = Application(spec_dict, validate_responses=validate_responses)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        return {"baz": "not an integer"}
+
+    return app
+
+
+def test_validation_policy_excludes_operations(spec_dict):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import ValidationPolicy
+
+    policy = ValidationPolicy(exclude=["dummyTestEndpoint"])
+    response = TestClient(_invalid_response_app(spec_dict, policy), base_url=SERVER_URL).get(
+        "/test"
+    )
+    assert response.status_code == 200
+
+
+def test_validation_policy_includes_only_listed_operations(spec_dict):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import ValidationPolicy
+
+    policy = ValidationPolicy(include=["dummyPostEndpoint"])
+    assert not policy.should_validate("dummyTestEndpoint")
+    assert policy.should_validate("dummyPostEndpoint")
+    response = TestClient(_invalid_response_app(spec_dict, policy), base_url=SERVER_URL).get(
+        "/test"
+    )
+    assert response.status_code == 200
+
+
+def test_validation_policy_samples_calls(spec_dict, monkeypatch):
+    from pyotr.validation import ValidationPolicy
+
+    monkeypatch.setattr("pyotr.validation.random.random", lambda: 0.5)
+    assert ValidationPolicy(sample_rate=0.6).should_validate("dummyTestEndpoint")
+    assert not ValidationPolicy(sample_rate=0.4).should_validate("dummyTestEndpoint")
+    assert not ValidationPolicy(sample_rate=0).should_validate("dummyTestEndpoint")
+
+
+@pytest.mark.parametrize("sample_rate", (-0.1, 1.1))
+def test_validation_policy_rejects_invalid_sample_rate(sample_rate):
+    from pyotr.validation import ValidationPolicy
+
+    with pytest.raises(ValueError):
+        ValidationPolicy(sample_rate=sample_rate)
+
+
+def test_validation_policy_reports_errors_to_callback(spec_dict):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import ValidationPolicy
+
+    errors = []
+    policy = ValidationPolicy(on_error=lambda operation_id, error: errors.append(operation_id))
+    response = TestClient(_invalid_response_app(spec_dict, policy), base_url=SERVER_URL).get(
+        "/test"
+    )
+    assert response.status_code == 200
+    assert errors == ["dummyTestEndpoint"]
+
+
+def test_deferred_validation_runs_after_response(spec_dict, caplog):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import ValidationPolicy
+
+    policy = ValidationPolicy(deferred=True)
+    response = TestClient(_invalid_response_app(spec_dict, policy), base_url=SERVER_URL).get(
+        "/test"
+    )
+    assert response.status_code == 200
+    assert "Invalid response for operation dummyTestEndpoint" in caplog.text
+
+
+def test_disabling_response_validation(spec_dict):
+    from starlette.testclient import TestClient
+
+    app = _invalid_response_app(spec_dict, True)
+    app.validate_responses = False
+    response = TestClient(app, base_url=SERVER_URL).get("/test")
+    assert response.status_code == 200
+
+
+def _streaming_app(spec_dict, **kwargs):
+    app = Application(spec_dict, stream_request_bodies=True, **kwargs)
+
+    @app.endpoint
+    async def dummy_post_endpoint(request):
+        assert await request.json() == {"foo": "bar"}
+        return Response(status_code=204)
+
+    return app
+
+
+def test_streamed_request_body_is_parsed_once(spec_dict, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from pyotr.validation import OperationRequestValidator
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the request body should not be parsed again")
+
+    monkeypatch.setattr(OperationRequestValidator, "_deserialise_data", fail)
+    client = TestClient(_streaming_app(spec_dict), base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": "bar"}).status_code == 204
+
+
+def test_streamed_request_body_is_validated(spec_dict):
+    from starlette.testclient import TestClient
+
+    client = TestClient(_streaming_app(spec_dict), base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": 123}).status_code == 400
+    assert (
+        client.post(
+            "/test", data=b"{not json", headers={"content-type": "application/json"}
+        ).status_code
+        == 400
+    )
+
+
+def test_streamed_request_body_over_max_size_is_rejected(spec_dict):
+    from starlette.testclient import TestClient
+
+    client = TestClient(_streaming_app(spec_dict, max_body_size=10), base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": "bar"}).status_code == 413
+
+    def chunks():
+        yield b'{"foo": '
+        yield b'"bar"}'
+
+    assert (
+        client.post(
+            "/test", data=chunks(), headers={"content-type": "application/json"}
+        ).status_code
+        == 413
+    )
+
+
+@pytest.mark.parametrize("stream", (True, False))
+def test_request_body_over_max_size_is_rejected_for_any_media_type(spec_dict, stream):
+    from starlette.testclient import TestClient
+
+    from tests import endpoints
+
+    app = Application(
+        spec_dict, module=endpoints, stream_request_bodies=stream, max_body_size=20
+    )
+    client = TestClient(app, base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": "bar" * 10}).status_code == 413
+    response = client.post(
+        "/test", data=b"not json, and too large", headers={"content-type": "text/plain"}
+    )
+    assert response.status_code == 413
+    assert client.post("/test", json={"foo": "bar"}).status_code == 204
+
+
+def test_streamed_request_body_is_kept(spec_dict):
+    from starlette.testclient import TestClient
+
+    from tests import endpoints
+
+    app = Application(spec_dict, module=endpoints, stream_request_bodies=True)
+    client = TestClient(app, base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": "bar"}).status_code == 204
+
+
+def _body_request(chunks, headers):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks
+    ] + [{"type": "http.request", "body": b""}]
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+        },
+        receive,
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_json_body_parses_chunks():
+    from pyotr.server.validation import read_json_body
+
+    encoded = '{"foo": "b\u00e4r"}'.encode()
+    request = _body_request([encoded[:11], encoded[11:]], {"content-type": "application/json"})
+    assert await read_json_body(request, max_size=100) == {"foo": "b\u00e4r"}
+    assert await request.json() == {"foo": "b\u00e4r"}
+    assert await read_json_body(_body_request([], {})) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunks", [[b"{not json"], [b'{"foo": "\xff"}']])
+async def test_read_json_body_rejects_malformed_body(chunks):
+    from starlette.exceptions import HTTPException
+
+    from pyotr.server.validation import read_json_body
+
+    with pytest.raises(HTTPException) as exc_info:
+        await read_json_body(_body_request(chunks, {}))
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_read_json_body_rejects_malformed_content_length():
+    from starlette.exceptions import HTTPException
+
+    from pyotr.server.validation import read_json_body
+
+    request = _body_request([b"{}"], {"content-length": "two"})
+    with pytest.raises(HTTPException) as exc_info:
+        await read_json_body(request, max_size=10)
+    assert exc_info.value.status_code == 400
+
+
+def _caching_app(spec_dict, **kwargs):
+    calls = []
+    app = Application(spec_dict, **kwargs)
+
+    @app.endpoint
+    def dummy_test_endpoint_with_argument(request):
+        calls.append(request.path_params["test_arg"])
+        return {"foo": request.path_params["test_arg"]}
+
+    return app, calls
+
+
+@pytest.mark.parametrize("cache_config", (True, {"ttl": 60, "maxEntries": 10}))
+def test_response_cache_configured_in_spec(spec_dict, cache_config):
+    from starlette.testclient import TestClient
+
+    spec_dict["paths"]["/test/{test_arg}"]["get"]["x-pyotr-cache"] = cache_config
+    app, calls = _caching_app(spec_dict)
+    client = TestClient(app, base_url=SERVER_URL)
+    first = client.get("/test/foo")
+    second = client.get("/test/foo")
+    client.get("/test/bar")
+    assert calls == ["foo", "bar"]
+    assert second.json() == first.json() == {"foo": "foo"}
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_response_cache_returns_not_modified(spec_dict):
+    from starlette.testclient import TestClient
+
+    app, calls = _caching_app(
+        spec_dict, response_cache={"dummyTestEndpointWithArgument": {"max_entries": 10}}
+    )
+    client = TestClient(app, base_url=SERVER_URL)
+    etag = client.get("/test/foo").headers["etag"]
+    response = client.get("/test/foo", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
+    assert client.get("/test/bar", headers={"If-None-Match": etag}).status_code == 200
+    assert calls == ["foo", "bar"]
+
+
+def test_response_cache_skips_validation(spec_dict, monkeypatch):
+    from starlette.testclient import TestClient
+
+    app, calls = _caching_app(spec_dict, response_cache={"dummyTestEndpointWithArgument": True})
+    client = TestClient(app, base_url=SERVER_URL)
+    client.get("/test/foo")
+    monkeypatch.setattr(app, "_validators", {})
+    assert client.get("/test/foo").json() == {"foo": "foo"}
+
+
+def test_response_cache_argument_overrides_spec(spec_dict):
+    from starlette.testclient import TestClient
+
+    spec_dict["paths"]["/test/{test_arg}"]["get"]["x-pyotr-cache"] = True
+    app, calls = _caching_app(
+        spec_dict, response_cache={"dummyTestEndpointWithArgument": False}
+    )
+    client = TestClient(app, base_url=SERVER_URL)
+    client.get("/test/foo")
+    client.get("/test/foo")
+    assert calls == ["foo", "foo"]
+
+
+def test_response_cache_key_includes_credentials(spec_dict):
+    from starlette.testclient import TestClient
+
+    spec_dict["components"]["securitySchemes"] = {
+        "apiKey": {"type": "apiKey", "name": "x-api-key", "in": "header"}
+    }
+    spec_dict["paths"]["/test/{test_arg}"]["get"]["security"] = [{"apiKey": []}]
+    app, calls = _caching_app(spec_dict, response_cache={"dummyTestEndpointWithArgument": True})
+    client = TestClient(app, base_url=SERVER_URL)
+    assert client.get("/test/foo", headers={"x-api-key": "a"}).status_code == 200
+    assert client.get("/test/foo").status_code == 403
+    assert client.get("/test/foo", headers={"x-api-key": "b"}).status_code == 200
+    assert calls == ["foo", "foo"]
+
+
+@pytest.mark.parametrize("lazy", (False, True))
+@pytest.mark.parametrize(
+    "operation_id, cache_config",
+    (
+        ("dummyPostEndpoint", True),
+        ("dummyTestEndpoint", {"unknown": 1}),
+        ("unknownEndpoint", True),
+    ),
+)
+def test_invalid_response_cache_configuration(
+    spec_dict, config, operation_id, cache_config, lazy
+):
+    with pytest.raises(ValueError):
+        Application(
+            spec_dict,
+            module=config.endpoint_base,
+            response_cache={operation_id: cache_config},
+            lazy=lazy,
+        )
+
+
+def test_response_cache_in_lazy_mode(spec_dict):
+    from starlette.testclient import TestClient
+
+    from tests import endpoints
+
+    app = Application(
+        spec_dict,
+        module=endpoints,
+        response_cache={"dummyTestEndpointWithArgument": True},
+        lazy=True,
+    )
+    assert set(app._response_caches) == {"dummyTestEndpointWithArgument"}
+    client = TestClient(app, base_url=SERVER_URL)
+    etag = client.get("/test/foo").headers["etag"]
+    assert client.get("/test/foo", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_operation_routes_look_up_candidate_routes():
+    from starlette.routing import Route
+
+    from pyotr.server.routing import OperationRoutes
+
+    routes = OperationRoutes(["", "/api/"])
+    for index, path in enumerate(("/items", "/items/{id}", "/{kind}/{id}", "/users/{id}")):
+        routes.add_route(str(index), Route(path, lambda request: None, name=str(index)))
+    assert [route.path for route in routes._get_candidates("/items/1")] == [
+        "/items/{id}",
+        "/{kind}/{id}",
+    ]
+    assert [route.path for route in routes._get_candidates("/items")] == ["/items"]
+
+    routes.add_route("0", Route("/things", lambda request: None))
+    assert routes._get_candidates("/items") == []
+    assert [route.path for route in routes.routes] == [
+        "/things",
+        "/items/{id}",
+        "/{kind}/{id}",
+        "/users/{id}",
+    ]
+
+
+@pytest.mark.parametrize(
+    "inline, extension, expected", ((None, None, False), (True, None, True), (None, True, True))
+)
+def test_sync_endpoints_run_in_threadpool(spec_dict, inline, extension, expected):
+    import asyncio
+
+    from starlette.testclient import TestClient
+
+    if extension is not None:
+        spec_dict["paths"]["/test"]["get"]["x-pyotr-inline"] = extension
+    in_event_loop = []
+    app = Application(spec_dict)
+
+    @app.endpoint(inline=inline)
+    def dummy_test_endpoint(request):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            in_event_loop.append(False)
+        else:
+            in_event_loop.append(True)
+        return {"foo": "bar"}
+
+    assert TestClient(app, base_url=SERVER_URL).get("/test").json() == {"foo": "bar"}
+    assert in_event_loop == [expected]
+
+
+@pytest.mark.asyncio
+async def test_threadpool_size_limits_concurrent_sync_endpoints(spec_dict):
+    import asyncio
+    import threading
+    import time
+
+    import httpx
+
+    running = []
+    concurrency = []
+    lock = threading.Lock()
+    app = Application(spec_dict, threadpool_size=2)
+
+    @app.endpoint
+    def dummy_test_endpoint(request):
+        with lock:
+            running.append(1)
+            concurrency.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return {"foo": "bar"}
+
+    async with httpx.AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        responses = await asyncio.gather(*(client.get("/test") for _ in range(6)))
+    assert all(response.status_code == 200 for response in responses)
+    assert max(concurrency) == 2
+
+
+@pytest.mark.parametrize("threshold, offloaded", ((0, 2), (10, 1), (1000, 0)))
+def test_validation_pool_offloads_large_bodies(spec_dict, config, threshold, offloaded):
+    from starlette.testclient import TestClient
+
+    from pyotr.server.validation import ValidationPool
+
+    pool = ValidationPool(threshold=threshold)
+    app = Application(spec_dict, module=config.endpoint_base, validation_pool=pool)
+    response = TestClient(app, base_url=SERVER_URL).get("/test")
+    assert response.status_code == 200
+    stats = pool.stats()
+    assert stats.completed == offloaded
+    assert stats.queued == stats.running == 0
+    assert (stats.validation_time > 0) is bool(offloaded)
+
+
+def test_validation_pool_reports_invalid_requests(spec_dict, config):
+    from starlette.testclient import TestClient
+
+    from pyotr.server.validation import ValidationPool
+
+    pool = ValidationPool(threshold=0)
+    app = Application(spec_dict, module=config.endpoint_base, validation_pool=pool)
+    response = TestClient(app, base_url=SERVER_URL).post(
+        "/test", data=b"not json", headers={"content-type": "application/json"}
+    )
+    assert response.status_code == 400
+    assert pool.stats().completed == 1
+
+
+@pytest.mark.asyncio
+async def test_validation_pool_queues_validations(spec_dict, monkeypatch):
+    import asyncio
+    import time
+
+    import httpx
+
+    from pyotr.server.validation import ValidationPool
+
+    pool = ValidationPool(threshold=0, max_workers=1)
+    app = Application(spec_dict, validation_pool=pool, validate_responses=False)
+    app.set_endpoint(lambda request: {"foo": "bar"}, operation_id="dummyTestEndpoint")
+    validate = app._validators["dummyTestEndpoint"][0].validate
+    monkeypatch.setattr(
+        app._validators["dummyTestEndpoint"][0],
+        "validate",
+        lambda request: time.sleep(0.02) or validate(request),
+    )
+
+    async with httpx.AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        await asyncio.gather(*(client.get("/test") for _ in range(4)))
+    stats = pool.stats()
+    assert stats.completed == 4
+    assert stats.max_queued > 1
+    assert stats.wait_time > 0
+
+
+def test_metrics_record_phases_sizes_and_errors(spec_dict, config):
+    from starlette.testclient import TestClient
+
+    from pyotr.server.metrics import MetricsCollector
+
+    metrics = MetricsCollector()
+    app = Application(spec_dict, module=config.endpoint_base, metrics=metrics)
+    client = TestClient(app, base_url=SERVER_URL)
+    client.get("/test")
+    client.post("/test", data=b"not json", headers={"content-type": "application/json"})
+
+    assert {key for key in metrics.durations if key[0] == "dummyTestEndpoint"} == {
+        ("dummyTestEndpoint", phase)
+        for phase in (
+            "request",
+            "request_validation",
+            "endpoint",
+            "serialization",
+            "response_validation",
+        )
+    }
+    assert set(metrics.durations) >= {
+        ("dummyPostEndpoint", "request"),
+        ("dummyPostEndpoint", "request_validation"),
+    }
+    assert metrics.body_sizes["dummyTestEndpoint", "response"].sum == len(b'{"foo":"bar"}')
+    assert metrics.body_sizes["dummyPostEndpoint", "request"].sum == len(b"not json")
+    assert dict(metrics.validation_errors) == {("dummyPostEndpoint", "request"): 1}
+
+
+def test_metrics_count_response_validation_errors(spec_dict):
+    from starlette.testclient import TestClient
+
+    from pyotr.server.metrics import MetricsCollector
+    from pyotr.validation import ValidationPolicy
+
+    metrics = MetricsCollector()
+    app = _invalid_response_app(spec_dict, ValidationPolicy(on_error=lambda *args: None))
+    app.metrics = metrics
+    TestClient(app, base_url=SERVER_URL).get("/test")
+    assert dict(metrics.validation_errors) == {("dummyTestEndpoint", "response"): 1}
+
+
+def test_metrics_rendered_in_prometheus_format(spec_dict, config):
+    from starlette.testclient import TestClient
+
+    from pyotr.metrics import Histogram
+    from pyotr.server.metrics import MetricsCollector
+
+    metrics = MetricsCollector(duration_buckets=(0.1, 1), size_buckets=(10,))
+    metrics.observe_phase("getThing", "endpoint", 0.1)
+    metrics.observe_phase("getThing", "endpoint", 2)
+    metrics.observe_body_size('say "hi"', "request", 5)
+    metrics.observe_validation_error("getThing", "response")
+    app = Application(spec_dict, module=config.endpoint_base, metrics=metrics)
+    app.add_route("/metrics", metrics.endpoint)
+
+    response = TestClient(app, base_url=SERVER_URL).get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    for line in (
+        "# TYPE pyotr_phase_duration_seconds histogram",
+        'pyotr_phase_duration_seconds_bucket{operation_id="getThing",phase="endpoint",le="0.1"} 1',
+        'pyotr_phase_duration_seconds_bucket{operation_id="getThing",phase="endpoint",le="1.0"} 1',
+        'pyotr_phase_duration_seconds_bucket{operation_id="getThing",phase="endpoint",le="+Inf"} 2',
+        'pyotr_phase_duration_seconds_sum{operation_id="getThing",phase="endpoint"} 2.1',
+        'pyotr_phase_duration_seconds_count{operation_id="getThing",phase="endpoint"} 2',
+        'pyotr_body_size_bytes_bucket{operation_id="say \\"hi\\"",kind="request",le="10.0"} 1',
+        'pyotr_validation_errors_total{operation_id="getThing",kind="response"} 1',
+    ):
+        assert line in lines
+    assert isinstance(metrics.durations["getThing", "endpoint"], Histogram)
+
+
+def test_lazy_server_loads_endpoints_on_first_request(spec_dict, monkeypatch):
+    import pyotr.server
+    from starlette.testclient import TestClient
+
+    loaded = []
+    load_module = pyotr.server._load_module
+    monkeypatch.setattr(
+        pyotr.server, "_load_module", lambda name: loaded.append(name) or load_module(name)
+    )
+    app = Application(spec_dict, module="tests.endpoints", lazy=True)
+    assert loaded == []
+    assert app._validators == {}
+    route = app.routes[0].get_route("dummyTestEndpoint")
+    assert route.endpoint.__name__ == "load_endpoint"
+
+    client = TestClient(app, base_url=SERVER_URL)
+    assert client.get("/test").json() == {"foo": "bar"}
+    assert client.get("/test").json() == {"foo": "bar"}
+    assert loaded == ["tests.endpoints"]
+    assert set(app._validators) == {"dummyTestEndpoint"}
+    assert app.routes[0].get_route("dummyTestEndpoint").endpoint.__name__ == (
+        "dummy_test_endpoint"
+    )
+    assert client.get("/test/baz").json() == {"foo": "baz"}
+    assert set(app._validators) == {"dummyTestEndpoint", "dummyTestEndpointWithArgument"}
+
+
+def test_lazy_server_reports_missing_endpoints_on_first_request(spec_dict):
+    from starlette.testclient import TestClient
+
+    app = Application(spec_dict, module="foo.bar", lazy=True)
+    with pytest.raises(RuntimeError):
+        TestClient(app, base_url=SERVER_URL).get("/test")
+
+
+def test_lazy_server_keeps_explicitly_set_endpoints(spec_dict):
+    from starlette.testclient import TestClient
+
+    app = Application(spec_dict, module="tests.endpoints", lazy=True)
+
+    @app.endpoint("dummyTestEndpoint")
+    def custom_endpoint(request):
+        return {"foo": "custom"}
+
+    assert app._validators == {}
+    assert TestClient(app, base_url=SERVER_URL).get("/test").json() == {"foo": "custom"}
+
+
+def test_server_warm_prepares_operations(spec_dict):
+    app = Application(spec_dict, module="tests.endpoints", lazy=True)
+    app.warm(["dummyTestEndpoint", "dummy_test_endpoint_coro"])
+    assert set(app._validators) == {"dummyTestEndpoint", "dummyTestEndpointCoro"}
+    assert app.routes[0].get_route("dummyTestEndpointCoro").endpoint.__name__ == (
+        "dummy_test_endpoint_coro"
+    )
+    assert app._lazy_endpoints == {"dummyTestEndpointWithArgument", "dummyPostEndpoint"}
+
+    app.warm()
+    assert app._lazy_endpoints == set()
+    assert set(app._validators) == set(app._operations)
+    with pytest.raises(ValueError):
+        app.warm(["fooBar"])
+
+
+def test_operation_routes_replace_routes_in_place():
+    from starlette.routing import Route
+
+    from pyotr.server.routing import OperationRoutes
+
+    routes = OperationRoutes([""])
+    first, second = Route("/a/{x}", lambda request: None), Route("/b", lambda request: None)
+    routes.add_route("a", first)
+    routes.add_route("b", second)
+    replacement = Route("/a/{x}", lambda request: None)
+    routes.add_route("a", replacement)
+    assert routes.get_route("a") is replacement
+    assert routes._get_candidates("/a/1") == [replacement]
+    moved = Route("/c", lambda request: None)
+    routes.add_route("a", moved)
+    assert routes._get_candidates("/a/1") == []
+    assert routes._get_candidates("/c") == [moved]
+
+
+def _add_query_and_header_parameters(spec_dict):
+    spec_dict["paths"]["/test/{test_arg}"]["get"]["parameters"].extend(
+        [
+            {"name": "pageSize", "in": "query", "schema": {"type": "integer", "default": 10}},
+            {"name": "X-Request-Id", "in": "header", "schema": {"type": "string"}},
+        ]
+    )
+
+
+def test_endpoint_receives_validated_parameters_by_name(spec_dict):
+    from starlette.testclient import TestClient
+
+    _add_query_and_header_parameters(spec_dict)
+    app = Application(spec_dict)
+    calls = []
+
+    @app.endpoint(validated_arguments=True)
+    def dummy_test_endpoint_with_argument(request, test_arg, page_size=None, x_request_id="-"):
+        calls.append((test_arg, page_size, x_request_id))
+        return {"foo": test_arg}
+
+    client = TestClient(app, base_url=SERVER_URL)
+    assert (
+        client.get("/test/baz?pageSize=5", headers={"x-request-id": "abc"}).status_code == 200
+    )
+    assert client.get("/test/bam").status_code == 200
+    assert calls == [("baz", 5, "abc"), ("bam", 10, "-")]
+
+
+def test_endpoint_receives_validated_body_and_request(spec_dict):
+    from starlette.responses import Response
+    from starlette.testclient import TestClient
+
+    app = Application(spec_dict, validated_arguments=True)
+    calls = []
+
+    @app.endpoint
+    async def dummy_post_endpoint(request, body, validated):
+        calls.append((body, validated.body, validated.errors))
+        return Response(status_code=204)
+
+    @app.endpoint(validated_arguments=False)
+    def dummy_test_endpoint(request, **kwargs):
+        calls.append(kwargs)
+        return {"foo": "bar"}
+
+    client = TestClient(app, base_url=SERVER_URL)
+    assert client.post("/test", json={"foo": "bar"}).status_code == 204
+    assert client.get("/test").status_code == 200
+    assert calls == [({"foo": "bar"}, {"foo": "bar"}, []), {}]
+
+
+def test_endpoint_arguments_match_declared_parameters(spec_dict):
+    from pyotr.server.arguments import EndpointArguments, get_argument_name
+    from pyotr.utils import OperationSpec
+
+    _add_query_and_header_parameters(spec_dict)
+    operation = OperationSpec.get_all(spec_dict)["dummyTestEndpointWithArgument"]
+
+    def endpoint(request, test_arg, pageSize, unknown=None, *, body=None):
+        ...
+
+    def any_endpoint(request, **kwargs):
+        ...
+
+    assert EndpointArguments.create(endpoint, operation) == EndpointArguments(
+        parameters=(("pageSize", "query", "pageSize"), ("test_arg", "path", "test_arg")),
+        body=True,
+        validated=False,
+    )
+    assert EndpointArguments.create(any_endpoint, operation).parameters == (
+        ("page_size", "query", "pageSize"),
+        ("test_arg", "path", "test_arg"),
+        ("x_request_id", "header", "X-Request-Id"),
+    )
+    assert get_argument_name("petId") == "pet_id"
+    assert get_argument_name("X-Request-Id") == "x_request_id"
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+from openapi_core.spec.paths import SpecPath
+
+from pyotr import utils
+from pyotr.cli import main
+from pyotr.utils import get_spec_from_file, load_spec
+
+
+@pytest.mark.parametrize("filename", ("openapi.json", "openapi.yaml"))
+def test_load_spec_without_cache(config, filename):
+    spec = load_spec(config.test_dir / filename)
+    assert isinstance(spec, SpecPath)
+    assert spec["info"]["title"] == "Test Spec"
+
+
+@pytest.mark.parametrize("filename", ("openapi.json", "openapi.yaml"))
+def test_load_spec_stores_parsed_spec_in_cache(config, filename, tmp_path):
+    load_spec(config.test_dir / filename, cache_dir=tmp_path)
+    cache_files = list(tmp_path.iterdir())
+    assert len(cache_files) == 1
+    with open(cache_files[0], "rb") as cached:
+        assert json.load(cached) == get_spec_from_file(config.test_dir / filename)
+
+
+def test_load_spec_uses_cache_without_parsing_or_validating(config, tmp_path, monkeypatch):
+    load_spec(config.test_dir / "openapi.yaml", cache_dir=tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the spec should be loaded from the cache")
+
+    original_create_spec = utils.create_spec
+
+    def create_spec(spec_dict, validate_spec=True):
+        assert not validate_spec
+        return original_create_spec(spec_dict, validate_spec=validate_spec)
+
+    monkeypatch.setattr(utils, "YamlLoader", fail)
+    monkeypatch.setattr(utils, "create_spec", create_spec)
+    spec = load_spec(config.test_dir / "openapi.yaml", cache_dir=tmp_path)
+    assert spec["info"]["title"] == "Test Spec"
+
+
+def test_load_spec_cache_dir_from_environment(config, tmp_path, monkeypatch):
+    monkeypatch.setenv(utils.SPEC_CACHE_DIR_ENV, str(tmp_path))
+    load_spec(config.test_dir / "openapi.json")
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_load_spec_cache_is_keyed_by_content(config, tmp_path):
+    spec_file = tmp_path / "openapi.json"
+    cache_dir = tmp_path / "cache"
+    spec_file.write_text((config.test_dir / "openapi.json").read_text())
+    load_spec(spec_file, cache_dir=cache_dir)
+    spec_file.write_text(spec_file.read_text().replace("Test Spec", "Changed Spec"))
+    spec = load_spec(spec_file, cache_dir=cache_dir)
+    assert spec["info"]["title"] == "Changed Spec"
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+@pytest.mark.parametrize("cached", [b"", b"\x80\x05}", b"{not json", b"[]"])
+def test_load_spec_replaces_unreadable_cache_file(config, tmp_path, cached):
+    load_spec(config.test_dir / "openapi.json", cache_dir=tmp_path)
+    (cache_file,) = tmp_path.iterdir()
+    cache_file.write_bytes(cached)
+    spec = load_spec(config.test_dir / "openapi.json", cache_dir=tmp_path)
+    assert spec["info"]["title"] == "Test Spec"
+    assert json.loads(cache_file.read_bytes()) == get_spec_from_file(
+        config.test_dir / "openapi.json"
+    )
+
+
+def test_load_spec_does_not_cache_values_without_json_form(config, tmp_path):
+    spec_file = tmp_path / "openapi.yaml"
+    spec_file.write_text(
+        (config.test_dir / "openapi.yaml")
+        .read_text()
+        .replace("info:", "x-date: 2022-02-02\ninfo:", 1)
+    )
+    cache_dir = tmp_path / "cache"
+    spec = load_spec(spec_file, cache_dir=cache_dir)
+    assert spec["info"]["title"] == "Test Spec"
+    assert not cache_dir.exists()
+
+
+def test_cli_caches_spec(config, tmp_path, capsys):
+    main(["cache-spec", str(config.test_dir / "openapi.yaml"), "--cache-dir", str(tmp_path)])
+    assert len(list(tmp_path.iterdir())) == 1
+    assert "openapi.yaml" in capsys.readouterr().out
+
+
+def test_cli_requires_cache_dir(config, monkeypatch):
+    monkeypatch.delenv(utils.SPEC_CACHE_DIR_ENV, raising=False)
+    with pytest.raises(SystemExit):
+        main(["cache-spec", str(config.test_dir / "openapi.yaml")])
+
+
+def test_operation_spec_fields_are_resolved_once(spec_dict):
+    from pyotr.utils import OperationSpec
+
+    spec_dict["components"] = {
+        "parameters": {
+            "Limit": {"name": "limit", "in": "query", "schema": {"type": "integer"}}
+        },
+        "requestBodies": {
+            "Foo": {
+                "content": {"application/json": {}, "application/x-www-form-urlencoded": {}}
+            }
+        },
+    }
+    path_spec = spec_dict["paths"]["/test/{test_arg}"]
+    path_spec["parameters"] = [path_spec["get"].pop("parameters")[0]]
+    path_spec["get"]["parameters"] = [
+        {"$ref": "#/components/parameters/Limit"},
+        {"name": "x-trace", "in": "header", "schema": {"type": "string"}},
+    ]
+    spec_dict["paths"]["/test"]["post"]["requestBody"] = {
+        "$ref": "#/components/requestBodies/Foo"
+    }
+
+    operations = OperationSpec.get_all(spec_dict)
+    assert set(operations) == {
+        "dummyTestEndpoint",
+        "dummyPostEndpoint",
+        "dummyTestEndpointWithArgument",
+        "dummyTestEndpointCoro",
+    }
+    operation = operations["dummyTestEndpointWithArgument"]
+    assert operation.operation_id == "dummyTestEndpointWithArgument"
+    assert operation.path == "/test/{test_arg}"
+    assert operation.method == "get"
+    assert operation.path_vars == ("test_arg",)
+    assert operation.parameters == {
+        "path": ("test_arg",),
+        "query": ("limit",),
+        "header": ("x-trace",),
+        "cookie": (),
+    }
+    assert operation.request_media_types == ()
+    assert operation.response_codes == ("200",)
+    assert operation.spec is path_spec["get"]
+    assert operations["dummyPostEndpoint"].request_media_types == (
+        "application/json",
+        "application/x-www-form-urlencoded",
+    )
+    assert not hasattr(operation, "__dict__")